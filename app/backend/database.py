@@ -9,76 +9,221 @@ License: MIT
 """
 
 import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from app.core.config import BASE_DIR, SETTINGS_DB
 from .models import SettingsProfile
 
-DB_PATH = "settings.db"
+# Relative paths are resolved against the project root, not the working directory
+DB_PATH = str(SETTINGS_DB if Path(SETTINGS_DB).is_absolute() else BASE_DIR / SETTINGS_DB)
+
+# Applied to every new connection. WAL lets readers proceed while a writer commits;
+# NORMAL sync is durable across application crashes in WAL mode.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-2000",  # ~2 MB page cache
+)
+
+# One long-lived connection per thread (sqlite3 connections are not shareable across threads).
+# Every connection is also registered so close_connection can close all of them; a thread
+# whose connection was closed from elsewhere sees a stale generation and reopens.
+_local = threading.local()
+_connections_lock = threading.Lock()
+_connections: list[sqlite3.Connection] = []
+_connection_generation = 0
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+# In-memory profile cache, invalidated by every write made through this module and, for
+# writes by other processes (workers), whenever the stored profiles_version moves on
+_cache_lock = threading.Lock()
+_cached_names: list[str] | None = None
+_cached_profiles: dict[str, SettingsProfile] = {}
+_cached_for: int | None = None  # profiles_version the cached rows were read at
+_cache_generation = 0  # bumped on invalidation so in-flight reads don't cache stale rows
 
 def get_connection() -> sqlite3.Connection:
-    """Establishes a connection to the SQLite database."""
-    return sqlite3.connect(DB_PATH)
+    """Returns this thread's persistent connection, opening and tuning it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or _local.generation != _connection_generation:
+        Path(DB_PATH).parent.mkdir(parents=True, exist_ok=True)
+        # Only the owning thread uses it; close_connection may close it from another thread
+        conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        with _connections_lock:
+            _connections.append(conn)
+            _local.conn, _local.generation = conn, _connection_generation
+        _ensure_schema(conn)
+    return conn
+
+def close_connection() -> None:
+    """Closes every thread's connection (e.g. on shutdown or when DB_PATH changes)."""
+    global _schema_ready, _connection_generation
+    with _connections_lock:
+        for conn in _connections:
+            conn.close()
+        _connections.clear()
+        _connection_generation += 1
+        _local.conn = None
+    with _schema_lock:
+        _schema_ready = False
+    invalidate_cache()
+
+def _ensure_schema(conn: sqlite3.Connection) -> None:
+    global _schema_ready
+    with _schema_lock:
+        if _schema_ready:
+            return
+        conn.execute('''CREATE TABLE IF NOT EXISTS profiles
+                     (name TEXT PRIMARY KEY,
+                      temperature REAL,
+                      max_output_tokens INTEGER,
+                      top_p REAL,
+                      top_k INTEGER,
+                      prompt_template TEXT,
+                      target_source TEXT)''')
+        # Profile-table version, bumped by every write (drives ETag / Last-Modified)
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("INSERT OR IGNORE INTO meta VALUES ('profiles_version', '0')")
+        conn.execute("INSERT OR IGNORE INTO meta VALUES ('profiles_updated_at', ?)", (str(time.time()),))
+        conn.commit()
+        _schema_ready = True
+
+def invalidate_cache() -> None:
+    """Drops all cached profile data."""
+    global _cached_names, _cached_for, _cache_generation
+    with _cache_lock:
+        _cached_names = None
+        _cached_for = None
+        _cached_profiles.clear()
+        _cache_generation += 1
+
+def _sync_cache(version: int) -> int:
+    """
+    Drops the cache if it was filled at another profiles_version (a write made elsewhere);
+    returns the cache generation that reads at `version` may fill.
+    """
+    global _cached_names, _cached_for, _cache_generation
+    with _cache_lock:
+        if _cached_for != version:
+            _cached_names = None
+            _cached_profiles.clear()
+            _cached_for = version
+            _cache_generation += 1
+        return _cache_generation
+
+def _stored_version(conn: sqlite3.Connection) -> int:
+    return int(conn.execute("SELECT value FROM meta WHERE key='profiles_version'").fetchone()[0])
+
+def cache_memory_usage() -> dict:
+    """Cached profile count and approximate bytes held by the profile cache."""
+    from app.core.memory import approx_size
+
+    with _cache_lock:
+        return {"entries": len(_cached_profiles), "bytes": approx_size((_cached_names, _cached_profiles))}
+
+def _bump_version(conn: sqlite3.Connection) -> None:
+    """Records a profile-table change; call inside the writing transaction."""
+    conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key='profiles_version'")
+    conn.execute("UPDATE meta SET value = ? WHERE key='profiles_updated_at'", (str(time.time()),))
+
+def _row_to_profile(row: tuple) -> SettingsProfile:
+    return SettingsProfile(
+        name=row[0],
+        temperature=row[1],
+        max_output_tokens=row[2],
+        top_p=row[3],
+        top_k=row[4],
+        prompt_template=row[5],
+        target_source=row[6]
+    )
 
 def init_db() -> None:
     """Initializes the database schema if it does not exist."""
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS profiles
-                 (name TEXT PRIMARY KEY, 
-                  temperature REAL, 
-                  max_output_tokens INTEGER, 
-                  top_p REAL, 
-                  top_k INTEGER, 
-                  prompt_template TEXT, 
-                  target_source TEXT)''')
-    conn.commit()
-    conn.close()
+    get_connection()
+
+def get_profiles_version() -> tuple[int, float]:
+    """Returns (version, last-modified unix time) of the profiles table."""
+    rows = dict(get_connection().execute("SELECT key, value FROM meta").fetchall())
+    version = (int(rows["profiles_version"]), float(rows["profiles_updated_at"]))
+    _sync_cache(version[0])
+    return version
 
 def get_all_profile_names() -> list[str]:
     """Retrieves a list of all setting profile names."""
+    global _cached_names
     conn = get_connection()
-    c = conn.cursor()
-    c.execute("SELECT name FROM profiles")
-    profiles = [row[0] for row in c.fetchall()]
-    conn.close()
-    return profiles
+    generation = _sync_cache(_stored_version(conn))
+    with _cache_lock:
+        if _cached_names is not None and generation == _cache_generation:
+            return list(_cached_names)
+
+    rows = conn.execute("SELECT name FROM profiles").fetchall()
+    profiles = [row[0] for row in rows]
+    with _cache_lock:
+        if generation == _cache_generation:
+            _cached_names = profiles
+    return list(profiles)
 
 def get_profile_by_name(name: str) -> SettingsProfile | None:
     """Retrieves a specific profile by name."""
     conn = get_connection()
-    c = conn.cursor()
-    c.execute("SELECT * FROM profiles WHERE name=?", (name,))
-    row = c.fetchone()
-    conn.close()
-    
+    generation = _sync_cache(_stored_version(conn))
+    with _cache_lock:
+        cached = _cached_profiles.get(name) if generation == _cache_generation else None
+    if cached is not None:
+        return cached.model_copy()
+
+    row = conn.execute("SELECT * FROM profiles WHERE name=?", (name,)).fetchone()
     if row:
-        return SettingsProfile(
-            name=row[0], 
-            temperature=row[1], 
-            max_output_tokens=row[2], 
-            top_p=row[3], 
-            top_k=row[4], 
-            prompt_template=row[5], 
-            target_source=row[6]
-        )
+        profile = _row_to_profile(row)
+        with _cache_lock:
+            if generation == _cache_generation:
+                _cached_profiles[name] = profile
+        return profile.model_copy()
     return None
 
+def get_all_profiles() -> list[SettingsProfile]:
+    """Retrieves every profile in one query (and warms the per-name cache)."""
+    global _cached_names
+    conn = get_connection()
+    generation = _sync_cache(_stored_version(conn))
+    with _cache_lock:
+        if (generation == _cache_generation and _cached_names is not None
+                and all(name in _cached_profiles for name in _cached_names)):
+            return [_cached_profiles[name].model_copy() for name in _cached_names]
+
+    profiles = [_row_to_profile(row) for row in conn.execute("SELECT * FROM profiles").fetchall()]
+    with _cache_lock:
+        if generation == _cache_generation:
+            _cached_names = [p.name for p in profiles]
+            _cached_profiles.update({p.name: p for p in profiles})
+    return [p.model_copy() for p in profiles]
+
 def save_profile(profile: SettingsProfile) -> None:
     """Saves or updates a settings profile."""
     conn = get_connection()
-    c = conn.cursor()
     try:
-        c.execute('''INSERT OR REPLACE INTO profiles VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                  (profile.name, profile.temperature, profile.max_output_tokens, 
-                   profile.top_p, profile.top_k, profile.prompt_template, profile.target_source))
-        conn.commit()
-    except Exception as e:
-        conn.close()
-        raise e
-    conn.close()
+        with conn:
+            conn.execute('''INSERT OR REPLACE INTO profiles VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                         (profile.name, profile.temperature, profile.max_output_tokens,
+                          profile.top_p, profile.top_k, profile.prompt_template, profile.target_source))
+            _bump_version(conn)
+    finally:
+        invalidate_cache()
 
 def delete_profile(name: str) -> None:
     """Deletes a profile by name."""
     conn = get_connection()
-    c = conn.cursor()
-    c.execute("DELETE FROM profiles WHERE name=?", (name,))
-    conn.commit()
-    conn.close()
+    try:
+        with conn:
+            if conn.execute("DELETE FROM profiles WHERE name=?", (name,)).rowcount:
+                _bump_version(conn)
+    finally:
+        invalidate_cache()
@@ -8,17 +8,67 @@ Copyright (c) 2026
 License: MIT
 """
 
-from fastapi import FastAPI, HTTPException
+import asyncio
+import json
+import threading
+import time
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
+from typing import TYPE_CHECKING, Callable
+from urllib.parse import quote
+from fastapi import Depends, FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from contextlib import asynccontextmanager
 
 # Internal Modules
-from app.core.rag import rag_service
-from app.core.expert_knowledge import expert_service
+from app.core.admission import AdmissionController, AdmissionRejected, Ticket
+from app.core.chunk_filter import ChunkFilter
+from app.core.resilience import CircuitOpenError, DeadlineExceeded, Resilience, request_deadline
+from app.core.routing import AUTO_MODEL, ModelRouter
+from app.core.services import (
+    get_admission_controller, get_conversation_store, get_expert_service, get_model_router, get_rag_service,
+    get_resilience
+)
+from app.core.config import (
+    BACKGROUND_INDEX_LOAD, COALESCE_REQUESTS, EXAMPLES_WATCH_INTERVAL, INDEX_WATCH_INTERVAL, MEMORY_ENDPOINT_ENABLED,
+    PROFILING_ENABLED, PROFILE_DIR, PROFILE_SAMPLE_INTERVAL_MS, REQUEST_DEADLINE, RETRIEVE_MAX_K,
+    RETRIEVE_MAX_QUERIES, SHARED_INDEX, TRACEMALLOC_FRAMES, WARM_UP_INDEXES
+)
+from app.core.prompts import PROMPT_TEMPLATES, format_examples
+from app.core.readiness import IndexReadiness
+from app.core.singleflight import SharedStream, SingleFlight, StreamFlight
+from app.core.profiling import PROFILE_MODES, profile_request
+from app.core.telemetry import StageTimings, get_logger, request_id_var
 from app.backend.models import (
-    ChatRequest, ChatResponse, ExampleLookupRequest, SettingsProfile
+    ChatRequest, ChatResponse, ExampleCreateRequest, ExampleLookupRequest, RetrieveRequest, RetrieveResponse,
+    RetrievalFilter, RetrieveResult, SettingsProfile, StageTimingsReport
 )
 from app.backend import database as db
 
+if TYPE_CHECKING:
+    from app.core.conversations import ConversationStore
+    from app.core.expert_knowledge import ExpertKnowledgeService
+    from app.core.rag import PreparedQuery, RAGService
+
+logger = get_logger(__name__)
+
+# Load state of each index, reported by /ready
+readiness = IndexReadiness(["pdfs", "examples"])
+
+async def load_indexes() -> None:
+    """Loads the PDF and example indexes concurrently on worker threads."""
+    logger.info("Initializing RAG and Expert Knowledge indexes...")
+    await asyncio.gather(
+        asyncio.to_thread(readiness.load, "pdfs", get_rag_service(), WARM_UP_INDEXES),
+        asyncio.to_thread(readiness.load, "examples", get_expert_service(), WARM_UP_INDEXES),
+    )
+    # Curated examples are appended throughout the day; index them as they land
+    if EXAMPLES_WATCH_INTERVAL > 0:
+        get_expert_service().start_watching(EXAMPLES_WATCH_INTERVAL)
+    # Other workers may publish a rebuilt document index; follow the version marker
+    if SHARED_INDEX and INDEX_WATCH_INTERVAL > 0:
+        get_rag_service().start_watching(INDEX_WATCH_INTERVAL)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -26,61 +76,215 @@ async def lifespan(app: FastAPI):
     Handles startup and shutdown events.
     """
     # Startup
-    print("Initializing Database...")
+    if TRACEMALLOC_FRAMES > 0:
+        import tracemalloc
+
+        # Before the indexes load, so /debug/memory attributes their allocations too
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    logger.info("Initializing Database...")
     db.init_db()
-    
-    print("Initializing RAG Service...")
-    rag_service.load_and_index()
-    
-    print("Initializing Expert Knowledge Service...")
-    expert_service.load_and_index()
+
+    # With background loading the port answers (liveness) while indexes load (readiness)
+    loader = asyncio.create_task(load_indexes())
+    if not BACKGROUND_INDEX_LOAD:
+        await loader
     
     yield
-    # Shutdown logic (if any) goes here
+    # Shutdown: stop waiting on a load that is still running
+    loader.cancel()
+    get_expert_service().stop_watching()
+    get_rag_service().stop_watching()
+    db.close_connection()
 
 app = FastAPI(lifespan=lifespan)
 
+# Endpoints that may be run under the per-request profiler
+PROFILED_PATHS = {"/chat", "/chat/stream", "/rebuild"}
+
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    """
+    Debug-only profiling of a single request, enabled by `debug.profiling_enabled`.
+    Triggered with `X-Profile: sample|cprofile` (or `?profile=`). The profile is saved to
+    `debug.profile_dir` (path returned in `X-Profile-File`), or returned instead of the
+    normal body when `X-Profile-Output: inline` (or `?profile_output=inline`) is set.
+    """
+    mode = request.headers.get("X-Profile") or request.query_params.get("profile")
+    if not (PROFILING_ENABLED and mode and request.url.path in PROFILED_PATHS):
+        return await call_next(request)
+    if mode not in PROFILE_MODES:
+        return PlainTextResponse(f"Unknown profile mode '{mode}'. Use one of {PROFILE_MODES}.", status_code=400)
+
+    output = request.headers.get("X-Profile-Output") or request.query_params.get("profile_output", "file")
+    with profile_request(mode=mode, interval=PROFILE_SAMPLE_INTERVAL_MS / 1000) as profile:
+        response = await call_next(request)
+        # Drain the body inside the profile so streamed work is captured too
+        body = b"".join([chunk async for chunk in response.body_iterator])
+
+    if output == "inline":
+        return PlainTextResponse(profile.render(), headers={"X-Profile-Mode": mode})
+
+    path = profile.save(PROFILE_DIR, f"{request.url.path.strip('/')}-{request_id_var.get()}")
+    logger.info("profile saved", extra={"fields": {"path": path, "mode": mode, "notes": profile.notes}})
+    headers = dict(response.headers)
+    headers["X-Profile-File"] = path
+    if profile.notes:
+        headers["X-Profile-Notes"] = "; ".join(profile.notes)
+    return Response(content=body, status_code=response.status_code, headers=headers, media_type=response.media_type)
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """
+    Tags every request with a correlation id (client-supplied `X-Request-ID` or a new one)
+    so that all log lines emitted while serving it can be joined in log search.
+    """
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    """Overload is answered fast (429 queue full / 503 wait deadline) with a retry hint."""
+    return JSONResponse({"detail": exc.detail}, status_code=exc.status_code,
+                        headers={"Retry-After": str(exc.retry_after)})
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    """An upstream that keeps failing is not called again until its breaker resets."""
+    return JSONResponse({"detail": str(exc)}, status_code=503,
+                        headers={"Retry-After": str(int(exc.retry_after))})
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse({"detail": str(exc)}, status_code=504)
+
 # --- SYSTEM ENDPOINTS ---
 
 @app.get("/")
 async def root():
-    """Health check endpoint."""
+    """Liveness probe: answers as soon as the process is up, without touching the indexes."""
     return {"status": "ok", "service": "RAG Chatbot with Gemini 2.5 Flash"}
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once every index has finished loading, 503 before that."""
+    body = {"ready": readiness.is_ready, "indexes": readiness.snapshot()}
+    return JSONResponse(body, status_code=200 if body["ready"] else 503)
+
+@app.get("/metrics")
+async def metrics(admission: AdmissionController = Depends(get_admission_controller),
+                  resilience: Resilience = Depends(get_resilience),
+                  router: ModelRouter = Depends(get_model_router),
+                  rag_service: "RAGService" = Depends(get_rag_service)):
+    """
+    Load metrics: per-model concurrency, queue depth, admission wait times, circuit states
+    and the recent latency / error rate that `auto` routing decides on.
+    """
+    return {
+        "admission": admission.snapshot(),
+        "circuits": resilience.snapshot(),
+        "models": router.snapshot(),
+        "coalescing": {"chat_in_flight": len(chat_flights), "streams_in_flight": len(stream_flights)},
+        "active_streams": len(active_streams),
+        "index_version": rag_service.index_version,
+    }
+
 @app.post("/rebuild")
-async def rebuild_index():
-    """Force rebuilds the vector index from disk."""
-    try:
-        rag_service.load_and_index()
-        return {"status": "success", "message": "Index rebuilt successfully."}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def rebuild_index(force: bool = False, rag_service: "RAGService" = Depends(get_rag_service)):
+    """
+    Reloads the vector index from disk, building it if missing. `force=true` rebuilds it
+    from the PDFs; with a shared index every worker then switches to the new version.
+    """
+    if not await asyncio.to_thread(readiness.load, "pdfs", rag_service, False, force):
+        raise HTTPException(status_code=500, detail=readiness.snapshot()["pdfs"]["error"])
+    return {"status": "success", "message": "Index rebuilt successfully.", "version": rag_service.index_version}
 
 # --- FEATURES ENDPOINTS ---
 
 @app.post("/features/select_examples")
-async def select_examples(request: ExampleLookupRequest):
+async def select_examples(request: ExampleLookupRequest,
+                          expert_service: "ExpertKnowledgeService" = Depends(get_expert_service)):
     """
     Dynamic Few-Shot Learning: Selects relevant Q&A examples 
     based on semantic similarity to the query.
+    Returns the formatted Q/A block (`examples`) and the structured matches (`items`).
     """
-    examples = expert_service.search(request.query, k=request.k)
-    return {"examples": examples}
+    items = await asyncio.to_thread(expert_service.search_examples, request.query, request.k)
+    return {"examples": format_examples(items), "items": items}
+
+@app.post("/features/examples")
+async def add_example(request: ExampleCreateRequest,
+                      expert_service: "ExpertKnowledgeService" = Depends(get_expert_service)):
+    """Appends a curated Q/A example; it is embedded and searchable immediately (no rebuild)."""
+    try:
+        count = await asyncio.to_thread(expert_service.add_example, request.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "added", "count": count}
+
+@app.get("/features/templates")
+async def list_templates():
+    """Prompt templates available for server-side rendering via `ChatRequest.template`."""
+    return {"templates": PROMPT_TEMPLATES}
 
 # --- SETTINGS ENDPOINTS ---
 
-@app.get("/settings", response_model=list[str])
-async def get_profiles():
-    """List all available settings profiles."""
-    return db.get_all_profile_names()
+def not_modified(request: Request, response: Response, etag: str) -> Response | None:
+    """
+    Applies the profile-table validators to `response` and returns a 304 response
+    if the client's If-None-Match / If-Modified-Since shows its copy is current.
+    """
+    _, updated_at = db.get_profiles_version()
+    headers = {"ETag": etag, "Last-Modified": formatdate(updated_at, usegmt=True)}
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match is not None:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110 13.2.2)
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in tags or etag in tags:
+            return Response(status_code=304, headers=headers)
+        return None
+
+    if_modified_since = request.headers.get("If-Modified-Since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return None
+        # HTTP dates have one-second resolution
+        if int(updated_at) <= since:
+            return Response(status_code=304, headers=headers)
+    return None
+
+@app.get("/settings", response_model=list[str] | list[SettingsProfile])
+async def get_profiles(request: Request, response: Response, full: bool = False):
+    """
+    List all available settings profiles (names, or full profiles with `?full=true`).
+    Supports conditional GET via ETag / Last-Modified.
+    """
+    version, _ = db.get_profiles_version()
+    etag = f'"profiles-v{version}{"-full" if full else ""}"'
+    if cached := not_modified(request, response, etag):
+        return cached
+    return db.get_all_profiles() if full else db.get_all_profile_names()
 
 @app.get("/settings/{name}", response_model=SettingsProfile)
-async def get_profile(name: str):
-    """Retrieve a specific settings profile by name."""
+async def get_profile(name: str, request: Request, response: Response):
+    """Retrieve a specific settings profile by name. Supports conditional GET."""
     profile = db.get_profile_by_name(name)
-    if profile:
-        return profile
-    raise HTTPException(status_code=404, detail="Profile not found")
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    version, _ = db.get_profiles_version()
+    # The name is percent-encoded: an ETag may not contain quotes or control characters
+    if cached := not_modified(request, response, f'"profile-{quote(name, safe="")}-v{version}"'):
+        return cached
+    return profile
 
 @app.post("/settings")
 async def save_profile(profile: SettingsProfile):
@@ -99,21 +303,318 @@ async def delete_profile(name: str):
 
 # --- CHAT & RAG ENDPOINTS ---
 
-@app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest):
+# Identical concurrent requests share one computation (see `coalesce_key`)
+chat_flights = SingleFlight()
+stream_flights = StreamFlight()
+
+def coalesce_key(request: ChatRequest, rag_service: "RAGService") -> tuple | None:
     """
-    Primary Chat Interface.
-    Orchestrates the RAG retrieval and generation process.
+    Requests with the same generation parameters can share a result. Session requests
+    never do: their history (and so their prompt) is specific to the conversation.
     """
-    # Delegate logic to the RAG Service
-    answer = rag_service.query(
-        request.query, 
+    if not COALESCE_REQUESTS or request.session_id:
+        return None
+    return id(rag_service), request.model_dump_json()
+
+def chunk_filter(filters: RetrievalFilter | None) -> ChunkFilter | None:
+    """The core retrieval filter for a request's `filters`, or None if it sets nothing."""
+    if filters is None:
+        return None
+    chunk_filter = ChunkFilter(**filters.model_dump())
+    return None if chunk_filter.is_empty else chunk_filter
+
+def prepare_kwargs(request: ChatRequest, history: list[tuple[str, str]] | None) -> dict:
+    """`RAGService.prepare` arguments for a chat request (retrieval, prompt and model choice)."""
+    return dict(
         wrapped_query=request.wrapped_query,
         use_rag=request.use_rag,
+        model_name=request.model,
+        template=request.template,
+        source=request.source,
+        num_examples=request.num_examples,
+        history=history,
+        latency_budget_ms=request.latency_budget_ms,
+        filters=chunk_filter(request.filters),
+    )
+
+def query_kwargs(request: ChatRequest, history: list[tuple[str, str]] | None) -> dict:
+    """`RAGService.query` / `stream_query` arguments for a chat request."""
+    return dict(
+        **prepare_kwargs(request, history),
         temperature=request.temperature,
         max_output_tokens=request.max_output_tokens,
         top_p=request.top_p,
         top_k=request.top_k,
-        model_name=request.model
     )
-    return ChatResponse(response=answer)
+
+async def prepare_auto(request: ChatRequest, history: list[tuple[str, str]] | None, rag_service: "RAGService",
+                       timings: StageTimings, arrived: float) -> "PreparedQuery | None":
+    """
+    For `auto` requests, runs retrieval and prompt building first so the router's choice is
+    known before admission; the request then waits under that model's concurrency limit.
+    None for a concrete model (admitted as requested, prepared by the query itself).
+    """
+    if request.model != AUTO_MODEL:
+        return None
+
+    def prepare():
+        with timings.stage("total"), request_deadline(REQUEST_DEADLINE, start=arrived):
+            return rag_service.prepare(request.query, **prepare_kwargs(request, history), timings=timings)
+    return await asyncio.to_thread(prepare)
+
+async def admit(request: ChatRequest, prepared: "PreparedQuery | None", admission: AdmissionController,
+                timings: StageTimings) -> Ticket | None:
+    """Waits for a concurrency slot on the model that will generate (none if nothing will)."""
+    if prepared is not None and prepared.messages is None:
+        return None  # RAG without a built index: answered without calling a model
+    with timings.stage("queue"):
+        return await admission.acquire(prepared.model if prepared else request.model, request.priority)
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse that calls `on_close()` once it has been sent, however that ends:
+    the body generator's own cleanup never runs if the client disconnects before it starts.
+    """
+
+    def __init__(self, content, on_close: Callable[[], None], **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
+def timings_of(shared: SharedStream) -> dict:
+    """Stage timings recorded by a shared stream's producer (empty until it starts)."""
+    return shared.result.as_dict() if shared.result is not None else {}
+
+@app.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(request: ChatRequest, response: Response,
+                        rag_service: "RAGService" = Depends(get_rag_service),
+                        conversations: "ConversationStore" = Depends(get_conversation_store),
+                        admission: AdmissionController = Depends(get_admission_controller)):
+    """
+    Primary Chat Interface.
+    Orchestrates the RAG retrieval and generation process.
+    Stage timings are returned in the body and as a `Server-Timing` header.
+    With a `session_id`, earlier turns of that conversation are sent as (budgeted) history.
+    Identical concurrent requests are coalesced into one upstream computation
+    (`coalesced` in the response); an error reaches every waiting request.
+    The computation waits for a per-model concurrency slot (429/503 + Retry-After under overload).
+    """
+    if request.template and request.template not in PROMPT_TEMPLATES:
+        raise HTTPException(status_code=400, detail=f"Unknown template '{request.template}'")
+
+    history = conversations.history(request.session_id) if request.session_id else None
+    arrived = time.monotonic()
+
+    def compute(timings: StageTimings, prepared: "PreparedQuery | None") -> str:
+        # Delegate logic to the RAG Service, within the request's deadline
+        with timings.stage("total"), request_deadline(REQUEST_DEADLINE, start=arrived):
+            return rag_service.query(request.query, **query_kwargs(request, history), timings=timings,
+                                     prepared=prepared)
+
+    async def run() -> tuple[str, StageTimings]:
+        timings = StageTimings()
+        prepared = await prepare_auto(request, history, rag_service, timings, arrived)
+        ticket = await admit(request, prepared, admission, timings)
+        try:
+            return await asyncio.to_thread(compute, timings, prepared), timings
+        finally:
+            if ticket is not None:
+                ticket.release()
+
+    (answer, timings), coalesced = await chat_flights.do(coalesce_key(request, rag_service), run)
+    if request.session_id:
+        conversations.append(request.session_id, request.query, answer)
+
+    response.headers["Server-Timing"] = timings.server_timing_header()
+    logger.info("chat completed", extra={"fields": {
+        "model": request.model, "use_rag": request.use_rag, "coalesced": coalesced, **timings.as_dict()
+    }})
+    return ChatResponse(response=answer, timings=StageTimingsReport(**timings.as_dict()),
+                        session_id=request.session_id, coalesced=coalesced)
+
+
+# stream_id -> cancel flag for streamed generations still in flight
+active_streams: dict[str, threading.Event] = {}
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest,
+                               rag_service: "RAGService" = Depends(get_rag_service),
+                               conversations: "ConversationStore" = Depends(get_conversation_store),
+                               admission: AdmissionController = Depends(get_admission_controller)):
+    """
+    Streaming Chat Interface. Returns newline-delimited JSON events:
+    `start` (with the stream_id used for cancellation), one `token` per text chunk,
+    then `done` (with stage timings) or `error`.
+    Identical concurrent streams share one generation: a late joiner first receives the
+    text produced so far. Cancelling detaches only this client; generation stops once
+    no client is left. A new generation is admitted like `/chat` before the stream starts.
+    """
+    if request.template and request.template not in PROMPT_TEMPLATES:
+        raise HTTPException(status_code=400, detail=f"Unknown template '{request.template}'")
+
+    history = conversations.history(request.session_id) if request.session_id else None
+    key = coalesce_key(request, rag_service)
+    arrived = time.monotonic()
+
+    shared = stream_flights.join(key)
+    coalesced = shared is not None
+    if shared is None:
+        timings = StageTimings()
+        prepared = await prepare_auto(request, history, rag_service, timings, arrived)
+        ticket = await admit(request, prepared, admission, timings)
+
+        def produce(stream: SharedStream):
+            stream.result = timings
+            try:
+                with timings.stage("total"), request_deadline(REQUEST_DEADLINE, start=arrived):
+                    yield from rag_service.stream_query(request.query, **query_kwargs(request, history),
+                                                        timings=timings, cancel_event=stream.cancel_event,
+                                                        prepared=prepared)
+            finally:
+                if ticket is not None:
+                    ticket.release()
+
+        shared, coalesced = stream_flights.open(key, produce)
+        if coalesced and ticket is not None:
+            ticket.release()  # an identical stream started while this one was queued
+
+    stream_id = uuid.uuid4().hex
+    cancel_event = threading.Event()
+    active_streams[stream_id] = cancel_event
+    # Taken by whichever runs first: the body, or the close path of a response whose body
+    # was never iterated (client gone before streaming began), which then detaches the reader
+    claimed = threading.Lock()
+
+    def events():
+        # Runs in the threadpool; closed early if the client disconnects
+        if not claimed.acquire(blocking=False):
+            return
+        parts: list[str] = []
+        reading = False
+        try:
+            yield json.dumps({"type": "start", "stream_id": stream_id, "coalesced": coalesced}) + "\n"
+            reading = True  # from here on, read() detaches this reader when it ends or is closed
+            for text in shared.read(cancel_event):
+                parts.append(text)
+                yield json.dumps({"type": "token", "text": text}) + "\n"
+            yield json.dumps({"type": "done", "cancelled": cancel_event.is_set(),
+                              "timings": StageTimingsReport(**timings_of(shared)).model_dump()}) + "\n"
+        except Exception as e:
+            logger.exception("Streaming chat failed")
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+        finally:
+            if not reading:
+                shared.detach()
+            active_streams.pop(stream_id, None)
+            # A cancelled answer is recorded as far as it got, matching what the user saw
+            if request.session_id and parts:
+                conversations.append(request.session_id, request.query, "".join(parts))
+            logger.info("chat stream finished", extra={"fields": {
+                "model": request.model, "use_rag": request.use_rag, "coalesced": coalesced,
+                "cancelled": cancel_event.is_set(), **timings_of(shared)
+            }})
+
+    def on_close():
+        if claimed.acquire(blocking=False):
+            shared.detach()
+            active_streams.pop(stream_id, None)
+
+    return ClosingStreamingResponse(events(), on_close, media_type="application/x-ndjson",
+                                    headers={"X-Stream-ID": stream_id})
+
+@app.post("/chat/stream/{stream_id}/cancel")
+async def cancel_stream(stream_id: str):
+    """Stops a streamed generation; the stream ends with a `done` event marked cancelled."""
+    cancel_event = active_streams.get(stream_id)
+    if cancel_event is None:
+        raise HTTPException(status_code=404, detail="Stream not found or already finished")
+    cancel_event.set()
+    return {"status": "cancelling", "stream_id": stream_id}
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str,
+                         conversations: "ConversationStore" = Depends(get_conversation_store)):
+    """Forgets a conversation's server-side history (e.g. when the user clears the chat)."""
+    if not conversations.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {"status": "deleted", "session_id": session_id}
+
+@app.post("/retrieve", response_model=RetrieveResponse)
+async def retrieve(request: RetrieveRequest, response: Response,
+                   rag_service: "RAGService" = Depends(get_rag_service)):
+    """
+    Retrieval only, without generation (no LLM cost): the top-k chunks for one or many
+    queries (optionally restricted by `filters`), with FAISS distance, source file, page and chunk id. All queries are embedded
+    in one batched call and searched with a single multi-vector FAISS search.
+    """
+    if not request.queries or len(request.queries) > RETRIEVE_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {RETRIEVE_MAX_QUERIES} queries")
+    if not 1 <= request.k <= RETRIEVE_MAX_K:
+        raise HTTPException(status_code=400, detail=f"k must be between 1 and {RETRIEVE_MAX_K}")
+    if not rag_service.vector_store:
+        raise HTTPException(status_code=503, detail="Vector index is not built")
+
+    arrived = time.monotonic()
+    timings = StageTimings()
+
+    def compute() -> list[list[dict]]:
+        with timings.stage("total"), request_deadline(REQUEST_DEADLINE, start=arrived):
+            return rag_service.retrieve(request.queries, k=request.k, timings=timings,
+                                        filters=chunk_filter(request.filters))
+
+    hits = await asyncio.to_thread(compute)
+    response.headers["Server-Timing"] = timings.server_timing_header()
+    logger.info("retrieve completed", extra={"fields": {"queries": len(request.queries), "k": request.k,
+                                                        **timings.as_dict()}})
+    return RetrieveResponse(
+        results=[RetrieveResult(query=query, chunks=chunks) for query, chunks in zip(request.queries, hits)],
+        timings=StageTimingsReport(**timings.as_dict()),
+    )
+
+@app.get("/documents")
+async def list_documents(rag_service: "RAGService" = Depends(get_rag_service)):
+    """Indexed PDFs with chunk counts and tags: the values `filters.sources` / `filters.tags` accept."""
+    if not rag_service.vector_store:
+        raise HTTPException(status_code=503, detail="Vector index is not built")
+    catalog = await asyncio.to_thread(lambda: rag_service.chunk_catalog)
+    return {"documents": catalog.sources()}
+
+# --- DEBUG ENDPOINTS ---
+
+@app.get("/debug/memory")
+async def debug_memory(top: int = 20,
+                       rag_service: "RAGService" = Depends(get_rag_service),
+                       expert_service: "ExpertKnowledgeService" = Depends(get_expert_service),
+                       conversations: "ConversationStore" = Depends(get_conversation_store)):
+    """
+    Memory accounting, enabled by `debug.memory_endpoint_enabled`: process RSS, each loaded
+    index and docstore, every in-process cache (entries and approximate bytes) and, when
+    tracemalloc is tracing, the `top` allocation sites and their growth since the last call.
+    """
+    if not MEMORY_ENDPOINT_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    from app.core.memory import process_memory, tracemalloc_report
+
+    def collect() -> dict:
+        pdfs = rag_service.memory_usage()
+        return {
+            "process": process_memory(),
+            "indexes": {"pdfs": pdfs, "examples": expert_service.memory_usage()},
+            "caches": {
+                "chunk_catalog": pdfs.pop("chunk_catalog") if pdfs else {"entries": 0, "bytes": 0},
+                "conversations": conversations.memory_usage(),
+                "profiles": db.cache_memory_usage(),
+                "chat_flights": {"entries": len(chat_flights), "bytes": chat_flights.held_bytes()},
+                "stream_flights": {"entries": len(stream_flights), "bytes": stream_flights.buffered_bytes()},
+                "active_streams": {"entries": len(active_streams)},
+            },
+            "tracemalloc": tracemalloc_report(max(1, min(top, 200))),
+        }
+
+    # Sizing walks the docstore and takes heap snapshots; keep it off the event loop
+    return await asyncio.to_thread(collect)
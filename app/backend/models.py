@@ -8,8 +8,18 @@ Copyright (c) 2026
 License: MIT
 """
 
+from typing import Literal
+
 from pydantic import BaseModel
 
+class RetrievalFilter(BaseModel):
+    """Restricts retrieval to matching chunks; every field that is set must match."""
+    sources: list[str] | None = None  # PDF file names, e.g. ["cardiology_case.pdf"]
+    source_glob: str | None = None  # e.g. "cardio*.pdf"
+    page_from: int | None = None  # Inclusive, 0-based
+    page_to: int | None = None  # Inclusive, 0-based
+    tags: list[str] | None = None  # Any of these document tags (config `retrieval.document_tags`)
+
 class ChatRequest(BaseModel):
     query: str
     wrapped_query: str | None = None  # Optional wrapper/template
@@ -18,15 +28,67 @@ class ChatRequest(BaseModel):
     max_output_tokens: int = 1024
     top_p: float = 0.95
     top_k: int = 40
-    model: str = "gemini-2.5-flash"
+    model: str = "gemini-2.5-flash"  # Or "auto" to route by latency budget and prompt size
+    latency_budget_ms: int | None = None  # Latency target used by "auto" routing
+    template: str | None = None  # Registered prompt template, rendered server-side
+    source: str | None = None  # Target source for source-grounding templates
+    num_examples: int = 3  # Few-shot examples for example-based templates
+    session_id: str | None = None  # Server-side conversation; prior turns are sent as history
+    priority: Literal["interactive", "batch"] = "interactive"  # Admission queue order under load
+    filters: RetrievalFilter | None = None  # Search only part of the corpus
+
+class StageTimingsReport(BaseModel):
+    queue_ms: float | None = None  # Waiting for a model concurrency slot
+    embed_ms: float | None = None
+    examples_ms: float | None = None
+    retrieve_ms: float | None = None
+    prompt_ms: float | None = None
+    generate_ms: float | None = None
+    first_token_ms: float | None = None  # Streaming only
+    total_ms: float | None = None
+    retrieved_chunks: int = 0
+    prompt_chars: int = 0
+    model: str | None = None  # Model that answered (the routed tier for "auto")
 
 class ChatResponse(BaseModel):
     response: str
+    timings: StageTimingsReport | None = None
+    session_id: str | None = None
+    coalesced: bool = False  # Answer shared with identical concurrent requests
+
+class RetrieveRequest(BaseModel):
+    queries: list[str]  # Searched as one batch
+    k: int = 4
+    filters: RetrievalFilter | None = None
+
+class ChunkReference(BaseModel):
+    source: str | None = None
+    page: int | None = None
+
+class RetrievedChunk(BaseModel):
+    chunk_id: str
+    score: float  # FAISS L2 distance; lower is closer
+    source: str | None = None  # PDF file name
+    page: int | None = None  # 0-based page within the PDF
+    content: str
+    references: list[ChunkReference] | None = None  # every copy, if duplicates were collapsed
+
+class RetrieveResult(BaseModel):
+    query: str
+    chunks: list[RetrievedChunk]
+
+class RetrieveResponse(BaseModel):
+    results: list[RetrieveResult]
+    timings: StageTimingsReport | None = None
 
 class ExampleLookupRequest(BaseModel):
     query: str
     k: int = 3
 
+class ExampleCreateRequest(BaseModel):
+    question: str
+    answer: str
+
 class SettingsProfile(BaseModel):
     name: str
     temperature: float
@@ -0,0 +1,219 @@
+"""
+Script Name:  admission.py
+Description:  Admission control for upstream LLM calls: per-model concurrency limits, a bounded
+              priority wait queue, and fast rejection with Retry-After under overload.
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from collections import deque
+
+from app.core.telemetry import get_logger
+
+logger = get_logger(__name__)
+
+# Lower rank is served first
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; mapped to an HTTP error with Retry-After."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """A held concurrency slot. `release()` is idempotent and safe to call from any thread."""
+
+    def __init__(self, gate: "ModelGate", wait_ms: float):
+        self.gate = gate
+        self.wait_ms = wait_ms
+        self._start = time.perf_counter()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.gate.release(time.perf_counter() - self._start)
+
+    async def __aenter__(self) -> "Ticket":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.release()
+
+
+class _Waiter:
+    __slots__ = ("loop", "future", "granted", "abandoned")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+        self.abandoned = False
+
+    def wake(self) -> None:
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class ModelGate:
+    """
+    Concurrency limit and priority wait queue for one model. Thread-safe: slots are
+    released from worker threads (e.g. a stream producer) and handed directly to the
+    best waiter, whose event loop is woken with `call_soon_threadsafe`.
+    """
+
+    def __init__(self, model: str, limit: int, max_queue: int, max_wait: float):
+        self.model = model
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.queued = 0
+        self._waiters: list[tuple[int, int, _Waiter]] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        # Metrics
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self._waits_ms: deque[float] = deque(maxlen=1000)
+        self._service_ewma_s = 1.0
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely free, from queue depth and recent service time."""
+        estimate = self._service_ewma_s * (self.queued + 1) / max(1, self.limit)
+        return max(1, min(60, math.ceil(estimate)))
+
+    async def acquire(self, priority: str = "interactive") -> Ticket:
+        start = time.perf_counter()
+        with self._lock:
+            if self.in_flight < self.limit and not self.queued:
+                self.in_flight += 1
+                return self._admitted(start)
+            if self.queued >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise AdmissionRejected(429, f"Too many queued requests for {self.model}", self.retry_after())
+            waiter = _Waiter(asyncio.get_running_loop())
+            heapq.heappush(self._waiters, (PRIORITIES.get(priority, 0), next(self._seq), waiter))
+            self.queued += 1
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if waiter.granted:  # the slot arrived just as the deadline hit
+                    return self._admitted(start)
+                waiter.abandoned = True
+                self.queued -= 1
+                self.rejected_timeout += 1
+                raise AdmissionRejected(503, f"{self.model} is at capacity, try again later", self.retry_after())
+        except asyncio.CancelledError:
+            # Client went away while queued; pass on a slot that was already handed over
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    waiter.abandoned = True
+                    self.queued -= 1
+            if granted:
+                self.release(None)
+            raise
+        with self._lock:
+            return self._admitted(start)
+
+    def _admitted(self, start: float) -> Ticket:
+        # Called with the lock held
+        wait_ms = (time.perf_counter() - start) * 1000
+        self.admitted += 1
+        self._waits_ms.append(wait_ms)
+        return Ticket(self, wait_ms)
+
+    def release(self, service_s: float | None) -> None:
+        with self._lock:
+            if service_s is not None:
+                self._service_ewma_s = 0.8 * self._service_ewma_s + 0.2 * service_s
+            # Hand the slot straight to the best waiter (in_flight stays the same) ...
+            while self._waiters:
+                _, _, waiter = heapq.heappop(self._waiters)
+                if not waiter.abandoned:
+                    waiter.granted = True
+                    self.queued -= 1
+                    break
+            else:
+                # ... or free it
+                self.in_flight -= 1
+                return
+        try:
+            waiter.loop.call_soon_threadsafe(waiter.wake)
+        except RuntimeError:
+            # The waiter's loop is gone, so nobody will use the slot
+            self.release(None)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits_ms)
+            counters = {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "admitted": self.admitted,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_timeout": self.rejected_timeout,
+            }
+
+        def percentile(p: float) -> float | None:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 1) if waits else None
+
+        return {
+            **counters,
+            "wait_ms_p50": percentile(0.50),
+            "wait_ms_p95": percentile(0.95),
+            "wait_ms_max": round(waits[-1], 1) if waits else None,
+            "service_ms_ewma": round(self._service_ewma_s * 1000, 1),
+        }
+
+
+class AdmissionController:
+    """Per-model gates, created on first use with the configured (or default) limit."""
+
+    def __init__(self, default_limit: int = 8, model_limits: dict[str, int] | None = None,
+                 max_queue: int = 32, max_wait: float = 10.0):
+        self.default_limit = default_limit
+        self.model_limits = model_limits or {}
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._gates: dict[str, ModelGate] = {}
+
+    def gate(self, model: str) -> ModelGate:
+        gate = self._gates.get(model)
+        if gate is None:
+            gate = self._gates.setdefault(model, ModelGate(
+                model, self.model_limits.get(model, self.default_limit), self.max_queue, self.max_wait))
+        return gate
+
+    async def acquire(self, model: str, priority: str = "interactive") -> Ticket:
+        """Waits for a slot on `model`'s gate; raises AdmissionRejected (429/503) if it can't."""
+        try:
+            return await self.gate(model).acquire(priority)
+        except AdmissionRejected as e:
+            logger.warning("request rejected", extra={"fields": {
+                "model": model, "priority": priority, "status": e.status_code, "retry_after": e.retry_after
+            }})
+            raise
+
+    def snapshot(self) -> dict[str, dict]:
+        return {model: gate.snapshot() for model, gate in self._gates.items()}
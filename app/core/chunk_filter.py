@@ -0,0 +1,109 @@
+"""
+Script Name:  chunk_filter.py
+Description:  Metadata filters for document retrieval (source file, glob, page range, tags),
+              resolved to FAISS id sets so filtering happens inside the vector search.
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import os
+from dataclasses import dataclass
+from fnmatch import fnmatch
+from typing import TYPE_CHECKING
+
+# NumPy is imported where the catalog is built, so the API can import ChunkFilter cheaply
+if TYPE_CHECKING:
+    import numpy as np
+
+# Metadata key on a chunk collapsed from duplicates (app.core.dedup): the {"source", "page"}
+# of every copy. Such a chunk matches a filter through any of its copies.
+REFERENCES_KEY = "references"
+
+
+@dataclass(frozen=True)
+class ChunkFilter:
+    """Restricts retrieval to matching chunks. Every field that is set must match."""
+    sources: tuple[str, ...] | None = None  # PDF file names
+    source_glob: str | None = None  # e.g. "cardio*.pdf"
+    page_from: int | None = None  # inclusive, 0-based like PyPDFLoader's `page`
+    page_to: int | None = None  # inclusive
+    tags: tuple[str, ...] | None = None  # any of these document tags
+
+    def __post_init__(self):
+        # Lists arrive from JSON; tuples keep the filter hashable
+        for name in ("sources", "tags"):
+            value = getattr(self, name)
+            if value is not None and not isinstance(value, tuple):
+                object.__setattr__(self, name, tuple(value))
+
+    @property
+    def is_empty(self) -> bool:
+        return all(getattr(self, name) is None for name in self.__dataclass_fields__)
+
+
+class ChunkCatalog:
+    """
+    Per-source FAISS id sets, with the page of each id in that source, for one vector store,
+    built once from the docstore metadata. `select` turns a ChunkFilter into the sorted ids
+    to search.
+    """
+
+    def __init__(self, rows_by_source: "dict[str, np.ndarray]", pages_by_source: "dict[str, np.ndarray]",
+                 document_tags: dict[str, list[str]] | None = None):
+        self.rows_by_source = rows_by_source
+        self.pages_by_source = pages_by_source  # aligned with rows_by_source (-1 if unknown)
+        # Tags are matched by file-name glob (config `retrieval.document_tags`), so they
+        # can be edited without re-indexing
+        self.document_tags = document_tags or {}
+
+    @classmethod
+    def from_store(cls, store, document_tags: dict[str, list[str]] | None = None) -> "ChunkCatalog":
+        """Reads `source` / `page` metadata (of every copy, for collapsed chunks) for every row of a FAISS store."""
+        import numpy as np
+
+        rows: dict[str, list[int]] = {}
+        pages: dict[str, list[int]] = {}
+        for row, chunk_id in store.index_to_docstore_id.items():
+            metadata = store.docstore.search(chunk_id).metadata
+            for reference in metadata.get(REFERENCES_KEY) or [metadata]:
+                source = os.path.basename(reference.get("source") or "")
+                rows.setdefault(source, []).append(row)
+                pages.setdefault(source, []).append(-1 if reference.get("page") is None else reference["page"])
+        return cls({source: np.asarray(ids, dtype=np.int64) for source, ids in rows.items()},
+                   {source: np.asarray(ids, dtype=np.int32) for source, ids in pages.items()}, document_tags)
+
+    def tags_of(self, source: str) -> list[str]:
+        return sorted({tag for pattern, tags in self.document_tags.items() if fnmatch(source, pattern) for tag in tags})
+
+    def sources(self) -> list[dict]:
+        """Indexed documents with their chunk counts and tags."""
+        return [{"source": source, "chunks": len(rows), "tags": self.tags_of(source)}
+                for source, rows in sorted(self.rows_by_source.items())]
+
+    def select(self, chunk_filter: ChunkFilter) -> "np.ndarray":
+        """Sorted FAISS ids of the chunks matching the filter (possibly empty)."""
+        import numpy as np
+
+        matching = [
+            source for source in self.rows_by_source
+            if (chunk_filter.sources is None or source in chunk_filter.sources)
+            and (chunk_filter.source_glob is None or fnmatch(source, chunk_filter.source_glob))
+            and (chunk_filter.tags is None or set(chunk_filter.tags) & set(self.tags_of(source)))
+        ]
+        if not matching:
+            return np.empty(0, dtype=np.int64)
+        rows = np.concatenate([self.rows_by_source[source] for source in matching])
+
+        if chunk_filter.page_from is not None or chunk_filter.page_to is not None:
+            pages = np.concatenate([self.pages_by_source[source] for source in matching])
+            keep = np.ones(len(rows), dtype=bool)
+            if chunk_filter.page_from is not None:
+                keep &= pages >= chunk_filter.page_from
+            if chunk_filter.page_to is not None:
+                keep &= pages <= chunk_filter.page_to
+            rows = rows[keep]
+        # Sorted and unique: a collapsed chunk can match through several of its copies
+        return np.unique(rows)
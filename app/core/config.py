@@ -1,6 +1,7 @@
-import yaml
-import os
 from pathlib import Path
+from typing import Any
+
+import yaml
 
 # Load config from project root
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
@@ -9,25 +10,99 @@ CONFIG_PATH = BASE_DIR / "config.yaml"
 def load_config():
     if not CONFIG_PATH.exists():
         raise FileNotFoundError(f"Configuration file not found at {CONFIG_PATH}")
-    
+
     with open(CONFIG_PATH, "r") as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
 
 # Global Config Object
 CONFIG = load_config()
 
+def _setting(section: str, key: str, default: Any) -> Any:
+    """An optional setting: `CONFIG[section][key]`, or `default` if the section or key is absent."""
+    return CONFIG.get(section, {}).get(key, default)
+
 # Helper Accessors
 SERVER_HOST = CONFIG["server"]["host"]
 SERVER_PORT = CONFIG["server"]["port"]
 API_URL = CONFIG["server"]["api_url"]
 
+FRONTEND_CONNECT_TIMEOUT = _setting("frontend", "connect_timeout_s", 3)
+FRONTEND_READ_TIMEOUT = _setting("frontend", "read_timeout_s", 30)
+FRONTEND_CHAT_TIMEOUT = _setting("frontend", "chat_timeout_s", 300)
+FRONTEND_HEALTH_TTL = _setting("frontend", "health_ttl_s", 10)
+FRONTEND_PROFILES_TTL = _setting("frontend", "profiles_ttl_s", 30)
+FRONTEND_DOCS_TTL = _setting("frontend", "docs_ttl_s", 300)
+FRONTEND_HISTORY_WINDOW = _setting("frontend", "history_window", 20)
+
 DATA_DIR = CONFIG["paths"]["data_dir"]
 INDEX_DIR_PDFS = CONFIG["paths"]["index_dir_pdfs"]
 INDEX_DIR_EXAMPLES = CONFIG["paths"]["index_dir_examples"]
+EXTRACTION_CACHE_DIR = _setting("paths", "extraction_cache_dir", "data/cache/pdf_text")
 FEW_SHOT_DATA = CONFIG["paths"]["few_shot_data"]
+SETTINGS_DB = _setting("paths", "settings_db", "settings.db")
 
 EMBEDDING_MODEL = CONFIG["models"]["embedding_model"]
 
+BACKGROUND_INDEX_LOAD = _setting("startup", "background_index_load", True)
+WARM_UP_INDEXES = _setting("startup", "warm_up_indexes", True)
+
+CHUNK_SIZE = _setting("index", "chunk_size", 1000)
+CHUNK_OVERLAP = _setting("index", "chunk_overlap", 200)
+INDEX_STORAGE = _setting("index", "storage", "flat")
+INDEX_RERANK = _setting("index", "rerank", True)
+INDEX_RERANK_FACTOR = _setting("index", "rerank_factor", 4)
+INDEX_PQ_M = _setting("index", "pq_m", 96)
+INDEX_PQ_BITS = _setting("index", "pq_bits", 8)
+DEDUP_THRESHOLD = _setting("index", "dedup_threshold", 1.0)
+DEDUP_NUM_PERM = _setting("index", "dedup_num_perm", 128)
+INDEX_SHARDS = _setting("index", "shards", 1)
+INDEX_SHARD_THREADS = _setting("index", "shard_threads", 0)
+
+SHARED_INDEX = _setting("serving", "shared_index", False)
+INDEX_WATCH_INTERVAL = _setting("serving", "index_watch_interval_s", 2)
+KEEP_INDEX_VERSIONS = _setting("serving", "keep_index_versions", 2)
+
+RETRIEVE_MAX_QUERIES = _setting("retrieval", "max_queries", 64)
+RETRIEVE_MAX_K = _setting("retrieval", "max_k", 50)
+DOCUMENT_TAGS = _setting("retrieval", "document_tags", {})
+
+EXAMPLES_WATCH_INTERVAL = _setting("examples", "watch_interval_s", 5)
+
+COALESCE_REQUESTS = _setting("concurrency", "coalesce_identical_requests", True)
+DEFAULT_MODEL_CONCURRENCY = _setting("concurrency", "default_model_concurrency", 8)
+MODEL_CONCURRENCY = _setting("concurrency", "model_concurrency", {})
+ADMISSION_MAX_QUEUE = _setting("concurrency", "max_queue", 32)
+ADMISSION_MAX_WAIT = _setting("concurrency", "max_wait_s", 10)
+
+ROUTING_TIERS = _setting("routing", "tiers", [{"model": "gemini-2.5-flash", "expected_latency_ms": 3000}])
+ROUTING_DEFAULT_BUDGET_MS = _setting("routing", "default_latency_budget_ms", 30000)
+ROUTING_MAX_ERROR_RATE = _setting("routing", "max_error_rate", 0.25)
+
+REQUEST_DEADLINE = _setting("resilience", "request_deadline_s", 90)
+LLM_TIMEOUT = _setting("resilience", "llm_timeout_s", 60)
+EMBEDDING_TIMEOUT = _setting("resilience", "embedding_timeout_s", 10)
+RETRY_ATTEMPTS = _setting("resilience", "retry_attempts", 3)
+RETRY_BASE_DELAY = _setting("resilience", "retry_base_delay_s", 0.25)
+RETRY_MAX_DELAY = _setting("resilience", "retry_max_delay_s", 4)
+BREAKER_FAILURE_THRESHOLD = _setting("resilience", "breaker_failure_threshold", 5)
+BREAKER_RESET = _setting("resilience", "breaker_reset_s", 30)
+HEDGE_EMBEDDINGS = _setting("resilience", "hedge_embeddings", True)
+HEDGE_MIN_DELAY_MS = _setting("resilience", "hedge_min_delay_ms", 50)
+LLM_WORKERS = _setting("resilience", "llm_workers", 32)
+EMBEDDING_WORKERS = _setting("resilience", "embedding_workers", 16)
+
+CONVERSATION_IDLE_TTL = _setting("conversations", "idle_ttl_s", 1800)
+CONVERSATION_MAX_SESSIONS = _setting("conversations", "max_sessions", 1000)
+CONVERSATION_TOKEN_BUDGET = _setting("conversations", "history_token_budget", 2000)
+
+LOG_LEVEL = _setting("logging", "level", "INFO")
+
+PROFILING_ENABLED = _setting("debug", "profiling_enabled", False)
+PROFILE_DIR = _setting("debug", "profile_dir", "data/profiles")
+PROFILE_SAMPLE_INTERVAL_MS = _setting("debug", "profile_sample_interval_ms", 5)
+MEMORY_ENDPOINT_ENABLED = _setting("debug", "memory_endpoint_enabled", False)
+TRACEMALLOC_FRAMES = _setting("debug", "tracemalloc_frames", 0)
+
 DOC_HALLUCINATION = CONFIG["documentation"]["hallucination_doc"]
 DOC_MODEL_PARAMETERS = CONFIG["documentation"]["model_parameters_doc"]
 DOC_SAMPLE_QUESTIONS = CONFIG["documentation"]["sample_questions_doc"]
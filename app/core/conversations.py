@@ -0,0 +1,136 @@
+"""
+Script Name:  conversations.py
+Description:  Server-side conversation sessions with token-budgeted history and idle eviction.
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+# Rough chars-per-token ratio for English text; good enough for budgeting context
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+@dataclass
+class Conversation:
+    session_id: str
+    turns: list[tuple[str, str]] = field(default_factory=list)  # (role, content), role in {"human", "ai"}
+    last_access: float = field(default_factory=time.monotonic)
+
+
+class ConversationStore:
+    """
+    In-memory, thread-safe session store.
+
+    History returned for a prompt is trimmed to `token_budget`: the newest turns are kept
+    verbatim and older ones are folded into a one-line summary of the earlier questions.
+    Sessions idle for longer than `idle_ttl` seconds are evicted, and the least recently
+    used session is dropped once `max_sessions` is reached.
+    """
+
+    def __init__(self, idle_ttl: float = 1800, max_sessions: int = 1000, token_budget: int = 2000):
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.token_budget = token_budget
+        self._sessions: OrderedDict[str, Conversation] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _touch(self, session_id: str) -> Conversation:
+        """Returns the session (creating it if needed) and marks it most recently used."""
+        now = time.monotonic()
+        self._evict_idle(now)
+        conversation = self._sessions.get(session_id)
+        if conversation is None:
+            conversation = Conversation(session_id)
+            self._sessions[session_id] = conversation
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        conversation.last_access = now
+        self._sessions.move_to_end(session_id)
+        return conversation
+
+    def _lookup(self, session_id: str) -> Conversation | None:
+        """Returns the session, if it exists, and marks it most recently used."""
+        now = time.monotonic()
+        self._evict_idle(now)
+        conversation = self._sessions.get(session_id)
+        if conversation is not None:
+            conversation.last_access = now
+            self._sessions.move_to_end(session_id)
+        return conversation
+
+    def _evict_idle(self, now: float) -> None:
+        # Sessions are ordered by last access, so idle ones are at the front
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_access <= self.idle_ttl:
+                break
+            self._sessions.popitem(last=False)
+
+    def history(self, session_id: str) -> list[tuple[str, str]]:
+        """
+        Prompt-ready history for the session, trimmed to the token budget. Reading never
+        creates a session; an unknown or evicted one has no history.
+        """
+        with self._lock:
+            conversation = self._lookup(session_id)
+            turns = list(conversation.turns) if conversation else []
+
+        # Whole exchanges only: a kept answer always comes with the question it answers
+        kept: list[tuple[str, str]] = []
+        used = 0
+        for start in range(len(turns) - 2, -1, -2):
+            exchange = turns[start:start + 2]
+            cost = sum(estimate_tokens(content) for _, content in exchange)
+            if used + cost > self.token_budget:
+                break
+            kept[:0] = exchange
+            used += cost
+
+        dropped = turns[:len(turns) - len(kept)]
+        earlier_questions = [content for role, content in dropped if role == "human"]
+        if earlier_questions:
+            summary = "Earlier in this conversation the user asked: " + "; ".join(
+                question.split("\n", 1)[0][:120] for question in earlier_questions[-10:]
+            )
+            kept.insert(0, ("system", summary))
+        return kept
+
+    def append(self, session_id: str, question: str, answer: str) -> None:
+        """Records one completed exchange."""
+        with self._lock:
+            conversation = self._touch(session_id)
+            conversation.turns.append(("human", question))
+            conversation.turns.append(("ai", answer))
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "turns": sum(len(c.turns) for c in self._sessions.values()),
+                "chars": sum(len(content) for c in self._sessions.values() for _, content in c.turns),
+            }
+
+    def memory_usage(self) -> dict:
+        """Session count and approximate bytes held by the store (sessions, turns, text)."""
+        from app.core.memory import approx_size
+
+        with self._lock:
+            return {"entries": len(self._sessions), "bytes": approx_size(self._sessions)}
@@ -0,0 +1,155 @@
+"""
+Script Name:  dedup.py
+Description:  Duplicate chunk elimination at ingestion time: chunks whose text is identical after
+              normalization (or, opt-in, near-duplicates found by MinHash/LSH and confirmed by
+              shingle Jaccard) are stored once with references to every copy's source and page.
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+
+from app.core.chunk_filter import REFERENCES_KEY
+from app.core.telemetry import get_logger
+
+logger = get_logger(__name__)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """
+    The text's words, case-folded and single-spaced: differences in case, whitespace, line
+    breaks and punctuation / formatting marks disappear, while every word and number stays.
+    """
+    return " ".join(_WORD.findall(unicodedata.normalize("NFKC", text).casefold()))
+
+
+def exact_duplicate_groups(texts: list[str]) -> list[list[int]]:
+    """
+    Groups of indices into `texts` whose normalized text is identical, in first-occurrence
+    order; texts without duplicates (and texts with no words) form singleton groups.
+    """
+    groups: dict[str, list[int]] = {}
+    singles = []
+    for i, text in enumerate(texts):
+        key = normalize(text)
+        if key:
+            groups.setdefault(key, []).append(i)
+        else:
+            singles.append([i])
+    return sorted(list(groups.values()) + singles)
+
+
+def shingles(text: str, size: int = 3) -> set[int]:
+    """Hashed word `size`-grams of the normalized text (case and whitespace insensitive)."""
+    words = normalize(text).split()
+    if len(words) < size:
+        return {zlib.crc32(" ".join(words).encode())} if words else set()
+    return {zlib.crc32(" ".join(words[i:i + size]).encode()) for i in range(len(words) - size + 1)}
+
+
+def lsh_bands(num_perm: int, threshold: float) -> tuple[int, int]:
+    """
+    (bands, rows) with bands * rows <= num_perm whose LSH threshold (1/bands)**(1/rows) is
+    closest to, but not above, `threshold`, so pairs at the threshold are likely candidates.
+    """
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if (1 / b) ** (1 / (num_perm // b)) <= threshold]
+    return min(options, key=lambda br: threshold - (1 / br[0]) ** (1 / br[1]), default=(num_perm, 1))
+
+
+class MinHasher:
+    """MinHash signatures over shingle sets with `num_perm` seeded universal hash functions."""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        # a, b < 2**32 and 32-bit shingle hashes keep a * x + b inside uint64
+        self.a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def signature(self, hashed: set[int]) -> np.ndarray:
+        if not hashed:
+            return np.full(len(self.a), _MERSENNE_PRIME, dtype=np.uint64)
+        x = np.fromiter(hashed, dtype=np.uint64, count=len(hashed))[:, None]
+        return ((x * self.a + self.b) % _MERSENNE_PRIME).min(axis=0)
+
+
+def jaccard(a: set[int], b: set[int]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def near_duplicate_groups(texts: list[str], threshold: float = 0.85, num_perm: int = 128) -> list[list[int]]:
+    """
+    Groups of indices into `texts` whose shingle Jaccard similarity is at least `threshold`
+    (transitively), in first-occurrence order; texts without duplicates form singleton groups.
+    """
+    hasher = MinHasher(num_perm)
+    bands, rows = lsh_bands(num_perm, threshold)
+    sets = [shingles(text) for text in texts]
+    signatures = [hasher.signature(s) for s in sets]
+
+    parent = list(range(len(texts)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    checked: set[tuple[int, int]] = set()
+    for band in range(bands):
+        buckets: dict[bytes, list[int]] = {}
+        for i, signature in enumerate(signatures):
+            if sets[i]:
+                buckets.setdefault(signature[band * rows:(band + 1) * rows].tobytes(), []).append(i)
+        for first, *others in buckets.values():
+            # Each member is checked against the bucket's first member only, so a bucket costs
+            # O(size) comparisons; pairs this misses still meet in another band's bucket
+            for other in others:
+                root_a, root_b = find(first), find(other)
+                if root_a == root_b or (first, other) in checked:
+                    continue
+                # Candidates share a band; the exact Jaccard check removes LSH false positives
+                checked.add((first, other))
+                if jaccard(sets[first], sets[other]) >= threshold:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    groups: dict[int, list[int]] = {}
+    for i in range(len(texts)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def collapse_duplicates(chunks: list, threshold: float = 1.0, num_perm: int = 128) -> list:
+    """
+    The chunks (LangChain Documents) with duplicates collapsed: each group keeps its first
+    chunk, whose metadata gains REFERENCES_KEY listing the source and page of every copy.
+    A `threshold` of 1.0 groups only chunks with identical normalized text. Lower values also
+    group near-duplicates (shingle Jaccard >= threshold), which is lossy: chunks that differ by
+    a single word, such as a negation or a dose, can score above 0.9 and be merged.
+    """
+    texts = [chunk.page_content for chunk in chunks]
+    groups = exact_duplicate_groups(texts) if threshold >= 1.0 else near_duplicate_groups(texts, threshold, num_perm)
+    kept = []
+    for group in groups:
+        chunk = chunks[group[0]]
+        if len(group) > 1:
+            references = []
+            for i in group:
+                reference = {"source": chunks[i].metadata.get("source"), "page": chunks[i].metadata.get("page")}
+                if reference not in references:
+                    references.append(reference)
+            chunk = chunk.model_copy(update={"metadata": {**chunk.metadata, REFERENCES_KEY: references}})
+        kept.append(chunk)
+    logger.info("Collapsed duplicate chunks", extra={"fields": {
+        "chunks": len(chunks), "kept": len(kept), "duplicate_groups": sum(len(g) > 1 for g in groups)
+    }})
+    return kept
@@ -0,0 +1,58 @@
+"""
+Script Name:  embeddings.py
+Description:  Embedding client wrapper that applies the resilience policy (timeouts, retries, hedging).
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import inspect
+
+from langchain_core.embeddings import Embeddings
+
+from app.core.resilience import LatencyTracker, Resilience, call_with_timeout, hedged_call
+
+
+class ResilientEmbeddings(Embeddings):
+    """
+    Embeddings wrapper applying the resilience policy. Query embeddings (small, idempotent,
+    on the interactive path) get a per-call timeout and optional hedging; document batches
+    get retries, bounded only by the request deadline when there is one (index builds have none).
+    """
+
+    def __init__(self, inner: Embeddings, resilience: Resilience, timeout: float | None = 10.0,
+                 hedge: bool = True, hedge_min_delay: float = 0.05):
+        self.inner = inner
+        self.resilience = resilience
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.latency = LatencyTracker()
+        # Gemini embeds documents and queries differently; batch query embedding needs the task type
+        self._takes_task_type = "task_type" in inspect.signature(inner.embed_documents).parameters
+
+    def embed_query(self, text: str) -> list[float]:
+        def attempt(timeout: float | None) -> list[float]:
+            if self.hedge:
+                return hedged_call(lambda: self.inner.embed_query(text), self.latency, timeout,
+                                   self.hedge_min_delay, upstream="embeddings")
+            return call_with_timeout(lambda: self.inner.embed_query(text), timeout, upstream="embeddings")
+        return self.resilience.call("embeddings", attempt, timeout=self.timeout)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.resilience.call(
+            "embeddings",
+            lambda timeout: call_with_timeout(lambda: self.inner.embed_documents(texts), timeout, upstream="embeddings")
+        )
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """Query-side embeddings for many texts in one batched request (same vectors as `embed_query`)."""
+        kwargs = {"task_type": "RETRIEVAL_QUERY"} if self._takes_task_type else {}
+        return self.resilience.call(
+            "embeddings",
+            lambda timeout: call_with_timeout(lambda: self.inner.embed_documents(texts, **kwargs), timeout,
+                                              upstream="embeddings"),
+            timeout=self.timeout
+        )
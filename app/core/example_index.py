@@ -0,0 +1,249 @@
+"""
+Script Name:  example_index.py
+Description:  Compact in-memory vector index for the few-shot example store (NumPy matmul top-k).
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from app.core.telemetry import get_logger
+
+logger = get_logger(__name__)
+
+# On-disk layout (all raw, so new examples can be appended without rewriting the index):
+#   vectors.f32  row-major float32 matrix, one L2-normalized embedding per example
+#   offsets.i64  int64 byte offset of each example's line in the source JSONL
+#   meta.json    dimension, row count, embedding model and the indexed length of the source
+VECTORS_FILE = "vectors.f32"
+OFFSETS_FILE = "offsets.i64"
+META_FILE = "meta.json"
+
+
+@contextmanager
+def locked(index_dir: Path) -> Iterator[None]:
+    """Exclusive cross-process lock on an index directory (workers share the saved files)."""
+    import fcntl  # POSIX only; imported here so the module loads where locking is never used
+
+    with open(index_dir / ".lock", "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def parse_example(line: str | bytes) -> tuple[str, str] | None:
+    """Returns (question, answer) from one chat-format JSONL line, or None if incomplete."""
+    item = json.loads(line)
+    messages = item.get("messages", [])
+    question = next((m["content"] for m in messages if m["role"] == "user"), "")
+    answer = next((m["content"] for m in messages if m["role"] == "assistant"), "")
+    if question and answer:
+        return question, answer
+    return None
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalizes rows in place (so a dot product is cosine similarity)."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors /= norms
+    return vectors
+
+
+def top_k(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Row-wise top-k of a (queries, examples) score matrix, best first.
+    argpartition selects the k best in O(n); only those k are then sorted.
+    """
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), (scores.shape[0], k))
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1, kind="stable")
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+
+class ExampleIndex:
+    """
+    Normalized embedding matrix plus a parallel array of byte offsets into the source JSONL.
+    Only the vectors live in memory; example text is read back from the source file for the
+    handful of rows a search returns.
+    """
+
+    def __init__(self, source_path: str, vectors: np.ndarray, offsets: np.ndarray, source_size: int,
+                 model: str | None = None):
+        self.source_path = source_path
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.offsets = np.ascontiguousarray(offsets, dtype=np.int64)
+        self.source_size = source_size  # bytes of the source file covered by the index
+        self.model = model
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes + self.offsets.nbytes
+
+    # --- Build / persistence ---
+
+    @staticmethod
+    def read_source(source_path: str, start: int = 0) -> tuple[list[str], list[int], int]:
+        """Parses the JSONL from byte `start`: (questions, line offsets, end offset of the last full line)."""
+        questions, offsets = [], []
+        end = start
+        with open(source_path, "rb") as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # A trailing partial line may still be being written; pick it up later
+                    try:
+                        json.loads(line)
+                    except ValueError:
+                        break
+                parsed = parse_example(line) if line.strip() else None
+                if parsed:
+                    questions.append(parsed[0])
+                    offsets.append(end)
+                end += len(line)
+        return questions, offsets, end
+
+    @classmethod
+    def build(cls, source_path: str, embeddings, model: str | None = None) -> "ExampleIndex | None":
+        """Embeds every question in the source JSONL. Returns None if there are no examples."""
+        questions, offsets, end = cls.read_source(source_path)
+        if not questions:
+            return None
+        vectors = normalize(np.asarray(embeddings.embed_documents(questions), dtype=np.float32))
+        return cls(source_path, vectors, np.asarray(offsets), end, model)
+
+    def save(self, index_dir: str) -> None:
+        path = Path(index_dir)
+        path.mkdir(parents=True, exist_ok=True)
+        with locked(path):
+            self.vectors.tofile(path / VECTORS_FILE)
+            self.offsets.tofile(path / OFFSETS_FILE)
+            self._write_meta(path)
+
+    def _write_meta(self, path: Path, count: int | None = None, source_size: int | None = None) -> None:
+        meta = {"dim": self.dim, "count": len(self) if count is None else count, "model": self.model,
+                "source_size": self.source_size if source_size is None else source_size}
+        tmp = path / (META_FILE + ".tmp")
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, path / META_FILE)  # meta is the commit point: readers trust `count` rows
+
+    @classmethod
+    def load(cls, index_dir: str, source_path: str) -> "ExampleIndex":
+        """Loads a saved index; raises if it is missing or inconsistent."""
+        path = Path(index_dir)
+        meta = json.loads((path / META_FILE).read_text())
+        count, dim = meta["count"], meta["dim"]
+        vectors = np.fromfile(path / VECTORS_FILE, dtype=np.float32, count=count * dim).reshape(count, dim)
+        offsets = np.fromfile(path / OFFSETS_FILE, dtype=np.int64, count=count)
+        if len(offsets) != count:
+            raise ValueError(f"Index at {index_dir} is truncated")
+        return cls(source_path, vectors, offsets, meta["source_size"], meta.get("model"))
+
+    def refresh(self, embeddings, index_dir: str | None = None) -> int:
+        """
+        Embeds examples appended to the source since it was indexed and adds them to the
+        matrix (and to the saved files under `index_dir`). Returns the number added.
+        Raises ValueError if the source shrank, i.e. was rewritten rather than appended to.
+        """
+        size = os.path.getsize(self.source_path)
+        if size < self.source_size:
+            raise ValueError(f"{self.source_path} shrank; a full rebuild is required")
+        if size == self.source_size:
+            return 0
+
+        questions, offsets, end = self.read_source(self.source_path, start=self.source_size)
+        if questions:
+            vectors = normalize(np.asarray(embeddings.embed_documents(questions), dtype=np.float32))
+            new_offsets = np.asarray(offsets, dtype=np.int64)
+        if index_dir:
+            self._persist(Path(index_dir), vectors if questions else None,
+                          new_offsets if questions else None, end)
+        if questions:
+            # Offsets grow before vectors, so a concurrent search never sees a row without its offset
+            self.offsets = np.concatenate([self.offsets, new_offsets])
+            self.vectors = np.concatenate([self.vectors, vectors])
+        self.source_size = end
+        return len(questions)
+
+    def _persist(self, path: Path, vectors: np.ndarray | None, offsets: np.ndarray | None, end: int) -> None:
+        """
+        Appends the new rows to the saved files and commits meta.json. Every worker of a
+        multi-worker server refreshes the same files, so this runs under a file lock and is
+        skipped when another worker has already saved the same rows.
+        """
+        added = 0 if offsets is None else len(offsets)
+        with locked(path):
+            try:
+                meta = json.loads((path / META_FILE).read_text())
+                if meta.get("source_size") == end and meta.get("count") == len(self) + added:
+                    return
+            except (OSError, ValueError):
+                pass
+            if added:
+                self._append_files(path, vectors, offsets)
+            self._write_meta(path, count=len(self) + added, source_size=end)
+
+    def _append_files(self, path: Path, vectors: np.ndarray, offsets: np.ndarray) -> None:
+        for name, existing, new in ((VECTORS_FILE, self.vectors, vectors), (OFFSETS_FILE, self.offsets, offsets)):
+            with open(path / name, "ab") as f:
+                # Drop rows left behind by an append that crashed before meta.json was updated
+                f.truncate(existing.nbytes)
+                new.tofile(f)
+
+    # --- Search ---
+
+    def search_vectors(self, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Scores a batch of query embeddings against every example with a single matmul.
+        Returns (row indices, cosine scores), each shaped (queries, k), best first.
+        """
+        queries = normalize(np.array(queries, dtype=np.float32, ndmin=2))
+        if not len(self) or k <= 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        return top_k(queries @ self.vectors.T, k)
+
+    def examples(self, rows: np.ndarray, scores: np.ndarray | None = None) -> list[dict]:
+        """Reads the given rows back from the source JSONL as {"question", "answer", "score"} dicts."""
+        results = []
+        with open(self.source_path, "rb") as f:
+            for i, row in enumerate(rows):
+                f.seek(int(self.offsets[row]))
+                try:
+                    parsed = parse_example(f.readline())
+                except (ValueError, KeyError, TypeError):
+                    parsed = None
+                if parsed is None:
+                    # The source was edited in place since it was indexed; skip rather than fail the search
+                    logger.warning("Skipping unreadable example row", extra={"fields": {
+                        "source": self.source_path, "row": int(row), "offset": int(self.offsets[row])
+                    }})
+                    continue
+                question, answer = parsed
+                example = {"question": question, "answer": answer}
+                if scores is not None:
+                    example["score"] = round(float(scores[i]), 4)
+                results.append(example)
+        return results
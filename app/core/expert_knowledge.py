@@ -9,93 +9,215 @@ Copyright (c) 2026
 License: MIT
 """
 
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_core.documents import Document
 from langchain_core.example_selectors import BaseExampleSelector
+from typing import TYPE_CHECKING
 import json
 import os
+import threading
+
+import numpy as np
+
+from app.core.config import EMBEDDING_MODEL, INDEX_DIR_EXAMPLES, FEW_SHOT_DATA
+from app.core.example_index import ExampleIndex
+from app.core.prompts import format_examples
+from app.core.readiness import warm_up_search
+from app.core.services import get_embeddings
+from app.core.telemetry import get_logger
+
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+
+logger = get_logger(__name__)
+
+# System turn written with new examples, matching the curated dataset
+EXAMPLE_SYSTEM_PROMPT = "You are a precise medical research assistant."
 
-from app.core.config import INDEX_DIR_EXAMPLES, EMBEDDING_MODEL, FEW_SHOT_DATA
 
 class ExpertKnowledgeService(BaseExampleSelector):
-    def __init__(self, index_dir: str = INDEX_DIR_EXAMPLES):
-        self.vector_store: FAISS | None = None
+    def __init__(self, index_dir: str = INDEX_DIR_EXAMPLES, embeddings: "Embeddings | None" = None):
+        # Few-shot examples are few and small, so a plain NumPy matrix (ExampleIndex)
+        # replaces a FAISS store: one matmul per search and no pickled docstore.
+        self.vector_store: ExampleIndex | None = None
         self.index_dir = index_dir
-        # Reuse the same embedding model as RAG
-        self.embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
+        # Reuse the same embedding client as RAG (shared, created on first use)
+        self._embeddings = embeddings
         self.data_path = FEW_SHOT_DATA
+        # Serializes index updates (add_example, the file watcher and rebuilds)
+        self._update_lock = threading.RLock()
+        self._watch_stop: threading.Event | None = None
 
-    def add_example(self, example: dict[str, str]) -> None:
-        """Required by BaseExampleSelector, but we load from disk efficiently."""
-        pass
+    @property
+    def embeddings(self) -> "Embeddings":
+        if self._embeddings is None:
+            self._embeddings = get_embeddings()
+        return self._embeddings
 
-    def load_and_index(self) -> None:
+    @embeddings.setter
+    def embeddings(self, value: "Embeddings") -> None:
+        self._embeddings = value
+
+    def add_example(self, example: dict[str, str]) -> int:
+        """
+        Appends one {"question", "answer"} example to the JSONL, then embeds and indexes
+        just the new line (no full rebuild). Returns the number of indexed examples.
+        """
+        question, answer = example["question"].strip(), example["answer"].strip()
+        if not question or not answer:
+            raise ValueError("Both question and answer are required")
+        line = json.dumps({"messages": [
+            {"role": "system", "content": EXAMPLE_SYSTEM_PROMPT},
+            {"role": "user", "content": question},
+            {"role": "assistant", "content": answer},
+        ]})
+
+        with self._update_lock:
+            with open(self.data_path, "a+b") as f:
+                # Keep one example per line even if the file lacks a trailing newline
+                f.seek(0, os.SEEK_END)
+                if f.tell():
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")
+                f.write(line.encode() + b"\n")
+            self.refresh()
+            return len(self.vector_store) if self.vector_store else 0
+
+    def refresh(self) -> int:
         """
-        Loads JSONL examples and builds a FAISS index, utilizing disk persistence.
-        If an index exists, it loads it; otherwise, it builds a new one.
+        Indexes lines appended to the JSONL since the last load (by byte offset).
+        Falls back to a full rebuild if the file was rewritten. Returns the number added.
         """
-        # 1. Try to load existing index
-        if os.path.exists(self.index_dir):
-            print(f"Loading existing Expert Knowledge index from {self.index_dir}...")
+        with self._update_lock:
+            if self.vector_store is None:
+                self.load_and_index()
+                return len(self.vector_store) if self.vector_store else 0
             try:
-                self.vector_store = FAISS.load_local(
-                    self.index_dir, 
-                    self.embeddings, 
-                    allow_dangerous_deserialization=True
-                )
-                print("Expert Index loaded successfully.")
-                return
-            except Exception as e:
-                print(f"Error loading Expert index: {e}. Rebuilding...")
+                added = self.vector_store.refresh(self.embeddings, self.index_dir)
+            except ValueError as e:
+                logger.warning(f"{e}. Rebuilding...")
+                self.load_and_index()
+                return len(self.vector_store) if self.vector_store else 0
+        if added:
+            logger.info(f"Indexed {added} new expert examples ({len(self.vector_store)} total).")
+        return added
+
+    def start_watching(self, interval: float) -> None:
+        """Polls the JSONL every `interval` seconds and indexes appended examples."""
+        if self._watch_stop is not None:
+            return
+        self._watch_stop = stop = threading.Event()
+
+        def watch():
+            while not stop.wait(interval):
+                try:
+                    if self.vector_store is None or os.path.getsize(self.data_path) != self.vector_store.source_size:
+                        self.refresh()
+                except FileNotFoundError:
+                    pass
+                except Exception:
+                    logger.exception("Expert example watcher failed to refresh")
+
+        threading.Thread(target=watch, name="examples-watcher", daemon=True).start()
+
+    def stop_watching(self) -> None:
+        if self._watch_stop is not None:
+            self._watch_stop.set()
+            self._watch_stop = None
 
-        # 2. Rebuild index from Source
+    def load_and_index(self) -> None:
+        """
+        Loads the saved example index, utilizing disk persistence.
+        Lines appended to the JSONL since it was saved are indexed incrementally; it is
+        rebuilt from scratch if missing, unreadable, or stale (the source file was
+        rewritten or the embedding model changed).
+        """
         if not os.path.exists(self.data_path):
-            print(f"Warning: Example data not found at {self.data_path}")
+            logger.warning(f"Example data not found at {self.data_path}")
             return
 
-        documents = []
-        try:
-            with open(self.data_path, "r") as f:
-                for line in f:
-                    item = json.loads(line)
-                    messages = item.get("messages", [])
-                    user_msg = next((m["content"] for m in messages if m["role"] == "user"), "")
-                    assistant_msg = next((m["content"] for m in messages if m["role"] == "assistant"), "")
-                    
-                    if user_msg and assistant_msg:
-                        # Improve semantic search by embedding only the Question
-                        # but storing the full Q/A pair in metadata for retrieval.
-                        full_text = f"Q: {user_msg}\nA: {assistant_msg}"
-                        doc = Document(page_content=user_msg, metadata={"full_example": full_text})
-                        documents.append(doc)
-            
-            if documents:
-                print(f"Indexing {len(documents)} expert examples...")
-                self.vector_store = FAISS.from_documents(documents, self.embeddings)
-                print(f"Saving Expert Store to {self.index_dir}...")
-                self.vector_store.save_local(self.index_dir)
-                print("Expert Store created and saved.")
-                
-        except Exception as e:
-            print(f"Error indexing examples: {e}")
+        with self._update_lock:
+            source_size = os.path.getsize(self.data_path)
+
+            # 1. Try to load existing index
+            if os.path.exists(self.index_dir):
+                logger.info(f"Loading existing Expert Knowledge index from {self.index_dir}...")
+                try:
+                    index = ExampleIndex.load(self.index_dir, self.data_path)
+                    if index.source_size <= source_size and index.model == EMBEDDING_MODEL:
+                        index.refresh(self.embeddings, self.index_dir)
+                        self.vector_store = index
+                        logger.info(f"Expert Index loaded successfully ({len(index)} examples).")
+                        return
+                    logger.info("Expert index is stale. Rebuilding...")
+                except Exception as e:
+                    logger.warning(f"Error loading Expert index: {e}. Rebuilding...")
+
+            # 2. Rebuild index from Source
+            try:
+                index = ExampleIndex.build(self.data_path, self.embeddings, model=EMBEDDING_MODEL)
+                if index is not None:
+                    logger.info(f"Indexed {len(index)} expert examples. Saving to {self.index_dir}...")
+                    index.save(self.index_dir)
+                    self.vector_store = index
+                    logger.info("Expert Store created and saved.")
+            except Exception as e:
+                logger.error(f"Error indexing examples: {e}")
+
+    def warm_up(self) -> None:
+        """Pages the example matrix into memory with one throwaway search."""
+        if self.vector_store:
+            warm_up_search(self.vector_store.search_vectors, self.vector_store.dim, len(self.vector_store))
+
+    def memory_usage(self) -> dict | None:
+        """Size of the loaded example matrix and offsets (the example text stays on disk)."""
+        index = self.vector_store
+        if index is None:
+            return None
+        return {"index": {"type": type(index).__name__, "vectors": len(index), "dim": index.dim,
+                          "bytes": index.nbytes}}
 
     def select_examples(self, input_variables: dict[str, str] | str) -> list[dict]:
         """
-        Selects examples based on input variables. 
-        Note: The BaseExampleSelector signature expects a dict, but we often pass a string query text.
-        We return a list of examples (dicts) to match the interface, 
-        but our consumer (app.py) currently expects a string block.
-        
-        To maintain backward compatibility with our own app:
-        We will keep the `select_examples` as the main logic but add a standardized method if needed.
+        Selects examples based on input variables (BaseExampleSelector interface).
+        Accepts a {"query": ...} dict or the query text itself, and returns structured
+        {"question", "answer", "score"} examples.
         """
         # Standardize query extraction
         query = input_variables
         if isinstance(input_variables, dict):
              query = input_variables.get("query", "")
 
-        return self.search(query)
+        return self.search_examples(query)
+
+    def search_examples(self, query: str, k: int = 3) -> list[dict]:
+        """Top-k examples for `query` as {"question", "answer", "score"} dicts, best first."""
+        if not self.vector_store:
+            return []
+        return self.search_examples_by_vector(self.embeddings.embed_query(query), k=k)
+
+    def search_examples_by_vector(self, embedding: list[float], k: int = 3) -> list[dict]:
+        """Same as `search_examples`, for a query that has already been embedded."""
+        if not self.vector_store:
+            return []
+        rows, scores = self.vector_store.search_vectors(np.asarray(embedding, dtype=np.float32), k)
+        return self.vector_store.examples(rows[0], scores[0])
+
+    def search_batch(self, queries: list[str], k: int = 3) -> list[list[dict]]:
+        """
+        Top-k examples for many queries: one embedding request and one matmul
+        for the whole batch. Results are in query order, and the same as `search_examples`
+        gives for each query (query-side embeddings, not document-side).
+        """
+        if not self.vector_store or not queries:
+            return [[] for _ in queries]
+        embed_queries = getattr(self.embeddings, "embed_queries", None)
+        if embed_queries is not None:
+            vectors = embed_queries(queries)
+        else:
+            vectors = [self.embeddings.embed_query(q) for q in queries]
+        vectors = np.asarray(vectors, dtype=np.float32)
+        rows, scores = self.vector_store.search_vectors(vectors, k)
+        return [self.vector_store.examples(r, s) for r, s in zip(rows, scores)]
 
     def search(self, query: str, k: int = 3) -> str:
         """
@@ -106,10 +228,19 @@ class ExpertKnowledgeService(BaseExampleSelector):
             return "No examples indexed."
         
         try:
-            docs = self.vector_store.similarity_search(query, k=k)
-            return "\n\n".join([d.metadata["full_example"] for d in docs])
+            return format_examples(self.search_examples(query, k=k))
         except Exception as e:
             return f"Error selecting examples: {e}"
 
-# Singleton instance
-expert_service = ExpertKnowledgeService()
+    def search_by_vector(self, embedding: list[float], k: int = 3) -> str:
+        """
+        Same as `search`, for a query that has already been embedded
+        (lets the chat path share one embedding between retrieval and example selection).
+        """
+        if not self.vector_store:
+            return "No examples indexed."
+
+        try:
+            return format_examples(self.search_examples_by_vector(embedding, k=k))
+        except Exception as e:
+            return f"Error selecting examples: {e}"
@@ -0,0 +1,95 @@
+"""
+Script Name:  extraction_cache.py
+Description:  On-disk cache of per-page PDF text and metadata, keyed by the PDF's content hash
+              and the parser version, so re-chunking / re-indexing never re-parses PDFs.
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from app.core.telemetry import get_logger
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+logger = get_logger(__name__)
+
+# Bump when the entry layout changes
+CACHE_FORMAT = 1
+
+
+def parser_version() -> str:
+    """Identifies the extraction code: a new pypdf or loader release may extract different text."""
+    def installed(package: str) -> str:
+        try:
+            return version(package)
+        except PackageNotFoundError:
+            return "unknown"
+    return f"v{CACHE_FORMAT}-pypdf{installed('pypdf')}-lc{installed('langchain-community')}"
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    One gzip-compressed JSON entry per (PDF content, parser version) holding each page's
+    text and loader metadata. The `source` metadata is not stored; it is set from the path
+    being loaded, so renamed or copied PDFs still hit the cache.
+    """
+
+    def __init__(self, cache_dir: str, parser: str | None = None):
+        self.cache_dir = Path(cache_dir)
+        self.parser = parser or parser_version()
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, sha256: str) -> Path:
+        return self.cache_dir / f"{sha256}.{self.parser}.json.gz"
+
+    def load_pdf(self, path: str) -> list["Document"]:
+        """The PDF's pages as Documents, from the cache or parsed (and cached) on a miss."""
+        from langchain_core.documents import Document
+
+        entry = self.entry_path(file_sha256(path))
+        try:
+            with gzip.open(entry, "rt", encoding="utf-8") as f:
+                pages = json.load(f)
+            self.hits += 1
+        except FileNotFoundError:
+            pages = self._extract(path, entry)
+            self.misses += 1
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable extraction cache entry {entry.name}: {e}")
+            pages = self._extract(path, entry)
+            self.misses += 1
+        return [Document(page_content=page["text"], metadata={**page["metadata"], "source": path})
+                for page in pages]
+
+    def _extract(self, path: str, entry: Path) -> list[dict]:
+        from langchain_community.document_loaders import PyPDFLoader
+
+        pages = [{"text": doc.page_content,
+                  "metadata": {k: v for k, v in doc.metadata.items() if k != "source"}}
+                 for doc in PyPDFLoader(path).load()]
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = entry.with_name(entry.name + f".{os.getpid()}.tmp")
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(pages, f, separators=(",", ":"), default=str)
+        os.replace(tmp, entry)  # a crash never leaves a truncated entry behind
+        return pages
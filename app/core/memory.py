@@ -0,0 +1,145 @@
+"""
+Script Name:  memory.py
+Description:  Memory accounting for GET /debug/memory: process RSS, FAISS index and docstore
+              sizes, approximate object-graph sizes for caches, and tracemalloc heap snapshots.
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import itertools
+import sys
+import threading
+from collections.abc import Iterable
+from typing import Any
+
+# Process-level fields read from /proc/self/status (kB)
+_PROC_FIELDS = {"VmRSS": "rss_bytes", "VmHWM": "peak_rss_bytes", "RssAnon": "anon_bytes",
+                "RssFile": "file_backed_bytes", "VmSwap": "swap_bytes"}
+
+_snapshot_lock = threading.Lock()
+_last_snapshot = None  # previous tracemalloc snapshot, for growth between two calls
+
+
+def process_memory() -> dict:
+    """Resident memory of this process; from /proc on Linux, else peak RSS from getrusage."""
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return {name: int(fields[key].split()[0]) * 1024 for key, name in _PROC_FIELDS.items() if key in fields}
+    except OSError:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"peak_rss_bytes": peak if sys.platform == "darwin" else peak * 1024}
+
+
+def approx_size(obj: Any, _seen: set[int] | None = None) -> int:
+    """
+    Approximate bytes held by `obj` and everything it references (containers, instance
+    attributes, NumPy buffers), counting shared objects once. Memory-mapped arrays count
+    as zero: their pages belong to the page cache, not this object.
+    """
+    seen = _seen if _seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    if hasattr(obj, "nbytes") and hasattr(obj, "dtype"):  # NumPy array
+        return 0 if getattr(obj, "filename", None) else int(obj.nbytes)
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool)) or obj is None:
+        return size
+    if isinstance(obj, dict):
+        return size + sum(approx_size(k, seen) + approx_size(v, seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(approx_size(item, seen) for item in obj)
+    if hasattr(obj, "__dict__"):
+        size += approx_size(vars(obj), seen)
+    return size
+
+
+def sampled_size(values: Iterable, count: int, sample: int = 256) -> int:
+    """Bytes of `count` similar objects, extrapolated from the first `sample` of them."""
+    head = list(itertools.islice(values, sample))
+    if not head:
+        return 0
+    return int(sum(approx_size(value) for value in head) / len(head) * count)
+
+
+def faiss_index_memory(index) -> dict:
+    """Type, vector count, dimension and in-memory code bytes of a FAISS (or wrapped) index."""
+    from app.core.quantization import RerankedIndex, index_nbytes
+    from app.core.sharding import ShardedIndex
+
+    if isinstance(index, ShardedIndex):
+        shards = [faiss_index_memory(shard) for shard in index.shards]
+        return {"type": "ShardedIndex", "vectors": index.ntotal, "dim": index.d,
+                "bytes": sum(shard["bytes"] for shard in shards), "shards": shards}
+    if isinstance(index, RerankedIndex):
+        report = faiss_index_memory(index.index)
+        # Full-precision vectors for re-ranking are memory-mapped; only candidate rows are paged in
+        report["rerank_mapped_bytes"] = int(index.exact.nbytes) if index.exact is not None else 0
+        return report
+    return {"type": type(index).__name__, "vectors": int(index.ntotal), "dim": int(index.d),
+            "bytes": index_nbytes(index)}
+
+
+def vector_store_memory(store) -> dict:
+    """The FAISS index, docstore and row -> id mapping of a LangChain FAISS store."""
+    from app.core.shared_index import MappedDocstore
+
+    docstore = store.docstore
+    if isinstance(docstore, MappedDocstore):
+        docs = {"type": "MappedDocstore", "entries": len(docstore), "bytes": docstore.offsets.nbytes,
+                "mapped_bytes": len(docstore._map)}
+    else:
+        entries = getattr(docstore, "_dict", {})
+        docs = {"type": type(docstore).__name__, "entries": len(entries),
+                "bytes": sys.getsizeof(entries) + sampled_size(entries.values(), len(entries))}
+    id_map = store.index_to_docstore_id
+    return {
+        "index": faiss_index_memory(store.index),
+        "docstore": docs,
+        # Mapped versions compute ids from row numbers instead of storing them
+        "id_map": {"entries": len(id_map),
+                   "bytes": (sys.getsizeof(id_map) + sampled_size(id_map.values(), len(id_map)))
+                   if isinstance(id_map, dict) else 0},
+    }
+
+
+def tracemalloc_report(top: int = 20) -> dict:
+    """
+    Top allocation sites by size from a tracemalloc snapshot, plus the sites that grew most
+    since the previous call. Tracing must already be on (debug.tracemalloc_frames).
+    """
+    import tracemalloc
+
+    if not tracemalloc.is_tracing():
+        return {"tracing": False}
+
+    global _last_snapshot
+    snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    current, peak = tracemalloc.get_traced_memory()
+
+    def site(stat) -> str:
+        frame = stat.traceback[0]
+        return f"{frame.filename}:{frame.lineno}"
+
+    report = {
+        "tracing": True,
+        "traced_bytes": current,
+        "peak_traced_bytes": peak,
+        "top": [{"site": site(stat), "bytes": stat.size, "blocks": stat.count}
+                for stat in snapshot.statistics("lineno")[:top]],
+    }
+    with _snapshot_lock:
+        if _last_snapshot is not None:
+            report["growth_since_last"] = [
+                {"site": site(stat), "bytes_diff": stat.size_diff, "bytes": stat.size}
+                for stat in snapshot.compare_to(_last_snapshot, "lineno")[:top] if stat.size_diff > 0
+            ]
+        _last_snapshot = snapshot
+    return report
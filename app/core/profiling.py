@@ -0,0 +1,247 @@
+"""
+Script Name:  profiling.py
+Description:  Opt-in per-request profiling (sampling or deterministic) for debugging slow queries.
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import cProfile
+import functools
+import inspect
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, TypeVar
+
+F = TypeVar("F", bound=Callable)
+
+PROFILE_MODES = ("sample", "cprofile")
+
+# Before 3.12 a cProfile.Profile covers only the thread that enabled it. From 3.12 it is built
+# on sys.monitoring: one active profiler per interpreter, covering every thread.
+_PER_THREAD_PROFILERS = sys.version_info < (3, 12)
+
+# The profile collecting data for the request currently being served (if any)
+_active_profile: ContextVar["RequestProfile | None"] = ContextVar("active_profile", default=None)
+
+
+class RequestProfile:
+    """
+    Profiles every thread that works on a single request.
+
+    * `sample`   - a background thread snapshots the attached threads' stacks every
+                   `interval` seconds; output is collapsed stacks ("a;b;c 12"), which
+                   flamegraph.pl / speedscope consume directly. Time spent blocked on the
+                   network shows up as samples in socket/ssl frames.
+    * `cprofile` - deterministic cProfile; output is a pstats file. Before Python 3.12 each
+                   attached thread gets its own profiler. From 3.12 one interpreter-wide
+                   profiler runs for the whole request, so it also counts unrelated threads
+                   that ran meanwhile. Anything that could not be covered is listed in `notes`.
+    """
+
+    def __init__(self, mode: str = "sample", interval: float = 0.005):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}'. Expected one of {PROFILE_MODES}.")
+        self.mode = mode
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self._threads: set[int] = set()
+        self._profilers: list[cProfile.Profile] = []
+        self._interpreter_profiler: cProfile.Profile | None = None
+        self.notes: list[str] = []  # what the profile does not (or not only) cover
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: threading.Thread | None = None
+
+    # --- lifecycle ---
+
+    def start(self) -> None:
+        if self.mode == "sample":
+            self._sampler = threading.Thread(target=self._sample_loop, name="request-profiler", daemon=True)
+            self._sampler.start()
+        elif not _PER_THREAD_PROFILERS:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError as e:
+                self.notes.append(f"Nothing was recorded: {e} (another profiled request is running)")
+                return
+            self._interpreter_profiler = profiler
+            self.notes.append("Interpreter-wide profile: includes every thread that ran during the request")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+        if self._interpreter_profiler is not None:
+            self._interpreter_profiler.disable()
+            self._profilers.append(self._interpreter_profiler)
+            self._interpreter_profiler = None
+
+    @contextmanager
+    def attach(self) -> Iterator[None]:
+        """Profiles the calling thread for the duration of the block (re-entrant per thread)."""
+        ident = threading.get_ident()
+        with self._lock:
+            if ident in self._threads:
+                nested = True
+            else:
+                nested = False
+                self._threads.add(ident)
+        if nested:
+            yield
+            return
+
+        profiler = cProfile.Profile() if self.mode == "cprofile" and _PER_THREAD_PROFILERS else None
+        if profiler:
+            try:
+                profiler.enable()
+            except ValueError as e:
+                # e.g. another profiling tool already owns this thread
+                profiler = None
+                with self._lock:
+                    self.notes.append(f"Thread {threading.current_thread().name} was not profiled: {e}")
+        try:
+            yield
+        finally:
+            if profiler:
+                profiler.disable()
+            with self._lock:
+                self._threads.discard(ident)
+                if profiler:
+                    self._profilers.append(profiler)
+
+    # --- sampling ---
+
+    def _sample_loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                threads = set(self._threads)
+            frames = sys._current_frames()
+            for ident in threads:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.samples[_collapse(frame)] += 1
+
+    # --- output ---
+
+    def collapsed(self) -> str:
+        """Collapsed-stack text (one `stack count` line per unique stack)."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def stats(self) -> pstats.Stats | None:
+        """Merged pstats across all attached threads (cprofile mode only)."""
+        stats = None
+        for profiler in self._profilers:
+            if stats is None:
+                stats = pstats.Stats(profiler)
+            else:
+                stats.add(profiler)
+        return stats
+
+    def render(self) -> str:
+        """Human/tool readable output returned inline by the API."""
+        if self.mode == "sample":
+            return self.collapsed()
+        buffer = io.StringIO()
+        for note in self.notes:
+            buffer.write(f"# {note}\n")
+        stats = self.stats()
+        if stats is None:
+            return buffer.getvalue()
+        stats.stream = buffer
+        stats.sort_stats("cumulative").print_stats(50)
+        return buffer.getvalue()
+
+    def save(self, directory: str, name: str) -> str:
+        """Writes the profile to `directory` and returns the file path."""
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        if self.mode == "sample":
+            path = os.path.join(directory, f"{stamp}-{name}.collapsed")
+            with open(path, "w") as f:
+                f.write(self.collapsed())
+        else:
+            path = os.path.join(directory, f"{stamp}-{name}.prof")
+            stats = self.stats()
+            # Same format as pstats.Stats.dump_stats; loadable by snakeviz / pstats
+            with open(path, "wb") as f:
+                marshal.dump(stats.stats if stats else {}, f)
+        return path
+
+
+def _collapse(frame) -> str:
+    """Formats a frame chain root-first as `func (file:line);func (file:line);...`."""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+@contextmanager
+def profile_request(mode: str = "sample", interval: float = 0.005) -> Iterator[RequestProfile]:
+    """Activates a RequestProfile for the current context and the calling thread."""
+    profile = RequestProfile(mode=mode, interval=interval)
+    token = _active_profile.set(profile)
+    profile.start()
+    try:
+        with profile.attach():
+            yield profile
+    finally:
+        profile.stop()
+        _active_profile.reset(token)
+
+
+@contextmanager
+def profile_thread() -> Iterator[None]:
+    """
+    Includes the calling thread in the active request profile, if any.
+    A no-op outside a profiled request, so it is safe on hot paths.
+    """
+    profile = _active_profile.get()
+    if profile is None:
+        yield
+        return
+    with profile.attach():
+        yield
+
+
+def profiled(func: F) -> F:
+    """
+    Decorator form of `profile_thread` for service entry points. Generator functions are
+    profiled per step: each `next()` attaches whichever thread drives it (a streamed response
+    may be advanced by different worker threads), and the time between steps is not counted.
+    """
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def generator_wrapper(*args, **kwargs):
+            gen = func(*args, **kwargs)
+            try:
+                while True:
+                    with profile_thread():
+                        try:
+                            item = next(gen)
+                        except StopIteration as stop:
+                            return stop.value
+                    yield item
+            finally:
+                gen.close()
+        return generator_wrapper  # type: ignore[return-value]
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with profile_thread():
+            return func(*args, **kwargs)
+    return wrapper  # type: ignore[return-value]
@@ -0,0 +1,91 @@
+"""
+Script Name:  prompts.py
+Description:  Registry of prompt-engineering templates and their server-side rendering.
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+PROMPT_TEMPLATES: dict[str, str] = {
+    "According-to (Standard)": """You are a precise medical research assistant.
+Instruction: Answer the question strictly according to the provided medical documents.
+Grounding:
+1. Base your response ONLY on the factual data in the context.
+2. Cite specific sections or values (e.g., "BP: 120/80") to support your answer.
+3. If the documents do not contain the answer, state that the information is not available in the provided context.
+
+Question: {input_text}""",
+
+    "Chain of Verification (CoVe)": """You are a thorough researcher. Use a Chain of Verification to ensure accuracy.
+Step 1: Draft an initial response strictly according to the provided documents.
+Step 2: Create validational questions to check if the response is supported by the context.
+Step 3: Answer the validation questions using the context.
+Step 4: Revise the response to ensure complete accuracy.
+
+Question: {input_text}""",
+
+    "Step-Back Prompting": """You are an expert assistant. Use Step-Back Prompting to answer.
+Step 1: Abstract the key concepts and principles relevant to this question.
+Step 2: Use the abstractions to reason through the question.
+Let's think step by step to answer this.
+
+Question: {input_text}""",
+
+    "Source Grounding (Pre-training)": """You are a helpful assistant.
+Instruction: Ground your response in factual data from your pre-training set, specifically referencing **{source}**.
+Rules:
+1. Provide a COMPREHENSIVE and DETAILED answer.
+2. Ensure all claims can be attributed to {source}.
+3. Structure your response with clear headings and bullet points.
+
+Question: {input_text}""",
+
+    "Medical Expert (Example-Based)": """You are a highly experienced medical expert.
+Instruction: Answer the question by mimicking the tone and format of the following expert examples.
+
+{examples}
+
+Question: {input_text}"""
+}
+
+SOURCE_GROUNDING = "Source Grounding (Pre-training)"
+STRICT_TEMPLATE = "According-to (Standard)"
+DEFAULT_SOURCE = "MEDICAL SCIENCE"
+
+def needs_examples(name: str) -> bool:
+    """True if the template injects dynamic few-shot examples."""
+    return "{examples}" in PROMPT_TEMPLATES[name]
+
+def format_examples(examples: list[dict]) -> str:
+    """Joins structured {"question", "answer"} examples into the Q/A block used by few-shot templates."""
+    return "\n\n".join(f"Q: {e['question']}\nA: {e['answer']}" for e in examples)
+
+def resolve_template(name: str, source: str | None, use_rag: bool) -> tuple[str, str | None]:
+    """
+    Applies the template overrides and returns the (template, source) actually used.
+    """
+    effective_template = name
+
+    # SMART OVERRIDE: If user picked a source (e.g. CDC) but didn't switch template, fix it.
+    if source and "{source}" not in PROMPT_TEMPLATES[name]:
+        effective_template = SOURCE_GROUNDING
+
+    # SMART OVERRIDE: If RAG is OFF and template is "Strict", switch to General Knowledge to avoid refusal.
+    if not use_rag and effective_template == STRICT_TEMPLATE:
+        effective_template = SOURCE_GROUNDING
+        if not source:
+            source = "General Medical Knowledge"
+
+    return effective_template, source
+
+def render_template(name: str, input_text: str, source: str | None = None, examples: str = "") -> str:
+    """Formats a registered template. Raises KeyError for unknown template names."""
+    raw_template = PROMPT_TEMPLATES[name]
+
+    if "{source}" in raw_template:
+        return raw_template.format(source=source if source else DEFAULT_SOURCE, input_text=input_text)
+    if "{examples}" in raw_template:
+        return raw_template.format(examples=examples, input_text=input_text)
+    return raw_template.format(input_text=input_text)
@@ -0,0 +1,230 @@
+"""
+Script Name:  quantization.py
+Description:  Compressed (float16 / int8 scalar-quantized or product-quantized) storage for the
+              document FAISS index, with exact re-ranking from full-precision vectors on disk.
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import json
+import os
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from app.core.telemetry import get_logger
+
+logger = get_logger(__name__)
+
+# "flat" keeps the float32 IndexFlatL2 that LangChain builds (4 bytes per dimension)
+STORAGE_MODES = ("flat", "fp16", "int8", "pq")
+
+# Sidecar files next to LangChain's index.faiss / index.pkl
+FLAT_INDEX_FILE = "index.faiss"  # the float32 index the sidecars are built from
+EXACT_VECTORS_FILE = "vectors.f32"  # float32 rows in FAISS id order, memory-mapped for re-ranking
+QUANTIZED_META_FILE = "quantized.json"
+
+# Rows of a filtered slice scanned at a time when the index cannot take an ID selector (PQ)
+_SCAN_BLOCK = 4096
+
+
+def quantized_index_file(mode: str) -> str:
+    return f"index.{mode}.faiss"
+
+
+def build_quantized(vectors: np.ndarray, mode: str, pq_m: int = 96, pq_bits: int = 8) -> faiss.Index:
+    """
+    Trains and fills a compressed L2 index over `vectors`. PQ needs at least 2**pq_bits
+    training vectors and a dimension divisible by `pq_m`; otherwise int8 is used instead.
+    """
+    n, d = vectors.shape
+    if mode == "pq" and (n < 2 ** pq_bits or d % pq_m):
+        logger.warning("Too few vectors (or incompatible dimension) for PQ; using int8",
+                       extra={"fields": {"vectors": n, "dim": d, "pq_m": pq_m, "pq_bits": pq_bits}})
+        mode = "int8"
+
+    if mode == "fp16":
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+    elif mode == "int8":
+        index = faiss.IndexScalarQuantizer(d, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_L2)
+    elif mode == "pq":
+        index = faiss.IndexPQ(d, pq_m, pq_bits, faiss.METRIC_L2)
+    else:
+        raise ValueError(f"Unknown storage mode '{mode}' (expected one of {', '.join(STORAGE_MODES)})")
+    index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def built_mode(index: faiss.Index) -> str:
+    """The storage mode an index was actually built with (build_quantized may fall back from pq)."""
+    if isinstance(index, faiss.IndexPQ):
+        return "pq"
+    if isinstance(index, faiss.IndexScalarQuantizer):
+        return "fp16" if index.sq.qtype == faiss.ScalarQuantizer.QT_fp16 else "int8"
+    return "flat"
+
+
+def index_nbytes(index: faiss.Index) -> int:
+    """Memory held by the index's vector codes."""
+    return index.sa_code_size() * index.ntotal
+
+
+class RerankedIndex:
+    """
+    A compressed FAISS index that over-fetches `rerank_factor * k` candidates and re-scores
+    them exactly against full-precision vectors, memory-mapped from disk so only the
+    candidate rows are paged in. Exposes the subset of the faiss.Index API that LangChain's
+    FAISS store and RAGService use for search (`search`, `ntotal`, `d`).
+    """
+
+    def __init__(self, index: faiss.Index, exact: np.ndarray | None, rerank_factor: int = 4):
+        self.index = index
+        self.exact = exact  # (ntotal, d) float32 memmap, or None to skip re-ranking
+        self.rerank_factor = max(1, rerank_factor)
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    @property
+    def d(self) -> int:
+        return self.index.d
+
+    @property
+    def nbytes(self) -> int:
+        return index_nbytes(self.index)
+
+    def search(self, x: np.ndarray, k: int, *, params=None) -> tuple[np.ndarray, np.ndarray]:
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        if self.exact is None:
+            return self.index.search(x, k, params=params)
+
+        fetch = min(self.ntotal, k * self.rerank_factor)
+        _, candidates = self.index.search(x, fetch, params=params)
+        distances = np.full((len(x), k), np.inf, dtype=np.float32)
+        labels = np.full((len(x), k), -1, dtype=np.int64)
+        for i, rows in enumerate(candidates):
+            rows = rows[rows >= 0]
+            if not len(rows):
+                continue
+            # Sorted rows read the memmap front to back
+            rows = np.sort(rows)
+            diff = self.exact[rows] - x[i]
+            exact = np.einsum("ij,ij->i", diff, diff)
+            best = np.argsort(exact, kind="stable")[:k]
+            distances[i, :len(best)] = exact[best]
+            labels[i, :len(best)] = rows[best]
+        return distances, labels
+
+    def search_subset(self, x: np.ndarray, k: int, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Searches only the given sorted rows (a metadata-filtered slice). Scalar-quantized codes
+        take an ID selector, so the compressed search runs inside the slice and its candidates
+        are re-ranked as in `search`. PQ indexes cannot take one: the slice is scanned in
+        blocks, exactly against the full-precision vectors when available, else against the
+        decoded codes, keeping only a running top-k.
+        """
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        if not isinstance(self.index, faiss.IndexPQ):
+            return self.search(x, k, params=faiss.SearchParameters(sel=faiss.IDSelectorBatch(rows)))
+
+        k = min(k, len(rows))
+        distances = np.empty((len(x), 0), dtype=np.float32)
+        labels = np.empty((len(x), 0), dtype=np.int64)
+        for start in range(0, len(rows), _SCAN_BLOCK):
+            block = rows[start:start + _SCAN_BLOCK]
+            vectors = self.exact[block] if self.exact is not None else self.index.reconstruct_batch(block)
+            block_distances = (x ** 2).sum(1)[:, None] - 2 * x @ vectors.T + (vectors ** 2).sum(1)[None, :]
+            distances = np.concatenate([distances, block_distances.astype(np.float32)], axis=1)
+            labels = np.concatenate([labels, np.broadcast_to(block, block_distances.shape)], axis=1)
+            if distances.shape[1] > k:
+                keep = np.argpartition(distances, k - 1, axis=1)[:, :k]
+                distances = np.take_along_axis(distances, keep, axis=1)
+                labels = np.take_along_axis(labels, keep, axis=1)
+        order = np.argsort(distances, axis=1, kind="stable")
+        return np.take_along_axis(distances, order, axis=1), np.take_along_axis(labels, order, axis=1)
+
+
+def compress_store(store, index_dir: str, mode: str, rerank: bool = True, rerank_factor: int = 4,
+                   pq_m: int = 96, pq_bits: int = 8) -> None:
+    """
+    Replaces the flat index of a LangChain FAISS `store` with a compressed one and writes
+    the sidecar files (compressed index, exact vectors, metadata) to `index_dir`.
+    """
+    flat = store.index
+    vectors = flat.reconstruct_n(0, flat.ntotal)
+    index = build_quantized(vectors, mode, pq_m, pq_bits)
+    built = built_mode(index)
+    if built != mode:
+        logger.warning("Compressed index built with a fallback storage mode", extra={"fields": {
+            "requested": mode, "built": built, "vectors": int(flat.ntotal)
+        }})
+
+    path = Path(index_dir)
+    # Each file is written beside its final name and renamed into place, so a process that
+    # has the previous files open or memory-mapped keeps reading a complete copy
+    _write_replacing(path / quantized_index_file(mode), lambda tmp: faiss.write_index(index, str(tmp)))
+    _write_replacing(path / EXACT_VECTORS_FILE, vectors.tofile)
+    # `mode` is the configured mode the sidecars answer for; `built_mode` what they hold
+    meta = {"mode": mode, "built_mode": built, "count": int(flat.ntotal), "dim": int(flat.d),
+            "pq_m": pq_m, "pq_bits": pq_bits, "source": _source_signature(path)}
+    # written last: the sidecars are complete
+    _write_replacing(path / QUANTIZED_META_FILE, lambda tmp: tmp.write_text(json.dumps(meta)))
+
+    store.index = RerankedIndex(index, _exact_vectors(path, meta) if rerank else None, rerank_factor)
+    logger.info("Compressed document index", extra={"fields": {
+        "mode": built, "vectors": int(flat.ntotal), "flat_bytes": index_nbytes(flat), "bytes": index_nbytes(index)
+    }})
+
+
+def load_compressed(index_dir: str, mode: str, rerank: bool = True, rerank_factor: int = 4,
+                    pq_m: int = 96, pq_bits: int = 8, io_flags: int = 0) -> RerankedIndex | None:
+    """
+    The saved compressed index for `mode`, or None if it is missing, was built with
+    different settings, or predates the current float32 index (the caller then rebuilds it
+    from the flat index). `io_flags` are passed to faiss.read_index (e.g. to memory-map the codes).
+    """
+    path = Path(index_dir)
+    try:
+        meta = json.loads((path / QUANTIZED_META_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+    if (meta.get("mode"), meta.get("pq_m"), meta.get("pq_bits")) != (mode, pq_m, pq_bits):
+        return None
+    if meta.get("source") != _source_signature(path):
+        logger.warning("Compressed index is stale; it was built from a different float32 index",
+                       extra={"fields": {"index_dir": index_dir, "mode": mode}})
+        return None
+    index = faiss.read_index(str(path / quantized_index_file(mode)), io_flags)
+    if index.ntotal != meta["count"]:
+        return None
+    return RerankedIndex(index, _exact_vectors(path, meta) if rerank else None, rerank_factor)
+
+
+def _source_signature(path: Path) -> dict | None:
+    """Size and modification time of the float32 index in `path` (None if there is none)."""
+    try:
+        stat = (path / FLAT_INDEX_FILE).stat()
+    except OSError:
+        return None
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _write_replacing(target: Path, write) -> None:
+    """Calls `write(tmp)` on a temporary file in target's directory, then renames it over `target`."""
+    tmp = target.with_name(target.name + ".tmp")
+    try:
+        write(tmp)
+        os.replace(tmp, target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _exact_vectors(path: Path, meta: dict) -> np.ndarray:
+    return np.memmap(path / EXACT_VECTORS_FILE, dtype=np.float32, mode="r", shape=(meta["count"], meta["dim"]))
@@ -8,110 +8,459 @@ Copyright (c) 2026
 License: MIT
 """
 
+import itertools
 import os
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterator
 
-from app.core.config import DATA_DIR, INDEX_DIR_PDFS, EMBEDDING_MODEL
+from app.core.chunk_filter import REFERENCES_KEY, ChunkCatalog, ChunkFilter
+from app.core.config import (
+    CHUNK_OVERLAP, CHUNK_SIZE, DATA_DIR, DEDUP_NUM_PERM, DEDUP_THRESHOLD, DOCUMENT_TAGS, EXTRACTION_CACHE_DIR,
+    INDEX_DIR_PDFS, INDEX_PQ_BITS, INDEX_PQ_M, INDEX_RERANK, INDEX_RERANK_FACTOR, INDEX_SHARD_THREADS, INDEX_SHARDS,
+    INDEX_STORAGE, KEEP_INDEX_VERSIONS, LLM_TIMEOUT, SHARED_INDEX
+)
+from app.core.profiling import profiled
+from app.core.readiness import warm_up_search
+from app.core.prompts import needs_examples, render_template, resolve_template
+from app.core.resilience import DeadlineExceeded, Resilience, call_with_timeout, is_transient, remaining
+from app.core.routing import AUTO_MODEL, ModelRouter
+from app.core.services import get_embeddings, get_model_router, get_resilience
+from app.core.telemetry import StageTimings, get_logger
+
+# LangChain, FAISS and the Google SDK are imported inside the methods that need them,
+# so importing this module (and the backend app) stays cheap.
+if TYPE_CHECKING:
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import Embeddings
+    from app.core.expert_knowledge import ExpertKnowledgeService
+    from app.core.extraction_cache import ExtractionCache
+
+logger = get_logger(__name__)
+
+INDEX_NOT_BUILT = "Error: Vector Index is not built. Please click 'Rebuild Index' in settings."
+
+
+@dataclass
+class PreparedQuery:
+    """Prompt messages and the model that will generate from them (see RAGService.prepare)."""
+    messages: list | None  # None when RAG was requested but no index is built
+    model: str
 
 class RAGService:
-    def __init__(self, data_dir: str = DATA_DIR, index_dir: str = INDEX_DIR_PDFS):
+    def __init__(self, data_dir: str = DATA_DIR, index_dir: str = INDEX_DIR_PDFS,
+                 embeddings: "Embeddings | None" = None,
+                 example_selector: "ExpertKnowledgeService | None" = None,
+                 resilience: Resilience | None = None,
+                 router: ModelRouter | None = None,
+                 storage: str = INDEX_STORAGE,
+                 extraction_cache_dir: str | None = EXTRACTION_CACHE_DIR,
+                 shared: bool = SHARED_INDEX,
+                 shards: int = INDEX_SHARDS):
         self.data_dir = data_dir
         self.index_dir = index_dir
-        self.vector_store: FAISS | None = None
-        
-        # Initialize Embeddings
-        self.embeddings = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL)
-        
-        # Initialize LLM
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash", 
-            temperature=0.7,
-            convert_system_message_to_human=True
-        )
+        self.vector_store: "FAISS | None" = None
+        self._embeddings = embeddings
+        # Few-shot example source for example-based templates
+        self.example_selector = example_selector
+        # Retry / timeout / circuit-breaker policy for LLM calls (shared default)
+        self.resilience = resilience if resilience is not None else get_resilience()
+        # Resolves `auto` to a model tier and keeps per-model latency / error statistics
+        self.router = router if router is not None else get_model_router()
+        # In-memory vector storage: "flat" (float32) or a compressed mode (see app.core.quantization)
+        self.storage = storage
+        self._catalog: tuple["FAISS", ChunkCatalog] | None = None  # (store it describes, catalog)
+        # Parsed PDF pages are reused across rebuilds (None / "" parses every time)
+        self.extraction_cache_dir = extraction_cache_dir
+        # Multi-worker mode: versioned, memory-mapped index under index_dir (see app.core.shared_index)
+        self.shared = shared
+        self.index_version: str | None = None
+        self._swap_lock = threading.Lock()
+        self._watch_stop: threading.Event | None = None
+        # Documents split across this many FAISS shards, searched in parallel (see app.core.sharding)
+        if shards > 1 and (shared or storage != "flat"):
+            logger.warning("Index sharding needs flat storage and an unshared index; using a single index",
+                           extra={"fields": {"shards": shards, "storage": storage, "shared": shared}})
+            shards = 1
+        self.shards = shards
 
-    def load_and_index(self) -> None:
+    @property
+    def embeddings(self) -> "Embeddings":
+        """Embedding client; defaults to the shared client, created on first use."""
+        if self._embeddings is None:
+            self._embeddings = get_embeddings()
+        return self._embeddings
+
+    @embeddings.setter
+    def embeddings(self, value: "Embeddings") -> None:
+        self._embeddings = value
+
+    @profiled
+    def load_and_index(self, force: bool = False) -> None:
         """
         Loads PDFs, processes them into chunks, and creates (or loads) a FAISS index.
-        Persists the index to disk for valid startup.
+        Persists the index to disk for valid startup. `force` rebuilds from the PDFs even
+        if a saved index exists. With a shared index, the build is published as a new
+        version that every worker switches to.
         """
+        if self.shared:
+            self._load_shared(force)
+            return
+
         # 1. Try to load existing index
-        if os.path.exists(self.index_dir):
-            print(f"Loading existing FAISS index from {self.index_dir}...")
+        if not force and os.path.exists(self.index_dir):
+            logger.info(f"Loading existing FAISS index from {self.index_dir}...")
             try:
-                self.vector_store = FAISS.load_local(
-                    self.index_dir, 
-                    self.embeddings, 
-                    allow_dangerous_deserialization=True
-                )
-                print("Index loaded successfully.")
+                self.vector_store = self._load_store()
+                logger.info("Index loaded successfully.")
                 return
             except Exception as e:
-                print(f"Error loading index: {e}. Rebuilding...")
+                logger.warning(f"Error loading index: {e}. Rebuilding...")
 
         # 2. Rebuild index from source documents
-        print("Loading documents from disk...")
+        store = self._build_store()
+        if store is not None:
+            self._save(store, self.index_dir)
+            self.vector_store = store
+
+    def _build_store(self) -> "FAISS | None":
+        """Parses (or reads cached text of) the PDFs, chunks them and embeds the chunks."""
+        from langchain_community.vectorstores import FAISS
+
+        splits = self._load_splits()
+        if not splits:
+            return None
+        if DEDUP_THRESHOLD:
+            from app.core.dedup import collapse_duplicates
+
+            # Before embedding: each repeated header / disclaimer is embedded and stored once
+            splits = collapse_duplicates(splits, DEDUP_THRESHOLD, DEDUP_NUM_PERM)
+
+        # 4. Create Vector Store
+        logger.info("Creating Vector Store...")
+        if self.shards > 1:
+            from app.core.sharding import build_sharded
+
+            return build_sharded(splits, self.embeddings, self.shards, INDEX_SHARD_THREADS)
+        return FAISS.from_documents(splits, self.embeddings)
+
+    def _load_splits(self) -> list:
+        """The chunked pages of every PDF in the data directory."""
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        logger.info("Loading documents from disk...")
         all_docs = []
+        cache = self._extraction_cache()
+        load_pdf = cache.load_pdf if cache is not None else self._parse_pdf
         
         if not os.path.exists(self.data_dir):
-            print(f"Warning: Data directory {self.data_dir} not found.")
-            return
+            logger.warning(f"Data directory {self.data_dir} not found.")
+            return []
 
         for filename in os.listdir(self.data_dir):
             if filename.endswith(".pdf"):
                 path = os.path.join(self.data_dir, filename)
                 try:
-                    loader = PyPDFLoader(path)
-                    docs = loader.load()
+                    docs = load_pdf(path)
                     all_docs.extend(docs)
-                    print(f"Loaded {filename}, {len(docs)} pages.")
+                    logger.info(f"Loaded {filename}, {len(docs)} pages.")
                 except Exception as e:
-                    print(f"Failed to load {filename}: {e}")
+                    logger.error(f"Failed to load {filename}: {e}")
+
+        if cache is not None:
+            logger.info("PDF text extraction", extra={"fields": {"cache_hits": cache.hits, "parsed": cache.misses}})
 
         if not all_docs:
-            print("No documents found to index.")
-            return
+            logger.warning("No documents found to index.")
+            return []
 
         # 3. Chunk Documents
-        text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+        text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
         splits = text_splitter.split_documents(all_docs)
-        print(f"Created {len(splits)} document chunks.")
+        logger.info(f"Created {len(splits)} document chunks.")
+        return splits
 
-        # 4. Create and Save Vector Store
-        print("Creating Vector Store...")
-        self.vector_store = FAISS.from_documents(splits, self.embeddings)
-        print(f"Saving Vector Store to {self.index_dir}...")
-        self.vector_store.save_local(self.index_dir)
-        print("Vector Store created and saved.")
+    def _save(self, store: "FAISS", path: str) -> None:
+        from app.core.sharding import begin_save, finish_save, save_sharded
 
-    def query(self, 
-              input_text: str, 
-              wrapped_query: str | None = None, 
-              use_rag: bool = True, 
-              temperature: float = 0.7, 
-              max_output_tokens: int = 1024, 
-              top_p: float = 0.95, 
-              top_k: int = 40,
-              model_name: str = "gemini-2.5-flash") -> str:
+        logger.info(f"Saving Vector Store to {path}...")
+        if self.shards > 1:
+            save_sharded(store, path)
+        else:
+            begin_save(path, "flat")
+            store.save_local(path)
+            finish_save(path, "flat")
+        if self.storage != "flat":
+            self._compress(store, path)
+        logger.info("Vector Store created and saved.")
+
+    # --- Shared (multi-worker) index ---
+
+    def _load_shared(self, force: bool) -> None:
         """
-        Executes a query against the LLM, optionally using RAG.
+        Serves the published index version, memory-mapped. Builds and publishes a new
+        version if there is none yet (or `force`); the build lock keeps workers starting
+        together from all building one.
         """
-        
-        # 1. Initialize LLM Dynamically (to support model switching)
-        llm = ChatGoogleGenerativeAI(
+        from app.core.shared_index import build_lock, current_version, new_version_dir, publish, write_chunks
+
+        version = None if force else current_version(self.index_dir)
+        if version is None:
+            os.makedirs(self.index_dir, exist_ok=True)
+            with build_lock(self.index_dir):
+                published = current_version(self.index_dir)
+                if force or published is None:
+                    store = self._build_store()
+                    if store is None:
+                        return
+                    version, path = new_version_dir(self.index_dir)
+                    self._save(store, path)
+                    write_chunks(store, path)
+                    publish(self.index_dir, version, KEEP_INDEX_VERSIONS)
+                else:
+                    version = published  # another worker built it while we waited
+        self._open_version(version)
+
+    def _open_version(self, version: str) -> None:
+        from app.core.shared_index import MMAP_FLAGS, open_mapped, version_dir
+
+        path = version_dir(self.index_dir, version)
+        index = None
+        if self.storage != "flat":
+            from app.core.quantization import load_compressed
+
+            index = load_compressed(path, self.storage, INDEX_RERANK, INDEX_RERANK_FACTOR, INDEX_PQ_M,
+                                    INDEX_PQ_BITS, io_flags=MMAP_FLAGS)
+            if index is None:
+                raise ValueError(f"Index version {version} has no '{self.storage}' storage")
+        with self._swap_lock:
+            # Requests already searching the old store finish on it; new ones see this one
+            self.vector_store = open_mapped(path, self.embeddings, index)
+            self.index_version = version
+        logger.info("Serving index version", extra={"fields": {
+            "version": version, "vectors": self.vector_store.index.ntotal
+        }})
+
+    def start_watching(self, interval: float) -> None:
+        """Polls the shared index's version marker and hot-swaps when another worker publishes."""
+        from app.core.shared_index import current_version
+
+        if self._watch_stop is not None:
+            return
+        self._watch_stop = stop = threading.Event()
+
+        def watch():
+            while not stop.wait(interval):
+                try:
+                    version = current_version(self.index_dir)
+                    if version is not None and version != self.index_version:
+                        self._open_version(version)
+                        self.warm_up()
+                except Exception:
+                    logger.exception("Index version watcher failed to swap")
+
+        threading.Thread(target=watch, name="index-watcher", daemon=True).start()
+
+    def stop_watching(self) -> None:
+        if self._watch_stop is not None:
+            self._watch_stop.set()
+            self._watch_stop = None
+
+    def _extraction_cache(self) -> "ExtractionCache | None":
+        if not self.extraction_cache_dir:
+            return None
+        from app.core.extraction_cache import ExtractionCache
+
+        return ExtractionCache(self.extraction_cache_dir)
+
+    @staticmethod
+    def _parse_pdf(path: str) -> list:
+        from langchain_community.document_loaders import PyPDFLoader
+
+        return PyPDFLoader(path).load()
+
+    def _load_store(self) -> "FAISS":
+        """
+        Loads the saved index. In a compressed storage mode the compressed index is read
+        instead of the float32 one (built from it on first use), so the full-precision
+        vectors are never all held in memory.
+        """
+        from langchain_community.vectorstores import FAISS
+
+        from app.core.sharding import is_flat_build, load_docstore, load_sharded
+
+        if self.shards > 1:
+            store = load_sharded(self.index_dir, self.embeddings, self.shards, INDEX_SHARD_THREADS)
+            if store is None:
+                raise FileNotFoundError(f"No {self.shards}-shard index in {self.index_dir}")
+            return store
+
+        # index.pkl must come from a flat save, else its rows do not line up with index.faiss
+        if not is_flat_build(self.index_dir):
+            raise FileNotFoundError(f"No single-index build in {self.index_dir}")
+        if self.storage != "flat":
+            from app.core.quantization import load_compressed
+
+            index = load_compressed(self.index_dir, self.storage, INDEX_RERANK, INDEX_RERANK_FACTOR,
+                                    INDEX_PQ_M, INDEX_PQ_BITS)
+            if index is not None:
+                return FAISS(self.embeddings, index, *load_docstore(self.index_dir))
+
+        store = FAISS.load_local(self.index_dir, self.embeddings, allow_dangerous_deserialization=True)
+        if self.storage != "flat":
+            self._compress(store, self.index_dir)
+        return store
+
+    def _compress(self, store: "FAISS", path: str) -> None:
+        from app.core.quantization import compress_store
+
+        compress_store(store, path, self.storage, INDEX_RERANK, INDEX_RERANK_FACTOR,
+                       INDEX_PQ_M, INDEX_PQ_BITS)
+
+    def warm_up(self) -> None:
+        """Pages the FAISS index into memory with one throwaway search."""
+        if self.vector_store:
+            index = self.vector_store.index
+            warm_up_search(index.search, index.d, index.ntotal)
+
+    def memory_usage(self) -> dict | None:
+        """Sizes of the loaded document index, its docstore and chunk catalog (see app.core.memory)."""
+        from app.core.memory import approx_size, vector_store_memory
+
+        store, catalog = self.vector_store, self._catalog
+        if store is None:
+            return None
+        return {
+            "version": self.index_version,
+            **vector_store_memory(store),
+            "chunk_catalog": {"entries": len(catalog[1].rows_by_source), "bytes": approx_size(catalog[1])}
+            if catalog is not None and catalog[0] is store else {"entries": 0, "bytes": 0},
+        }
+
+    @property
+    def chunk_catalog(self) -> ChunkCatalog:
+        """Source / page / tag lookup for the current vector store, rebuilt when the store changes."""
+        store = self.vector_store
+        if self._catalog is None or self._catalog[0] is not store:
+            self._catalog = (store, ChunkCatalog.from_store(store, DOCUMENT_TAGS))
+        return self._catalog[1]
+
+    def _search(self, vectors, k: int, filters: ChunkFilter | None = None) -> list[list[tuple]]:
+        """
+        One FAISS search for a batch of query vectors: (chunk_id, Document, L2 distance)
+        triples per query, nearest first. With `filters`, only the matching chunks' ids
+        are searched (an ID selector inside the search, not post-filtering).
+        """
+        import faiss
+        import numpy as np
+
+        from app.core.quantization import RerankedIndex
+        from app.core.sharding import ShardedIndex
+
+        store = self.vector_store
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if filters is not None and not filters.is_empty:
+            rows = self.chunk_catalog.select(filters)
+            k = min(k, len(rows))
+            if k <= 0:
+                return [[] for _ in vectors]
+            if isinstance(store.index, (RerankedIndex, ShardedIndex)):
+                distances, labels = store.index.search_subset(vectors, k, rows)
+            else:
+                selector = faiss.SearchParameters(sel=faiss.IDSelectorBatch(rows))
+                distances, labels = store.index.search(vectors, k, params=selector)
+        else:
+            k = min(k, store.index.ntotal)
+            if k <= 0:
+                return [[] for _ in vectors]
+            distances, labels = store.index.search(vectors, k)
+
+        results = []
+        for query_distances, query_labels in zip(distances, labels):
+            hits = []
+            for distance, row in zip(query_distances, query_labels):
+                if row < 0:  # FAISS pads with -1 when there are fewer than k matches
+                    continue
+                chunk_id = store.index_to_docstore_id[int(row)]
+                hits.append((chunk_id, store.docstore.search(chunk_id), float(distance)))
+            results.append(hits)
+        return results
+
+    @profiled
+    def retrieve(self, queries: list[str], k: int = 4, timings: StageTimings | None = None,
+                 filters: ChunkFilter | None = None) -> list[list[dict]]:
+        """
+        Retrieval only (no LLM call): the top-k chunks for each query, in query order.
+        All queries are embedded in one batched request and searched with one FAISS
+        multi-vector search, restricted to chunks matching `filters` if given.
+        Each hit is {"chunk_id", "score", "source", "page", "content", "references"};
+        `score` is the FAISS L2 distance, so lower is closer.
+        """
+        if timings is None:
+            timings = StageTimings()
+        if not self.vector_store:
+            raise RuntimeError(INDEX_NOT_BUILT)
+        if not queries:
+            return []
+
+        with timings.stage("embed"):
+            embed_queries = getattr(self.embeddings, "embed_queries", None)
+            if embed_queries is not None:
+                vectors = embed_queries(queries)
+            else:
+                vectors = [self.embeddings.embed_query(q) for q in queries]
+
+        with timings.stage("retrieve"):
+            matches = self._search(vectors, k, filters)
+
+        results = [[{
+            "chunk_id": chunk_id,
+            "score": round(distance, 4),
+            "source": os.path.basename(doc.metadata.get("source", "")) or None,
+            "page": doc.metadata.get("page"),
+            "content": doc.page_content,
+            "references": [{"source": os.path.basename(ref.get("source") or "") or None, "page": ref.get("page")}
+                           for ref in doc.metadata[REFERENCES_KEY]] if REFERENCES_KEY in doc.metadata else None,
+        } for chunk_id, doc, distance in hits] for hits in matches]
+        timings.retrieved_chunks = sum(len(hits) for hits in results)
+        return results
+
+    def _build_llm(self, model_name: str, temperature: float, max_output_tokens: int,
+                   top_p: float, top_k: int):
+        """Initializes the LLM dynamically (to support model switching per request)."""
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        return ChatGoogleGenerativeAI(
             model=model_name,
             temperature=temperature,
             max_output_tokens=max_output_tokens,
             top_p=top_p,
             top_k=top_k,
-            convert_system_message_to_human=True
+            convert_system_message_to_human=True,
+            # Retries are done by self.resilience (jittered, breaker-aware); the client-level
+            # timeout frees a worker whose call was abandoned at its deadline
+            timeout=LLM_TIMEOUT,
+            max_retries=0
         )
-        
-        # 2. Define Prompts
+
+    def _build_messages(self,
+                        input_text: str,
+                        wrapped_query: str | None,
+                        use_rag: bool,
+                        template: str | None,
+                        source: str | None,
+                        num_examples: int,
+                        history: list[tuple[str, str]] | None,
+                        timings: StageTimings,
+                        filters: ChunkFilter | None = None) -> list:
+        """
+        Runs everything before generation (embedding, example selection, template rendering,
+        retrieval) and returns the chat messages to send to the LLM.
+        """
+        from langchain_core.prompts import ChatPromptTemplate
+
+        # 1. Define Prompts
         rag_system_prompt = (
             "You are a helpful assistant for medical question answering. "
             "Use the following pieces of retrieved context to answer the question. "
@@ -123,36 +472,260 @@ class RAGService:
         
         rag_prompt = ChatPromptTemplate.from_messages([
             ("system", rag_system_prompt),
+            ("placeholder", "{history}"),
             ("human", "{input}"),
         ])
         
         basic_prompt = ChatPromptTemplate.from_messages([
             ("system", "You are a helpful assistant. Answer the user's question to the best of your ability."),
+            ("placeholder", "{history}"),
             ("human", "{input}"),
         ])
         
         generation_input = wrapped_query if wrapped_query else input_text
 
-        # 3. Execute Chain
+        # A. Embed the RAW QUERY (input_text) once; shared by retrieval and few-shot selection
+        if template:
+            template, source = resolve_template(template, source, use_rag)
+        wants_examples = bool(template) and needs_examples(template) and self.example_selector is not None
+        if use_rag or wants_examples:
+            with timings.stage("embed"):
+                query_vector = self.embeddings.embed_query(input_text)
+
+        # B. Server-side template rendering (overrides wrapped_query)
+        if template:
+            examples = ""
+            if wants_examples:
+                with timings.stage("examples"):
+                    examples = self.example_selector.search_by_vector(query_vector, k=num_examples)
+            with timings.stage("prompt"):
+                generation_input = render_template(template, input_text, source=source, examples=examples)
+
         if use_rag:
-            if not self.vector_store:
-                return "Error: Vector Index is not built. Please click 'Rebuild Index' in settings."
-            
-            # A. Retrieve using RAW QUERY (input_text)
-            retriever = self.vector_store.as_retriever()
-            docs = retriever.invoke(input_text)
+            # C. Retrieve using RAW QUERY (input_text)
+            with timings.stage("retrieve"):
+                if filters is not None and not filters.is_empty:
+                    docs = [doc for _, doc, _ in self._search([query_vector], 4, filters)[0]]
+                else:
+                    docs = self.vector_store.similarity_search_by_vector(query_vector, k=4)
+            timings.retrieved_chunks = len(docs)
             
             # Format retrieved docs
-            context_str = "\n\n".join(doc.page_content for doc in docs)
-
-            # B. Generate using WRAPPED PROMPT (generation_input)
-            chain = rag_prompt | llm | StrOutputParser()
-            return chain.invoke({"context": context_str, "input": generation_input})
+            with timings.stage("prompt"):
+                context_str = "\n\n".join(doc.page_content for doc in docs)
+                messages = rag_prompt.format_messages(context=context_str, history=history or [],
+                                                      input=generation_input)
             
         else:
             # Basic Chain (No Retrieval)
-            chain = basic_prompt | llm | StrOutputParser()
-            return chain.invoke({"input": generation_input})
+            with timings.stage("prompt"):
+                messages = basic_prompt.format_messages(history=history or [], input=generation_input)
+
+        timings.prompt_chars = sum(len(m.content) for m in messages)
+        return messages
+
+    def _resolve_model(self, model_name: str, latency_budget_ms: float | None, timings: StageTimings) -> str:
+        """
+        Maps `auto` to a concrete model once the prompt is built, using what is left of the
+        latency budget (and of the request deadline) after retrieval. Records the choice on `timings`.
+        """
+        if model_name == AUTO_MODEL:
+            budget_ms = (latency_budget_ms or self.router.default_budget_ms) - sum(timings.stages.values())
+            left = remaining()
+            if left is not None:
+                budget_ms = min(budget_ms, left * 1000)
+            model_name = self.router.choose(timings.prompt_chars, budget_ms)
+        timings.model = model_name
+        return model_name
+
+    def _record(self, model_name: str, start: float, error: BaseException | None = None,
+                attempted: bool = True) -> None:
+        """
+        Feeds one generation's outcome to the router. Only upstream failures count against the
+        model: not an open circuit, a deadline spent before the model was called, or a request
+        the model rejected as invalid.
+        """
+        if error is not None and not (attempted and is_transient(error)):
+            return
+        self.router.record(model_name, (time.perf_counter() - start) * 1000, ok=error is None)
+
+    @profiled
+    def prepare(self,
+                input_text: str,
+                wrapped_query: str | None = None,
+                use_rag: bool = True,
+                model_name: str = "gemini-2.5-flash",
+                template: str | None = None,
+                source: str | None = None,
+                num_examples: int = 3,
+                history: list[tuple[str, str]] | None = None,
+                timings: StageTimings | None = None,
+                latency_budget_ms: float | None = None,
+                filters: ChunkFilter | None = None) -> PreparedQuery:
+        """
+        Everything `query` / `stream_query` do before generating: retrieval, prompt building
+        and resolving `auto` to a model. Lets the caller admit the request under the model
+        that will actually serve it, then pass the result back as `prepared`.
+        """
+        if timings is None:
+            timings = StageTimings()
+        if use_rag and not self.vector_store:
+            return PreparedQuery(None, model_name)
+        messages = self._build_messages(input_text, wrapped_query, use_rag, template, source,
+                                        num_examples, history, timings, filters)
+        return PreparedQuery(messages, self._resolve_model(model_name, latency_budget_ms, timings))
+
+    @profiled
+    def query(self, 
+              input_text: str, 
+              wrapped_query: str | None = None, 
+              use_rag: bool = True, 
+              temperature: float = 0.7, 
+              max_output_tokens: int = 1024, 
+              top_p: float = 0.95, 
+              top_k: int = 40,
+              model_name: str = "gemini-2.5-flash",
+              template: str | None = None,
+              source: str | None = None,
+              num_examples: int = 3,
+              history: list[tuple[str, str]] | None = None,
+              timings: StageTimings | None = None,
+              latency_budget_ms: float | None = None,
+              filters: ChunkFilter | None = None,
+              prepared: PreparedQuery | None = None) -> str:
+        """
+        Executes a query against the LLM, optionally using RAG.
+        If `template` names a registered prompt template, it is rendered here (with
+        `source` and `num_examples` few-shot examples) instead of using `wrapped_query`.
+        `history` holds prior (role, content) turns of the conversation, oldest first.
+        `model_name="auto"` lets the router pick a model that fits `latency_budget_ms`.
+        `filters` restricts retrieval to matching chunks (source file, page range, tags).
+        If `timings` is given, per-stage durations and prompt statistics are recorded on it.
+        `prepared` is the result of `prepare` for the same arguments, if already computed.
+        """
+        from langchain_core.output_parsers import StrOutputParser
+
+        if timings is None:
+            timings = StageTimings()
+
+        if prepared is None:
+            prepared = self.prepare(input_text, wrapped_query, use_rag, model_name, template, source,
+                                    num_examples, history, timings, latency_budget_ms, filters)
+        if prepared.messages is None:
+            return INDEX_NOT_BUILT
+        messages, model_name = prepared.messages, prepared.model
+        llm = self._build_llm(model_name, temperature, max_output_tokens, top_p, top_k)
+
+        # D. Generate using WRAPPED PROMPT (generation_input)
+        chain = llm | StrOutputParser()
+        start = time.perf_counter()
+        attempted = False
+
+        def invoke(timeout: float | None) -> str:
+            nonlocal attempted
+            attempted = True
+            return call_with_timeout(lambda: chain.invoke(messages), timeout)
+
+        try:
+            with timings.stage("generate"):
+                answer = self.resilience.call(f"llm:{model_name}", invoke, timeout=LLM_TIMEOUT)
+        except Exception as e:
+            self._record(model_name, start, e, attempted)
+            raise
+        self._record(model_name, start)
+        return answer
+
+    @profiled
+    def stream_query(self,
+                     input_text: str,
+                     wrapped_query: str | None = None,
+                     use_rag: bool = True,
+                     temperature: float = 0.7,
+                     max_output_tokens: int = 1024,
+                     top_p: float = 0.95,
+                     top_k: int = 40,
+                     model_name: str = "gemini-2.5-flash",
+                     template: str | None = None,
+                     source: str | None = None,
+                     num_examples: int = 3,
+                     history: list[tuple[str, str]] | None = None,
+                     timings: StageTimings | None = None,
+                     cancel_event: threading.Event | None = None,
+                     latency_budget_ms: float | None = None,
+                     filters: ChunkFilter | None = None,
+                     prepared: PreparedQuery | None = None) -> Iterator[str]:
+        """
+        Streaming variant of `query`: yields answer text chunks as the LLM produces them.
+        Setting `cancel_event` (or closing the generator) stops generation upstream.
+        """
+        from langchain_core.output_parsers import StrOutputParser
+
+        if timings is None:
+            timings = StageTimings()
+
+        if prepared is None:
+            prepared = self.prepare(input_text, wrapped_query, use_rag, model_name, template, source,
+                                    num_examples, history, timings, latency_budget_ms, filters)
+        if prepared.messages is None:
+            yield INDEX_NOT_BUILT
+            return
+        messages, model_name = prepared.messages, prepared.model
+        llm = self._build_llm(model_name, temperature, max_output_tokens, top_p, top_k)
+
+        chain = llm | StrOutputParser()
+        start = time.perf_counter()
+        attempted = False
+
+        def open_stream(timeout: float | None):
+            nonlocal attempted
+            attempted = True
+            # Nothing has reached the client before the first chunk, so opening the stream
+            # (up to that chunk) is retried like a plain call, within the same deadline
+            stream = chain.stream(messages)
+            chunks = iter(stream)
+            # A generator cannot be closed while another thread runs it: whichever of the
+            # worker and a timed-out caller arrives second closes the stream
+            handoff = threading.Lock()
+
+            def first_chunk():
+                chunk = next(chunks, None)
+                if not handoff.acquire(blocking=False):
+                    stream.close()
+                return chunk
+
+            try:
+                return stream, chunks, call_with_timeout(first_chunk, timeout)
+            except DeadlineExceeded:
+                if not handoff.acquire(blocking=False):
+                    stream.close()
+                raise
+            except BaseException:
+                stream.close()
+                raise
 
-# Global Instance
-rag_service = RAGService()
+        try:
+            stream, chunks, first = self.resilience.call(f"llm:{model_name}", open_stream, timeout=LLM_TIMEOUT)
+        except Exception as e:
+            self._record(model_name, start, e, attempted)
+            raise
+        # Unfinished without an error: cancelled or closed, which says nothing about the model
+        finished, error = False, None
+        try:
+            for chunk in itertools.chain([first] if first is not None else [], chunks):
+                if "first_token" not in timings.stages:
+                    timings.stages["first_token"] = (time.perf_counter() - start) * 1000
+                if cancel_event is not None and cancel_event.is_set():
+                    logger.info("Generation cancelled by client")
+                    break
+                yield chunk
+            else:
+                finished = True
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # Closing the LangChain iterator aborts the upstream streaming call
+            stream.close()
+            timings.stages["generate"] = (time.perf_counter() - start) * 1000
+            if finished or error is not None:
+                self._record(model_name, start, error)
@@ -0,0 +1,92 @@
+"""
+Script Name:  readiness.py
+Description:  Tracks per-index load state so the API can report readiness separately from liveness.
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import threading
+import time
+from typing import Protocol
+
+from app.core.telemetry import get_logger
+
+logger = get_logger(__name__)
+
+# Index states. "empty" means the load finished but there was no source data,
+# which still counts as ready: the service answers, it just has nothing to retrieve.
+PENDING, LOADING, READY, EMPTY, ERROR = "pending", "loading", "ready", "empty", "error"
+READY_STATES = {READY, EMPTY}
+
+
+class IndexedService(Protocol):
+    vector_store: object | None
+
+    def load_and_index(self, force: bool = False) -> None: ...
+
+    def warm_up(self) -> None: ...
+
+
+def warm_up_search(search, dim: int, count: int) -> None:
+    """
+    Runs one throwaway `search(queries, k)` directly against an index (no embedding call)
+    so its vectors are paged into memory before real traffic arrives.
+    """
+    import numpy as np
+
+    if count:
+        search(np.ones((1, dim), dtype=np.float32), min(4, count))
+
+
+class IndexReadiness:
+    """Thread-safe registry of index states, updated by the loader threads."""
+
+    def __init__(self, names: list[str]):
+        self._lock = threading.Lock()
+        self._states: dict[str, dict] = {name: {"state": PENDING} for name in names}
+
+    def set(self, name: str, state: str, **details) -> None:
+        with self._lock:
+            self._states[name] = {"state": state, **details}
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            return {name: dict(info) for name, info in self._states.items()}
+
+    @property
+    def is_ready(self) -> bool:
+        return all(info["state"] in READY_STATES for info in self.snapshot().values())
+
+    def load(self, name: str, service: IndexedService, warm_up: bool = False, force: bool = False) -> bool:
+        """
+        Runs `service.load_and_index()` (blocking) and records the outcome under `name`.
+        `force` asks the service to rebuild rather than load what is saved. Returns False if
+        loading failed; a service still serving its previous index then stays ready, with
+        the failure recorded under `error`.
+        """
+        previous = self.snapshot()[name]["state"]
+        self.set(name, LOADING)
+        start = time.perf_counter()
+        try:
+            if force:
+                service.load_and_index(force=True)
+            else:
+                service.load_and_index()
+            if service.vector_store is not None and warm_up:
+                service.warm_up()
+        except Exception as e:
+            logger.exception(f"Failed to load index '{name}'")
+            if previous in READY_STATES and service.vector_store is not None:
+                self.set(name, previous, error=str(e))
+            else:
+                self.set(name, ERROR, error=str(e))
+            return False
+
+        state = READY if service.vector_store is not None else EMPTY
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+        self.set(name, state, load_ms=elapsed_ms)
+        logger.info(f"Index '{name}' {state}", extra={"fields": {"index": name, "load_ms": elapsed_ms}})
+        return True
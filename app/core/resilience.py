@@ -0,0 +1,342 @@
+"""
+Script Name:  resilience.py
+Description:  Deadlines, jittered retries, circuit breakers and hedged requests for upstream
+              (Gemini LLM and embedding) calls.
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, TypeVar
+
+from app.core.config import EMBEDDING_WORKERS, LLM_WORKERS
+from app.core.profiling import profile_thread
+from app.core.telemetry import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Absolute time.monotonic() by which the current request must finish (None = no deadline)
+deadline_var: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+# HTTP statuses worth retrying (timeouts, throttling, server errors)
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+# Exception class names raised by the Google SDKs / httpx for transient failures
+TRANSIENT_NAMES = {
+    "ResourceExhausted", "ServiceUnavailable", "InternalServerError", "DeadlineExceeded",
+    "TooManyRequests", "GatewayTimeout", "ServerError", "ReadTimeout", "ConnectTimeout",
+    "ConnectError", "RemoteProtocolError",
+}
+
+# Upstream calls run on a pool per upstream so the caller can stop waiting at its deadline.
+# A timed-out call keeps its worker until the client-level timeout fires, which is why
+# clients get one too; separate pools keep a slow upstream from starving the other.
+UPSTREAM_WORKERS = {"llm": LLM_WORKERS, "embeddings": EMBEDDING_WORKERS}
+_pools: dict[str, ThreadPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def upstream_pool(upstream: str) -> ThreadPoolExecutor:
+    """The worker pool for `upstream` ("llm" or "embeddings"), created on first use."""
+    with _pools_lock:
+        pool = _pools.get(upstream)
+        if pool is None:
+            pool = _pools[upstream] = ThreadPoolExecutor(max_workers=UPSTREAM_WORKERS[upstream],
+                                                         thread_name_prefix=f"upstream-{upstream}")
+        return pool
+
+
+def _submit(fn: Callable[[], T], upstream: str) -> Future:
+    """
+    Runs `fn` on `upstream`'s pool in a copy of the caller's context, so it logs under the
+    caller's request id, sees its deadline and is included in its request profile.
+    """
+    def run() -> T:
+        with profile_thread():
+            return fn()
+    # One copy per submission: a context can only be entered by one thread at a time
+    return upstream_pool(upstream).submit(contextvars.copy_context().run, run)
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request deadline (or a per-call timeout) expired before the upstream call finished."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Calls to an upstream are short-circuited after repeated failures."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable (circuit open), retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+# --- Deadlines ---
+
+@contextmanager
+def request_deadline(seconds: float | None, start: float | None = None) -> Iterator[None]:
+    """Sets the request deadline to `start + seconds` (never extending an outer deadline)."""
+    if seconds is None:
+        yield
+        return
+    expires = (start if start is not None else time.monotonic()) + seconds
+    outer = deadline_var.get()
+    token = deadline_var.set(expires if outer is None else min(outer, expires))
+    try:
+        yield
+    finally:
+        deadline_var.reset(token)
+
+
+def remaining() -> float | None:
+    """Seconds left before the request deadline, or None without one."""
+    expires = deadline_var.get()
+    return None if expires is None else expires - time.monotonic()
+
+
+def stage_timeout(cap: float | None) -> float | None:
+    """Timeout for one upstream call: `cap`, shortened to the time left on the request."""
+    left = remaining()
+    if left is None:
+        return cap
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return left if cap is None else min(cap, left)
+
+
+def call_with_timeout(fn: Callable[[], T], timeout: float | None, upstream: str = "llm") -> T:
+    """Runs `fn` on `upstream`'s pool, giving up (DeadlineExceeded) after `timeout` seconds."""
+    if timeout is None:
+        return fn()
+    future = _submit(fn, upstream)
+    try:
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        future.cancel()
+        raise DeadlineExceeded(f"Upstream call timed out after {timeout:.1f}s") from None
+
+
+def is_transient(exc: BaseException) -> bool:
+    """True for timeouts, throttling and server errors, including wrapped SDK errors."""
+    while exc is not None:
+        if isinstance(exc, (TimeoutError, ConnectionError)):
+            return True
+        status = getattr(exc, "code", None) or getattr(exc, "status_code", None)
+        if isinstance(status, int) and status in TRANSIENT_STATUSES:
+            return True
+        if any(cls.__name__ in TRANSIENT_NAMES for cls in type(exc).__mro__):
+            return True
+        exc = exc.__cause__
+    return False
+
+
+# --- Circuit breaker ---
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive transient failures; while open, calls fail
+    immediately. After `reset_timeout` seconds one trial call is let through (half-open):
+    success closes the circuit, failure re-opens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Raises CircuitOpenError if the call must not be attempted. True if the call is the
+        half-open trial, whose caller must record its outcome or `release_trial`.
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return False
+            waited = time.monotonic() - self.opened_at
+            if self.state == self.OPEN and waited >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            raise CircuitOpenError(self.name, max(1.0, self.reset_timeout - waited))
+
+    def release_trial(self) -> None:
+        """Lets another call try if the trial ended without a verdict (e.g. it was cancelled)."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls are being short-circuited (open and not yet due for a trial)."""
+        with self._lock:
+            return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit opened for {self.name}", extra={"fields": {"failures": self.failures}})
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures}
+
+
+# --- Hedging ---
+
+class LatencyTracker:
+    """Rolling window of call latencies (ms), used to pick the hedging delay."""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, ms: float) -> None:
+        with self._lock:
+            self._samples.append(ms)
+
+    def percentile(self, p: float) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < 10:  # too few samples to trust
+            return None
+        return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+
+def hedged_call(fn: Callable[[], T], tracker: LatencyTracker, timeout: float | None,
+                min_delay: float = 0.05, upstream: str = "embeddings") -> T:
+    """
+    Runs `fn` (which must be idempotent); if it has not answered by the tracked p95 latency,
+    fires a second identical attempt and returns whichever finishes first.
+    """
+    p95_ms = tracker.percentile(0.95)
+    hedge_after = max(min_delay, p95_ms / 1000) if p95_ms is not None else None
+    start = time.monotonic()
+
+    def timed() -> T:
+        began = time.perf_counter()
+        result = fn()
+        tracker.record((time.perf_counter() - began) * 1000)
+        return result
+
+    futures: list[Future] = [_submit(timed, upstream)]
+    if hedge_after is not None and (timeout is None or hedge_after < timeout):
+        done, _ = wait(futures, timeout=hedge_after)
+        if not done:
+            logger.debug("Hedging slow upstream call", extra={"fields": {"after_ms": round(hedge_after * 1000)}})
+            futures.append(_submit(timed, upstream))
+
+    error: BaseException | None = None
+    pending = set(futures)
+    while pending:
+        left = None if timeout is None else timeout - (time.monotonic() - start)
+        if left is not None and left <= 0:
+            break
+        done, pending = wait(pending, timeout=left, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    other.cancel()
+                return future.result()
+            error = future.exception()
+    if error is not None and not pending:
+        raise error
+    for future in pending:
+        future.cancel()
+    raise DeadlineExceeded(f"Upstream call timed out after {timeout:.1f}s")
+
+
+# --- Policy ---
+
+class Resilience:
+    """
+    Retry / timeout / circuit-breaker policy shared by every upstream call site.
+    Breakers are kept per upstream name (one per LLM model, one for embeddings).
+    """
+
+    def __init__(self, attempts: int = 3, base_delay: float = 0.25, max_delay: float = 4.0,
+                 failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(name, self.failure_threshold, self.reset_timeout)
+            return self._breakers[name]
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number `attempt` (0-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, name: str, fn: Callable[[float | None], T], timeout: float | None = None) -> T:
+        """
+        Calls `fn(stage_timeout)` with retries on transient errors, within the request
+        deadline and `name`'s circuit breaker. `fn` enforces (or delegates) the timeout it
+        is given, e.g. via `call_with_timeout` or `hedged_call`.
+        """
+        breaker = self.breaker(name)
+        for attempt in range(self.attempts):
+            call_timeout = stage_timeout(timeout)  # raises once the request deadline has passed
+            trial = breaker.allow()
+            try:
+                result = fn(call_timeout)
+            except Exception as e:
+                if not is_transient(e):
+                    breaker.record_success()  # the upstream answered; the request was bad
+                    raise
+                breaker.record_failure()
+                delay = self.backoff(attempt)
+                left = remaining()
+                if attempt + 1 >= self.attempts or (left is not None and left <= delay):
+                    raise
+                logger.warning(f"Retrying {name} after transient error: {e}", extra={"fields": {
+                    "attempt": attempt + 1, "delay_ms": round(delay * 1000)
+                }})
+                time.sleep(delay)
+            else:
+                breaker.record_success()
+                return result
+            finally:
+                if trial:
+                    breaker.release_trial()  # no-op once an outcome was recorded
+        raise AssertionError("unreachable")
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: breaker.snapshot() for name, breaker in breakers.items()}
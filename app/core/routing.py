@@ -0,0 +1,145 @@
+"""
+Script Name:  routing.py
+Description:  `auto` model routing across configured tiers by latency budget, prompt size and
+              observed per-model latency / error rate.
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from app.core.resilience import Resilience
+from app.core.telemetry import get_logger
+
+logger = get_logger(__name__)
+
+AUTO_MODEL = "auto"
+
+
+@dataclass(frozen=True)
+class ModelTier:
+    model: str
+    expected_latency_ms: float  # prior, used until enough calls have been observed
+    min_prompt_chars: int = 0  # smallest prompt worth sending to this tier
+    prefill_ms_per_1k_chars: float = 0.0  # extra latency per 1k prompt characters
+
+
+class ModelStats:
+    """
+    Rolling latency and outcome window for one model. Outcomes older than `horizon`
+    seconds are ignored, so a model that was degraded becomes eligible again even if
+    routing stopped sending it traffic.
+    """
+
+    def __init__(self, window: int = 100, horizon: float = 300.0):
+        self.horizon = horizon
+        self.latencies_ms: deque[float] = deque(maxlen=window)
+        self.outcomes: deque[tuple[float, bool]] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float, ok: bool) -> None:
+        with self._lock:
+            self.outcomes.append((time.monotonic(), ok))
+            if ok:
+                self.latencies_ms.append(latency_ms)
+
+    def _recent(self) -> list[bool]:
+        cutoff = time.monotonic() - self.horizon
+        with self._lock:
+            return [ok for at, ok in self.outcomes if at >= cutoff]
+
+    def p95_ms(self, min_samples: int = 5) -> float | None:
+        with self._lock:
+            samples = sorted(self.latencies_ms)
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+
+    @property
+    def error_rate(self) -> float:
+        recent = self._recent()
+        return recent.count(False) / len(recent) if recent else 0.0
+
+    def degraded(self, max_error_rate: float, min_calls: int = 5) -> bool:
+        """Error rate over the horizon exceeds `max_error_rate` (with enough calls to judge)."""
+        recent = self._recent()
+        return len(recent) >= min_calls and recent.count(False) / len(recent) > max_error_rate
+
+    def snapshot(self) -> dict:
+        p95 = self.p95_ms(min_samples=1)
+        return {"recent_calls": len(self._recent()), "error_rate": round(self.error_rate, 3),
+                "p95_ms": round(p95, 1) if p95 is not None else None}
+
+
+class ModelRouter:
+    """
+    Chooses a concrete model for `auto` requests. Tiers are ordered fastest first.
+
+    A tier is eligible when it is healthy (circuit not open, error rate under
+    `max_error_rate`) and its estimated latency fits the request's budget. The request goes
+    to the slowest eligible tier whose `min_prompt_chars` the prompt reaches, so small
+    prompts stay on the fast tier. If no tier fits the budget, the fastest healthy tier is
+    used; if none is healthy, the fastest tier.
+    """
+
+    def __init__(self, tiers: list[ModelTier], default_budget_ms: float = 30000,
+                 max_error_rate: float = 0.25, resilience: Resilience | None = None):
+        if not tiers:
+            raise ValueError("At least one model tier is required")
+        self.tiers = tiers
+        self.default_budget_ms = default_budget_ms
+        self.max_error_rate = max_error_rate
+        self.resilience = resilience
+        self._stats: dict[str, ModelStats] = {}
+        self._lock = threading.Lock()
+
+    def stats(self, model: str) -> ModelStats:
+        with self._lock:
+            if model not in self._stats:
+                self._stats[model] = ModelStats()
+            return self._stats[model]
+
+    def record(self, model: str, latency_ms: float, ok: bool) -> None:
+        """Feeds one call's outcome into the model's rolling statistics (any model, routed or not)."""
+        self.stats(model).record(latency_ms, ok)
+
+    def estimate_ms(self, tier: ModelTier, prompt_chars: int) -> float:
+        observed = self.stats(tier.model).p95_ms()
+        base = observed if observed is not None else tier.expected_latency_ms
+        return base + prompt_chars / 1000 * tier.prefill_ms_per_1k_chars
+
+    def healthy(self, tier: ModelTier) -> bool:
+        if self.resilience is not None and self.resilience.breaker(f"llm:{tier.model}").is_open:
+            return False
+        return not self.stats(tier.model).degraded(self.max_error_rate)
+
+    def choose(self, prompt_chars: int, budget_ms: float | None = None) -> str:
+        budget_ms = self.default_budget_ms if budget_ms is None else budget_ms
+        healthy = [tier for tier in self.tiers if self.healthy(tier)]
+        fitting = [tier for tier in healthy if self.estimate_ms(tier, prompt_chars) <= budget_ms]
+
+        worthwhile = [tier for tier in fitting if prompt_chars >= tier.min_prompt_chars]
+        if worthwhile:
+            choice, reason = worthwhile[-1], "fits budget"
+        elif fitting:
+            choice, reason = fitting[0], "fits budget"
+        elif healthy:
+            choice, reason = healthy[0], "no tier fits budget"
+        else:
+            choice, reason = self.tiers[0], "no healthy tier"
+
+        logger.debug("routed auto request", extra={"fields": {
+            "model": choice.model, "reason": reason, "prompt_chars": prompt_chars, "budget_ms": budget_ms
+        }})
+        return choice.model
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            models = list(self._stats)
+        return {model: self.stats(model).snapshot() for model in models}
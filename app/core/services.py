@@ -0,0 +1,84 @@
+"""
+Script Name:  services.py
+Description:  Lazily constructed, shared service instances (FastAPI dependency providers).
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+# Heavy modules (LangChain, FAISS, Google SDK) are only imported when a provider is first called.
+if TYPE_CHECKING:
+    from langchain_core.embeddings import Embeddings
+    from app.core.admission import AdmissionController
+    from app.core.conversations import ConversationStore
+    from app.core.expert_knowledge import ExpertKnowledgeService
+    from app.core.rag import RAGService
+    from app.core.resilience import Resilience
+    from app.core.routing import ModelRouter
+
+
+@lru_cache(maxsize=None)
+def get_embeddings() -> "Embeddings":
+    """Single embedding client shared by every service (with timeouts, retries and hedging)."""
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    from app.core.config import EMBEDDING_MODEL, EMBEDDING_TIMEOUT, HEDGE_EMBEDDINGS, HEDGE_MIN_DELAY_MS
+    from app.core.embeddings import ResilientEmbeddings
+    return ResilientEmbeddings(GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL), get_resilience(),
+                               timeout=EMBEDDING_TIMEOUT, hedge=HEDGE_EMBEDDINGS,
+                               hedge_min_delay=HEDGE_MIN_DELAY_MS / 1000)
+
+
+@lru_cache(maxsize=None)
+def get_resilience() -> "Resilience":
+    """Retry / circuit-breaker policy shared by all upstream calls."""
+    from app.core.config import (
+        BREAKER_FAILURE_THRESHOLD, BREAKER_RESET, RETRY_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY
+    )
+    from app.core.resilience import Resilience
+    return Resilience(attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY,
+                      failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET)
+
+
+@lru_cache(maxsize=None)
+def get_rag_service() -> "RAGService":
+    from app.core.rag import RAGService
+    return RAGService(example_selector=get_expert_service())
+
+
+@lru_cache(maxsize=None)
+def get_expert_service() -> "ExpertKnowledgeService":
+    from app.core.expert_knowledge import ExpertKnowledgeService
+    return ExpertKnowledgeService()
+
+
+@lru_cache(maxsize=None)
+def get_conversation_store() -> "ConversationStore":
+    from app.core.conversations import ConversationStore
+    from app.core.config import CONVERSATION_IDLE_TTL, CONVERSATION_MAX_SESSIONS, CONVERSATION_TOKEN_BUDGET
+    return ConversationStore(idle_ttl=CONVERSATION_IDLE_TTL, max_sessions=CONVERSATION_MAX_SESSIONS,
+                             token_budget=CONVERSATION_TOKEN_BUDGET)
+
+
+@lru_cache(maxsize=None)
+def get_admission_controller() -> "AdmissionController":
+    from app.core.admission import AdmissionController
+    from app.core.config import (
+        ADMISSION_MAX_QUEUE, ADMISSION_MAX_WAIT, DEFAULT_MODEL_CONCURRENCY, MODEL_CONCURRENCY
+    )
+    return AdmissionController(default_limit=DEFAULT_MODEL_CONCURRENCY, model_limits=MODEL_CONCURRENCY,
+                               max_queue=ADMISSION_MAX_QUEUE, max_wait=ADMISSION_MAX_WAIT)
+
+
+@lru_cache(maxsize=None)
+def get_model_router() -> "ModelRouter":
+    """Routes `auto` chat requests; also collects per-model latency / error statistics."""
+    from app.core.config import ROUTING_DEFAULT_BUDGET_MS, ROUTING_MAX_ERROR_RATE, ROUTING_TIERS
+    from app.core.routing import ModelRouter, ModelTier
+    return ModelRouter([ModelTier(**tier) for tier in ROUTING_TIERS],
+                       default_budget_ms=ROUTING_DEFAULT_BUDGET_MS, max_error_rate=ROUTING_MAX_ERROR_RATE,
+                       resilience=get_resilience())
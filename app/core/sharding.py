@@ -0,0 +1,272 @@
+"""
+Script Name:  sharding.py
+Description:  Sharded document index: chunks are assigned to N FAISS shards by document hash,
+              shards are built and written in parallel, and each query searches all shards in
+              parallel and merges their top-k by distance.
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from app.core.telemetry import get_logger
+
+logger = get_logger(__name__)
+
+# Files under the index directory (the docstore keeps LangChain's index.pkl layout)
+SHARD_MANIFEST_FILE = "shards.json"
+DOCSTORE_FILE = "index.pkl"
+FLAT_INDEX_FILE = "index.faiss"
+BUILD_FILE = "build.json"  # the layout and id of the build that wrote index.pkl
+
+# One process-wide pool for shard searches and writes, shared by every ShardedIndex so a
+# rebuild or hot swap does not leave the previous index's threads behind
+_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def shard_pool(workers: int) -> ThreadPoolExecutor:
+    """The shared shard pool, created with `workers` threads by its first user."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard-search")
+        return _pool
+
+
+def shard_file(shard: int) -> str:
+    return f"shard-{shard:03d}.faiss"
+
+
+def shard_of(source: str, num_shards: int) -> int:
+    """Shard of a document, from a stable hash of its file name (every chunk of a PDF lands together)."""
+    digest = hashlib.sha1(os.path.basename(source).encode()).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+
+class ShardedIndex:
+    """
+    Several FAISS indexes searched as one. Shard `s` holds the contiguous global rows
+    offsets[s] .. offsets[s] + ntotal - 1, so a shard-local label plus its offset is the row
+    LangChain's docstore mapping expects. A shard can be anything with faiss.Index's
+    `search(x, k, params=...)`, `ntotal` and `d`. Exposes the same subset of the faiss.Index
+    API as RerankedIndex (`search`, `search_subset`, `ntotal`, `d`).
+    """
+
+    def __init__(self, shards: list, threads: int = 0):
+        self.shards = shards
+        self.offsets = np.cumsum([0] + [shard.ntotal for shard in shards])
+        # FAISS releases the GIL while searching, so shard searches run in parallel on threads
+        self._pool = shard_pool(threads or len(shards))
+
+    @property
+    def ntotal(self) -> int:
+        return int(self.offsets[-1])
+
+    @property
+    def d(self) -> int:
+        return self.shards[0].d
+
+    def search(self, x: np.ndarray, k: int, *, params=None) -> tuple[np.ndarray, np.ndarray]:
+        if params is not None:
+            raise ValueError("ShardedIndex takes row subsets through search_subset, not search parameters")
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        return self._gather(x, k, [(s, None) for s, shard in enumerate(self.shards) if shard.ntotal])
+
+    def search_subset(self, x: np.ndarray, k: int, rows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Searches only the given sorted global rows; each shard gets an ID selector for its part."""
+        x = np.ascontiguousarray(x, dtype=np.float32)
+        bounds = np.searchsorted(rows, self.offsets)
+        parts = [(s, rows[bounds[s]:bounds[s + 1]] - self.offsets[s]) for s in range(len(self.shards))]
+        return self._gather(x, k, [(s, local) for s, local in parts if len(local)])
+
+    def _gather(self, x: np.ndarray, k: int, targets: list[tuple[int, np.ndarray | None]]):
+        """Scatters the search to the target shards and merges their results by distance."""
+        def search_shard(target):
+            s, local = target
+            shard = self.shards[s]
+            shard_k = min(k, shard.ntotal if local is None else len(local))
+            params = None if local is None else faiss.SearchParameters(sel=faiss.IDSelectorBatch(local))
+            distances, labels = shard.search(x, shard_k, params=params)
+            return distances, np.where(labels >= 0, labels + self.offsets[s], -1)
+
+        if not targets:
+            return np.full((len(x), k), np.inf, dtype=np.float32), np.full((len(x), k), -1, dtype=np.int64)
+        results = list(self._pool.map(search_shard, targets)) if len(targets) > 1 else [search_shard(targets[0])]
+        distances = np.concatenate([d for d, _ in results], axis=1)
+        labels = np.concatenate([l for _, l in results], axis=1)
+        distances[labels < 0] = np.inf
+
+        best = np.argsort(distances, axis=1, kind="stable")[:, :k]
+        distances = np.take_along_axis(distances, best, axis=1)
+        labels = np.take_along_axis(labels, best, axis=1)
+        if labels.shape[1] < k:  # fewer candidates than k across all shards: pad like FAISS
+            pad = k - labels.shape[1]
+            distances = np.pad(distances, ((0, 0), (0, pad)), constant_values=np.inf)
+            labels = np.pad(labels, ((0, 0), (0, pad)), constant_values=-1)
+        return distances.astype(np.float32), labels
+
+
+def build_sharded(splits: list, embeddings, num_shards: int, threads: int = 0):
+    """
+    A LangChain FAISS store over `splits` whose index is a ShardedIndex. Chunks are grouped
+    by shard (keeping their order within a shard) and the shards are embedded and built in
+    parallel. Nothing is written; see save_sharded.
+    """
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+
+    groups: list[list] = [[] for _ in range(num_shards)]
+    for doc in splits:
+        groups[shard_of(doc.metadata.get("source", ""), num_shards)].append(doc)
+
+    def build_shard(docs: list) -> faiss.Index:
+        vectors = np.asarray(embeddings.embed_documents([doc.page_content for doc in docs]), dtype=np.float32)
+        shard = faiss.IndexFlatL2(vectors.shape[1])
+        shard.add(vectors)
+        return shard
+
+    with ThreadPoolExecutor(max_workers=threads or num_shards, thread_name_prefix="shard-build") as pool:
+        built = iter(list(pool.map(build_shard, [docs for docs in groups if docs])))
+    # A shard no document hashed to stays empty (but present, so the shard count is stable)
+    shards = [next(built) if docs else None for docs in groups]
+    dim = next(shard.d for shard in shards if shard is not None)
+    shards = [shard if shard is not None else faiss.IndexFlatL2(dim) for shard in shards]
+
+    ordered = [doc for docs in groups for doc in docs]
+    ids = [str(uuid.uuid4()) for _ in ordered]
+    store = FAISS(embeddings, ShardedIndex(shards, threads), InMemoryDocstore(dict(zip(ids, ordered))),
+                  dict(enumerate(ids)))
+    logger.info("Built sharded index", extra={"fields": {
+        "shards": num_shards, "chunks": len(ordered), "chunks_per_shard": [len(docs) for docs in groups]
+    }})
+    return store
+
+
+def save_sharded(store, index_dir: str) -> None:
+    """
+    Writes the shards (in parallel), the docstore, the build marker and, last, the manifest
+    describing them, which names the build it belongs to.
+    """
+    index: ShardedIndex = store.index
+    path = Path(index_dir)
+    begin_save(index_dir, "sharded")
+
+    list(index._pool.map(lambda s: faiss.write_index(index.shards[s], str(path / shard_file(s))),
+                         range(len(index.shards))))
+    with open(path / DOCSTORE_FILE, "wb") as f:
+        pickle.dump((store.docstore, store.index_to_docstore_id), f)
+
+    assignment = {}
+    for chunk_id in store.index_to_docstore_id.values():
+        source = os.path.basename(store.docstore.search(chunk_id).metadata.get("source", ""))
+        assignment.setdefault(source, shard_of(source, len(index.shards)))
+    manifest = {
+        "num_shards": len(index.shards),
+        "dim": int(index.d),
+        "count": index.ntotal,
+        "shards": [{"file": shard_file(s), "offset": int(index.offsets[s]), "count": int(shard.ntotal)}
+                   for s, shard in enumerate(index.shards)],
+        "assignment": dict(sorted(assignment.items())),
+        "build_id": finish_save(index_dir, "sharded"),
+    }
+    tmp = path / (SHARD_MANIFEST_FILE + ".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, path / SHARD_MANIFEST_FILE)  # written last: the shards are complete
+
+
+def begin_save(index_dir: str, layout: str) -> None:
+    """
+    Prepares `index_dir` for a save in `layout` ("flat" or "sharded"). The two layouts share
+    index.pkl but order their rows differently, so every file of the other layout is removed,
+    along with the build marker (a save that dies part-way leaves nothing a loader accepts).
+    """
+    path = Path(index_dir)
+    path.mkdir(parents=True, exist_ok=True)
+    stale = [path / BUILD_FILE]
+    if layout == "flat":
+        stale += [path / SHARD_MANIFEST_FILE, *path.glob("shard-*.faiss")]
+    else:
+        stale.append(path / FLAT_INDEX_FILE)
+    for file in stale:
+        file.unlink(missing_ok=True)
+
+
+def finish_save(index_dir: str, layout: str) -> str:
+    """Writes the build marker once the `layout` files are complete; returns the new build id."""
+    build_id = uuid.uuid4().hex
+    path = Path(index_dir)
+    tmp = path / (BUILD_FILE + ".tmp")
+    tmp.write_text(json.dumps({"id": build_id, "layout": layout}))
+    os.replace(tmp, path / BUILD_FILE)
+    return build_id
+
+
+def build_id(index_dir: str, layout: str) -> str | None:
+    """Id of the build that wrote index.pkl, or None if there is none or it used another layout."""
+    try:
+        build = json.loads((Path(index_dir) / BUILD_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+    return build.get("id") if build.get("layout") == layout else None
+
+
+def is_flat_build(index_dir: str) -> bool:
+    """
+    Whether index.pkl belongs to a flat save. Directories without a build marker are taken as
+    flat (FAISS.save_local writes none) unless a shard manifest shows otherwise.
+    """
+    path = Path(index_dir)
+    if (path / BUILD_FILE).exists():
+        return build_id(index_dir, "flat") is not None
+    return not (path / SHARD_MANIFEST_FILE).exists()
+
+
+def load_docstore(index_dir: str) -> tuple:
+    """(docstore, index_to_docstore_id) saved next to the index, as FAISS.save_local writes them."""
+    # Same docstore file (and trust assumption) as FAISS.load_local
+    with open(Path(index_dir) / DOCSTORE_FILE, "rb") as f:
+        return pickle.load(f)
+
+
+def load_sharded(index_dir: str, embeddings, num_shards: int, threads: int = 0):
+    """
+    The saved sharded store, or None if there is none or it was built with a different
+    shard count or belongs to a different build than index.pkl (the caller then rebuilds it).
+    """
+    from langchain_community.vectorstores import FAISS
+
+    path = Path(index_dir)
+    try:
+        manifest = json.loads((path / SHARD_MANIFEST_FILE).read_text())
+    except (OSError, ValueError):
+        return None
+    if manifest.get("num_shards") != num_shards:
+        return None
+    if manifest.get("build_id") is None or manifest["build_id"] != build_id(index_dir, "sharded"):
+        return None
+
+    def read_shard(entry: dict):
+        return faiss.read_index(str(path / entry["file"]))
+
+    with ThreadPoolExecutor(max_workers=threads or num_shards) as pool:
+        shards = list(pool.map(read_shard, manifest["shards"]))
+    if [shard.ntotal for shard in shards] != [entry["count"] for entry in manifest["shards"]]:
+        return None
+    docstore, index_to_docstore_id = load_docstore(index_dir)
+    if len(index_to_docstore_id) != manifest["count"]:
+        return None
+    return FAISS(embeddings, ShardedIndex(shards, threads), docstore, index_to_docstore_id)
@@ -0,0 +1,169 @@
+"""
+Script Name:  shared_index.py
+Description:  Versioned, memory-mapped document index for multi-worker serving: every worker maps
+              the same read-only files (sharing their pages) and follows a version marker.
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import json
+import mmap
+import os
+import shutil
+import time
+import uuid
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from pathlib import Path
+
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+
+from app.core.telemetry import get_logger
+
+logger = get_logger(__name__)
+
+# Layout under the index directory:
+#   CURRENT                  name of the version being served (replaced atomically on publish)
+#   versions/<version>/      one immutable index build:
+#       index.faiss / index.pkl and any compressed sidecars (the regular on-disk index), plus
+#       chunks.jsonl         chunk text + metadata, one JSON object per FAISS row
+#       chunks.i64           int64 byte offset of each row's line in chunks.jsonl
+#       PUBLISHED            marker: this version has been served (absent for crashed builds)
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+CHUNKS_FILE = "chunks.jsonl"
+CHUNK_OFFSETS_FILE = "chunks.i64"
+PUBLISHED_MARKER = "PUBLISHED"
+
+# Flat-code indexes (flat, scalar-quantized, PQ) are mapped instead of read into private memory
+MMAP_FLAGS = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY
+
+
+def current_version(root: str) -> str | None:
+    try:
+        return (Path(root) / CURRENT_FILE).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def version_dir(root: str, version: str) -> str:
+    return str(Path(root) / VERSIONS_DIR / version)
+
+
+def new_version_dir(root: str) -> tuple[str, str]:
+    """A fresh (version, directory) to build into; versions sort by creation time."""
+    now = time.time_ns()
+    version = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime(now // 10**9))}.{now % 10**9:09d}-{uuid.uuid4().hex[:8]}"
+    path = version_dir(root, version)
+    os.makedirs(path)
+    return version, path
+
+
+@contextmanager
+def build_lock(root: str) -> Iterator[None]:
+    """Cross-process lock (flock) held while a worker builds and publishes a version."""
+    import fcntl  # POSIX only; imported here so the module loads where locking is never used
+
+    with open(Path(root) / ".build.lock", "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def write_chunks(store, path: str) -> None:
+    """Writes the docstore of a LangChain FAISS `store` as mappable chunk files, in row order."""
+    offsets = np.empty(store.index.ntotal, dtype=np.int64)
+    with open(Path(path) / CHUNKS_FILE, "wb") as f:
+        for row in range(store.index.ntotal):
+            chunk_id = store.index_to_docstore_id[row]
+            doc = store.docstore.search(chunk_id)
+            offsets[row] = f.tell()
+            f.write(json.dumps({"text": doc.page_content, "metadata": doc.metadata}, default=str).encode() + b"\n")
+    offsets.tofile(Path(path) / CHUNK_OFFSETS_FILE)
+
+
+def publish(root: str, version: str, keep: int = 2) -> None:
+    """
+    Makes `version` the one every worker serves, then prunes older versions: the newest
+    `keep - 1` previously published ones stay (for workers still serving them), while older
+    published versions and builds that were never published are removed. Newer directories
+    are left alone. Call under build_lock.
+    """
+    (Path(version_dir(root, version)) / PUBLISHED_MARKER).touch()
+    tmp = Path(root) / f"{CURRENT_FILE}.{os.getpid()}.tmp"
+    tmp.write_text(version)
+    os.replace(tmp, Path(root) / CURRENT_FILE)
+    logger.info("Published index version", extra={"fields": {"version": version}})
+
+    # Version names sort by creation time. Workers still serving a removed version keep
+    # their mappings valid after the unlink (POSIX).
+    older = sorted(v for v in os.listdir(Path(root) / VERSIONS_DIR) if v < version)
+    published = [v for v in older if (Path(version_dir(root, v)) / PUBLISHED_MARKER).exists()]
+    retained = set(published[-(keep - 1):]) if keep > 1 else set()
+    for old in older:
+        if old not in retained:
+            shutil.rmtree(version_dir(root, old), ignore_errors=True)
+
+
+class RowIds(Mapping):
+    """FAISS row -> docstore id for a mapped version: the row number itself, as a string."""
+
+    def __init__(self, count: int):
+        self.count = count
+
+    def __getitem__(self, row: int) -> str:
+        if not 0 <= row < self.count:
+            raise KeyError(row)
+        return str(row)
+
+    def __iter__(self):
+        return iter(range(self.count))
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class MappedDocstore:
+    """
+    Read-only docstore over chunks.jsonl, memory-mapped so all workers share its pages.
+    Implements the `search` lookup LangChain's FAISS store uses; ids are row numbers.
+    """
+
+    def __init__(self, path: str):
+        with open(Path(path) / CHUNKS_FILE, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.offsets = np.memmap(Path(path) / CHUNK_OFFSETS_FILE, dtype=np.int64, mode="r")
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def search(self, chunk_id: str) -> Document | str:
+        row = int(chunk_id)
+        if not 0 <= row < len(self.offsets):
+            return f"ID {chunk_id} not found."  # what InMemoryDocstore returns
+        start = int(self.offsets[row])
+        record = json.loads(self._map[start:self._map.find(b"\n", start)])
+        return Document(page_content=record["text"], metadata=record["metadata"])
+
+
+def open_mapped(path: str, embeddings, index=None):
+    """
+    A LangChain FAISS store over the version at `path`, with the FAISS codes and the chunk
+    text memory-mapped read-only. `index` overrides the index to search (e.g. a compressed
+    RerankedIndex already opened by the caller).
+    """
+    from langchain_community.vectorstores import FAISS
+
+    if index is None:
+        index = faiss.read_index(str(Path(path) / "index.faiss"), MMAP_FLAGS)
+    docstore = MappedDocstore(path)
+    if len(docstore) != index.ntotal:
+        raise ValueError(f"Index version at {path} is inconsistent ({index.ntotal} vectors, {len(docstore)} chunks)")
+    return FAISS(embeddings, index, docstore, RowIds(index.ntotal))
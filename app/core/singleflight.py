@@ -0,0 +1,186 @@
+"""
+Script Name:  singleflight.py
+Description:  Coalesces identical concurrent requests into one in-flight computation (single-flight).
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import asyncio
+import contextvars
+import sys
+import threading
+from typing import Any, Awaitable, Callable, Hashable, Iterator
+
+from app.core.telemetry import get_logger
+
+logger = get_logger(__name__)
+
+
+class SingleFlight:
+    """
+    Async single-flight. The first caller for a key runs the coroutine `fn()`; callers
+    arriving while it is in flight await the same result (or exception). The computation
+    is a task of its own, so it is not abandoned if the caller that started it disconnects.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def held_bytes(self) -> int:
+        """Approximate memory held by the in-flight keys and any results not yet handed out."""
+        from app.core.memory import approx_size
+
+        calls = list(self._calls.items())
+        results = [task.result() for _, task in calls
+                   if task.done() and not task.cancelled() and task.exception() is None]
+        return approx_size([key for key, _ in calls]) + approx_size(results)
+
+    async def do(self, key: Hashable | None, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """Returns (result, coalesced). A `None` key is never shared."""
+        if key is None:
+            return await fn(), False
+
+        task = self._calls.get(key)
+        coalesced = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        # shield: one waiter being cancelled must not cancel the shared computation
+        return await asyncio.shield(task), coalesced
+
+
+class SharedStream:
+    """
+    Buffer for one streamed computation that any number of readers can follow.
+    Each reader replays the chunks produced so far, then follows live output.
+    The producer is cancelled only once every reader has detached.
+    """
+
+    def __init__(self):
+        self.chunks: list[str] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.cancel_event = threading.Event()  # passed to the producer
+        self.readers = 0
+        self.result: Any = None  # optional producer-side summary (e.g. stage timings)
+        self._cond = threading.Condition()
+
+    def publish(self, chunk: str) -> None:
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, error: BaseException | None = None) -> None:
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def attach(self) -> bool:
+        """Registers a reader; False if the stream is already being torn down."""
+        with self._cond:
+            if self.cancel_event.is_set():
+                return False
+            self.readers += 1
+            return True
+
+    def detach(self) -> None:
+        """Unregisters an attached reader that will not read; the last one cancels the producer."""
+        with self._cond:
+            self.readers -= 1
+            if self.readers == 0 and not self.done:
+                self.cancel_event.set()
+
+    def read(self, cancel_event: threading.Event | None = None, poll: float = 0.1) -> Iterator[str]:
+        """
+        Yields every chunk from the start. Raises the producer's error at the end, if any.
+        Stops early (detaching this reader only) when `cancel_event` is set.
+        The caller must have called `attach()`; finishing or closing the iterator detaches it.
+        """
+        position = 0
+        try:
+            while True:
+                with self._cond:
+                    while position == len(self.chunks) and not self.done:
+                        if cancel_event is not None and cancel_event.is_set():
+                            return
+                        self._cond.wait(poll)
+                    pending = self.chunks[position:]
+                    finished, error = self.done, self.error
+                for chunk in pending:
+                    if cancel_event is not None and cancel_event.is_set():
+                        return
+                    yield chunk
+                position += len(pending)
+                if finished and position == len(self.chunks):
+                    if error is not None:
+                        raise error
+                    return
+        finally:
+            self.detach()
+
+
+class StreamFlight:
+    """Single-flight for streamed computations, backed by a producer thread per key."""
+
+    def __init__(self):
+        self._streams: dict[Hashable, SharedStream] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._streams)
+
+    def buffered_bytes(self) -> int:
+        """Approximate memory held by the replay buffers of the in-flight streams."""
+        with self._lock:
+            streams = list(self._streams.values())
+        return sum(sys.getsizeof(chunk) for stream in streams for chunk in list(stream.chunks))
+
+    def join(self, key: Hashable | None) -> SharedStream | None:
+        """The in-flight stream for `key`, attached for the caller, or None."""
+        if key is None:
+            return None
+        with self._lock:
+            stream = self._streams.get(key)
+            return stream if stream is not None and stream.attach() else None
+
+    def open(self, key: Hashable | None,
+             produce: Callable[[SharedStream], Iterator[str]]) -> tuple[SharedStream, bool]:
+        """
+        Joins the in-flight stream for `key`, or starts `produce(stream)` on a new thread.
+        Returns (stream, coalesced); the stream is already attached for the caller.
+        A `None` key is never shared.
+        """
+        with self._lock:
+            stream = self._streams.get(key) if key is not None else None
+            if stream is not None and stream.attach():
+                return stream, True
+
+            stream = SharedStream()
+            stream.attach()
+            if key is not None:
+                self._streams[key] = stream
+
+        def run():
+            try:
+                for chunk in produce(stream):
+                    stream.publish(chunk)
+                stream.finish()
+            except Exception as e:
+                stream.finish(e)
+            finally:
+                with self._lock:
+                    if key is not None and self._streams.get(key) is stream:
+                        del self._streams[key]
+
+        # copy_context: the producer logs under, and is profiled with, the starting request
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(run,), name="stream-producer", daemon=True).start()
+        return stream, False
@@ -0,0 +1,94 @@
+"""
+Script Name:  telemetry.py
+Description:  Structured JSON logging, request correlation ids, and per-request stage timings.
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import json
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from app.core.config import LOG_LEVEL
+
+# Correlation id of the request currently being served ("-" outside a request)
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+_configured = False
+
+
+class JsonFormatter(logging.Formatter):
+    """Renders each log record as a single JSON line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": request_id_var.get(),
+            "message": record.getMessage(),
+        }
+        # Structured fields passed as logger.info(..., extra={"fields": {...}})
+        fields = getattr(record, "fields", None)
+        if fields:
+            payload.update(fields)
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Returns a logger under the 'app' namespace, configuring JSON output once."""
+    global _configured
+    if not _configured:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(JsonFormatter())
+        root = logging.getLogger("app")
+        root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        root.propagate = False
+        _configured = True
+    return logging.getLogger(name)
+
+
+@dataclass
+class StageTimings:
+    """
+    Collects wall-clock durations (ms) for the stages of a single query,
+    plus the size of the retrieved context and the final prompt.
+    """
+    stages: dict[str, float] = field(default_factory=dict)
+    retrieved_chunks: int = 0
+    prompt_chars: int = 0
+    model: str | None = None  # Model that generated the answer (resolved when routed `auto`)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Times the enclosed block and accumulates it under `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def as_dict(self) -> dict:
+        """Flat representation used for API responses and log fields."""
+        data = {f"{name}_ms": round(ms, 2) for name, ms in self.stages.items()}
+        data["retrieved_chunks"] = self.retrieved_chunks
+        data["prompt_chars"] = self.prompt_chars
+        if self.model is not None:
+            data["model"] = self.model
+        return data
+
+    def server_timing_header(self) -> str:
+        """Formats the stages as a W3C `Server-Timing` header value."""
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in self.stages.items())
@@ -0,0 +1,124 @@
+"""
+Script Name:  api_client.py
+Description:  Pooled, keep-alive HTTP client for the dashboard's calls to the FastAPI backend.
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import json
+import threading
+from typing import Any, Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class BackendClient:
+    """
+    Thin wrapper over a shared `requests.Session`.
+    Connections are pooled and kept alive across Streamlit reruns and users, every call
+    has a timeout, and GETs of profile data are revalidated with ETags so an unchanged
+    profile list costs a bodiless 304.
+    """
+
+    def __init__(self, base_url: str, connect_timeout: float = 3.0, read_timeout: float = 30.0,
+                 chat_timeout: float = 300.0, pool_size: int = 32):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.chat_timeout = (connect_timeout, chat_timeout)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # path -> (etag, decoded body) for conditional GETs
+        self._validators: dict[str, tuple[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _url(self, path: str) -> str:
+        return f"{self.base_url}{path}"
+
+    def get_json_conditional(self, path: str) -> Any:
+        """GET `path`, reusing the last body when the backend answers 304 Not Modified."""
+        with self._lock:
+            cached = self._validators.get(path)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+
+        res = self.session.get(self._url(path), headers=headers, timeout=self.timeout)
+        if res.status_code == 304 and cached:
+            return cached[1]
+        res.raise_for_status()
+        body = res.json()
+        if etag := res.headers.get("ETag"):
+            with self._lock:
+                self._validators[path] = (etag, body)
+        return body
+
+    # --- System ---
+
+    def is_online(self) -> tuple[bool, str]:
+        """Returns (online, message) from the liveness endpoint."""
+        try:
+            res = self.session.get(self._url("/"), timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            return False, "Backend: Offline"
+        if res.status_code == 200:
+            return True, "Backend: Online"
+        return False, f"Backend Status: {res.status_code}"
+
+    def rebuild(self) -> requests.Response:
+        return self.session.post(self._url("/rebuild"), timeout=self.chat_timeout)
+
+    def list_documents(self) -> list[dict]:
+        res = self.session.get(self._url("/documents"), timeout=self.timeout)
+        res.raise_for_status()
+        return res.json()["documents"]
+
+    # --- Settings ---
+
+    def list_profiles(self) -> list[str]:
+        return self.get_json_conditional("/settings")
+
+    def get_profile(self, name: str) -> dict:
+        return self.get_json_conditional(f"/settings/{name}")
+
+    def save_profile(self, payload: dict) -> requests.Response:
+        return self.session.post(self._url("/settings"), json=payload, timeout=self.timeout)
+
+    def delete_profile(self, name: str) -> requests.Response:
+        return self.session.delete(self._url(f"/settings/{name}"), timeout=self.timeout)
+
+    # --- Features / Chat ---
+
+    def select_examples(self, query: str, k: int = 3) -> requests.Response:
+        return self.session.post(self._url("/features/select_examples"),
+                                 json={"query": query, "k": k}, timeout=self.timeout)
+
+    def retrieve(self, queries: list[str], k: int = 4) -> requests.Response:
+        return self.session.post(self._url("/retrieve"), json={"queries": queries, "k": k},
+                                 timeout=self.timeout)
+
+    def chat(self, payload: dict) -> requests.Response:
+        return self.session.post(self._url("/chat"), json=payload, timeout=self.chat_timeout)
+
+    def chat_stream(self, payload: dict) -> Iterator[dict]:
+        """
+        Yields the backend's streaming events (`start`, `token`, `done`, `error`) as dicts.
+        Closing the generator closes the HTTP response, which also stops generation upstream.
+        """
+        with self.session.post(self._url("/chat/stream"), json=payload,
+                               timeout=self.chat_timeout, stream=True) as res:
+            res.raise_for_status()
+            for line in res.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def cancel_stream(self, stream_id: str) -> requests.Response:
+        return self.session.post(self._url(f"/chat/stream/{stream_id}/cancel"), timeout=self.timeout)
+
+    def delete_session(self, session_id: str) -> requests.Response:
+        return self.session.delete(self._url(f"/sessions/{session_id}"), timeout=self.timeout)
@@ -11,9 +11,9 @@ License: MIT
 import streamlit as st
 import requests
 import json
+import uuid
 from typing import Any
 
-# Backend URL
 # Backend URL
 from app.core.config import (
     API_URL, 
@@ -22,8 +22,17 @@ from app.core.config import (
     DOC_SAMPLE_QUESTIONS,
     DOC_PROMPTING,
     DOC_RAG_CONCEPTS,
-    DOC_UI_GUIDE
+    DOC_UI_GUIDE,
+    FRONTEND_CONNECT_TIMEOUT,
+    FRONTEND_READ_TIMEOUT,
+    FRONTEND_CHAT_TIMEOUT,
+    FRONTEND_HEALTH_TTL,
+    FRONTEND_PROFILES_TTL,
+    FRONTEND_DOCS_TTL,
+    FRONTEND_HISTORY_WINDOW,
 )
+from app.core.prompts import PROMPT_TEMPLATES
+from app.frontend.api_client import BackendClient
 
 st.set_page_config(page_title="Medical AI Assistant", page_icon="app/frontend/assets/favicon.png", layout="wide")
 
@@ -52,55 +61,58 @@ with col_h1:
 with col_h2:
     selected_model = st.selectbox(
         "Model", 
-        ["gemini-2.5-flash", "gemini-3-pro-preview"],
+        ["auto", "gemini-2.5-flash", "gemini-3-pro-preview"],
         index=0,
         label_visibility="collapsed"
     )
 
-# --- PROMPT TEMPLATES ---
-PROMPT_TEMPLATES: dict[str, str] = {
-    "According-to (Standard)": """You are a precise medical research assistant.
-Instruction: Answer the question strictly according to the provided medical documents.
-Grounding:
-1. Base your response ONLY on the factual data in the context.
-2. Cite specific sections or values (e.g., "BP: 120/80") to support your answer.
-3. If the documents do not contain the answer, state that the information is not available in the provided context.
-
-Question: {input_text}""",
-
-    "Chain of Verification (CoVe)": """You are a thorough researcher. Use a Chain of Verification to ensure accuracy.
-Step 1: Draft an initial response strictly according to the provided documents.
-Step 2: Create validational questions to check if the response is supported by the context.
-Step 3: Answer the validation questions using the context.
-Step 4: Revise the response to ensure complete accuracy.
-
-Question: {input_text}""",
-
-    "Step-Back Prompting": """You are an expert assistant. Use Step-Back Prompting to answer.
-Step 1: Abstract the key concepts and principles relevant to this question.
-Step 2: Use the abstractions to reason through the question.
-Let's think step by step to answer this.
-
-Question: {input_text}""",
+# --- HELPER FUNCTIONS ---
 
-    "Source Grounding (Pre-training)": """You are a helpful assistant.
-Instruction: Ground your response in factual data from your pre-training set, specifically referencing **{source}**.
-Rules:
-1. Provide a COMPREHENSIVE and DETAILED answer.
-2. Ensure all claims can be attributed to {source}.
-3. Structure your response with clear headings and bullet points.
+@st.cache_resource
+def get_client() -> BackendClient:
+    """One pooled keep-alive HTTP session shared by every rerun and user of this server."""
+    return BackendClient(
+        API_URL,
+        connect_timeout=FRONTEND_CONNECT_TIMEOUT,
+        read_timeout=FRONTEND_READ_TIMEOUT,
+        chat_timeout=FRONTEND_CHAT_TIMEOUT,
+    )
 
-Question: {input_text}""",
+@st.cache_data(ttl=FRONTEND_HEALTH_TTL, show_spinner=False)
+def get_backend_status() -> tuple[bool, str]:
+    """Backend liveness, refreshed at most every `health_ttl_s` seconds."""
+    return get_client().is_online()
 
-    "Medical Expert (Example-Based)": """You are a highly experienced medical expert.
-Instruction: Answer the question by mimicking the tone and format of the following expert examples.
+@st.cache_data(ttl=FRONTEND_PROFILES_TTL, show_spinner=False)
+def get_profile_names() -> list[str]:
+    """Profile names; after the TTL the client revalidates with an ETag (304 when unchanged)."""
+    try:
+        return get_client().list_profiles()
+    except requests.exceptions.RequestException:
+        return []
 
-{examples}
+@st.cache_data(ttl=FRONTEND_DOCS_TTL, show_spinner=False)
+def read_doc(file_path: str) -> str | None:
+    """Reads a documentation markdown file once per TTL instead of on every rerun."""
+    try:
+        with open(file_path, "r") as f:
+            return f.read()
+    except OSError:
+        return None
 
-Question: {input_text}"""
-}
+@st.cache_data(ttl=FRONTEND_PROFILES_TTL, show_spinner=False)
+def get_document_names() -> list[str]:
+    """Indexed PDF names, offered as retrieval filters (empty until the index is built)."""
+    try:
+        return [doc["source"] for doc in get_client().list_documents()]
+    except requests.exceptions.RequestException:
+        return []
 
-# --- HELPER FUNCTIONS ---
+def invalidate_backend_caches() -> None:
+    """Drops cached backend reads after a write (save/delete/rebuild)."""
+    get_profile_names.clear()
+    get_document_names.clear()
+    get_backend_status.clear()
 
 def get_dynamic_examples(query_text: str) -> str:
     """Fetches relevant few-shot examples from the backend."""
@@ -108,8 +120,7 @@ def get_dynamic_examples(query_text: str) -> str:
         if not query_text:
             query_text = "medical" 
             
-        payload = {"query": query_text, "k": 3}
-        res = requests.post(f"{API_URL}/features/select_examples", json=payload)
+        res = get_client().select_examples(query_text, k=3)
         
         if res.status_code == 200:
             return res.json().get("examples", "")
@@ -118,17 +129,54 @@ def get_dynamic_examples(query_text: str) -> str:
     except Exception as e:
         return f"Error connecting to backend: {str(e)}"
 
+def format_timings(timings: dict[str, Any]) -> str:
+    """Renders the backend's per-stage timings as a one-line breakdown."""
+    stages = ["embed", "retrieve", "prompt", "generate", "total"]
+    parts = [f"{name} {timings[f'{name}_ms']:.0f} ms" for name in stages if timings.get(f"{name}_ms") is not None]
+    parts.append(f"{timings.get('retrieved_chunks', 0)} chunks")
+    parts.append(f"{timings.get('prompt_chars', 0)} prompt chars")
+    if timings.get("model"):
+        parts.append(timings["model"])
+    return " · ".join(parts)
+
+@st.cache_data(ttl=FRONTEND_PROFILES_TTL, show_spinner=False)
+def get_example_preview() -> str:
+    """Sample examples for the prompt viewer, so toggling it doesn't re-query every rerun."""
+    return get_dynamic_examples("medical help")
+
+def stop_generation() -> None:
+    """
+    Stop-button callback. The click reruns the script, which abandons the stream being
+    rendered; this also tells the backend to stop generating and keeps the partial answer.
+    """
+    stream_id = st.session_state.get("active_stream_id")
+    if stream_id:
+        try:
+            get_client().cancel_stream(stream_id)
+        except requests.exceptions.RequestException:
+            pass  # Closing the connection stops the backend as well
+    partial = st.session_state.get("partial_answer")
+    if partial:
+        st.session_state.messages.append({"role": "assistant", "content": partial + "\n\n*(stopped)*"})
+    st.session_state.active_stream_id = None
+    st.session_state.partial_answer = ""
+
 @st.dialog("Documentation")
 def show_docs(file_path: str):
     """Displays a markdown file in a modal dialog."""
-    try:
-        with open(file_path, "r") as f:
-            content = f.read()
-        st.markdown(content)
-    except FileNotFoundError:
+    content = read_doc(file_path)
+    if content is None:
         st.error(f"Documentation file not found: {file_path}")
-    except Exception as e:
-        st.error(f"Error loading docs: {e}")
+    else:
+        st.markdown(content)
+
+def render_doc(file_path: str) -> None:
+    """Renders a cached documentation file inside the current container."""
+    content = read_doc(file_path)
+    if content is None:
+        st.error("Doc not found")
+    else:
+        st.markdown(content)
 
 
 # --- SIDEBAR ---
@@ -137,48 +185,24 @@ with st.sidebar:
     st.header("Documentation")
     
     with st.expander("Hallucination Theory", icon=":material/psychology:"):
-        try:
-            with open(DOC_HALLUCINATION, "r") as f:
-                st.markdown(f.read())
-        except Exception:
-             st.error("Doc not found")
+        render_doc(DOC_HALLUCINATION)
 
 
 
     with st.expander("RAG Concepts", icon=":material/school:"):
-        try:
-            with open(DOC_RAG_CONCEPTS, "r") as f:
-                st.markdown(f.read())
-        except Exception:
-             st.error("Doc not found")
+        render_doc(DOC_RAG_CONCEPTS)
 
     with st.expander("Prompt Strategies", icon=":material/lightbulb:"):
-        try:
-            with open(DOC_PROMPTING, "r") as f:
-                st.markdown(f.read())
-        except Exception:
-             st.error("Doc not found")
+        render_doc(DOC_PROMPTING)
 
     with st.expander("Model Parameters", icon=":material/tune:"):
-        try:
-            with open(DOC_MODEL_PARAMETERS, "r") as f:
-                st.markdown(f.read())
-        except Exception:
-             st.error("Doc not found")
+        render_doc(DOC_MODEL_PARAMETERS)
 
     with st.expander("UI Guide", icon=":material/map:"):
-        try:
-            with open(DOC_UI_GUIDE, "r") as f:
-                st.markdown(f.read())
-        except Exception:
-             st.error("Doc not found")
+        render_doc(DOC_UI_GUIDE)
 
     with st.expander("Sample Questions", icon=":material/quiz:"):
-        try:
-            with open(DOC_SAMPLE_QUESTIONS, "r") as f:
-                st.markdown(f.read())
-        except Exception:
-             st.error("Doc not found")
+        render_doc(DOC_SAMPLE_QUESTIONS)
         
     st.markdown("---")
     
@@ -188,12 +212,20 @@ with st.sidebar:
     with col_s1:
         if st.button("Clear Chat", icon=":material/delete:", use_container_width=True):
             st.session_state.messages = []
+            # Drop the server-side history too and start a fresh conversation
+            if session_id := st.session_state.get("session_id"):
+                try:
+                    get_client().delete_session(session_id)
+                except requests.exceptions.RequestException:
+                    pass  # The backend evicts idle sessions on its own
+            st.session_state.session_id = uuid.uuid4().hex
             st.rerun()
     with col_s2:
         if st.button("Rebuild Index", icon=":material/refresh:", use_container_width=True):
             with st.spinner("Rebuilding..."):
                 try:
-                    requests.post(f"{API_URL}/rebuild")
+                    get_client().rebuild()
+                    invalidate_backend_caches()
                     st.success("Done!")
                 except:
                     st.error("Failed")
@@ -205,11 +237,7 @@ with st.sidebar:
 
     # Profiles Manager
     with st.expander("Profiles", icon=":material/save:"):
-        try:
-            profiles_res = requests.get(f"{API_URL}/settings")
-            profiles = profiles_res.json() if profiles_res.status_code == 200 else []
-        except:
-            profiles = []
+        profiles = get_profile_names()
 
         if profiles:
             selected_profile = st.selectbox("Select Profile", profiles, key="profile_selector")
@@ -217,9 +245,8 @@ with st.sidebar:
             with col_p1:
                 if st.button("Load", use_container_width=True):
                     try:
-                        res = requests.get(f"{API_URL}/settings/{selected_profile}")
-                        if res.status_code == 200:
-                            data = res.json()
+                        data = get_client().get_profile(selected_profile)
+                        if data:
                             st.session_state.prompt_template_selector = data["prompt_template"]
                             st.session_state.target_source_selector = data["target_source"] if data["target_source"] else ""
                             st.session_state.temp_slider = data["temperature"]
@@ -234,7 +261,8 @@ with st.sidebar:
                 with st.popover("Delete", icon=":material/delete:", use_container_width=True):
                     st.write(f"Delete **{selected_profile}**?")
                     if st.button("Confirm", type="primary", use_container_width=True):
-                        requests.delete(f"{API_URL}/settings/{selected_profile}")
+                        get_client().delete_profile(selected_profile)
+                        invalidate_backend_caches()
                         st.rerun()
         
         # Save Profile
@@ -250,7 +278,8 @@ with st.sidebar:
                     "prompt_template": st.session_state.prompt_template_selector,
                     "target_source": st.session_state.get("target_source_selector", None)
                 }
-                requests.post(f"{API_URL}/settings", json=payload)
+                get_client().save_profile(payload)
+                invalidate_backend_caches()
                 st.success("Saved!")
                 st.rerun()
 
@@ -264,6 +293,16 @@ with st.sidebar:
         help="**Truth Toggle**\n\n* **ON**: Reads your local PDFs to find the answer. Minimizes hallucinations.\n* **OFF**: Uses only the AI's general training (like standard ChatGPT)."
     )
 
+    search_sources = []
+    if use_rag:
+        search_sources = st.multiselect(
+            "Search Only In",
+            get_document_names(),
+            key="search_sources_selector",
+            placeholder="All documents",
+            help="**Scope Limiter**\n\nRestricts the database search to the selected PDFs. Scoped questions get faster, more focused context."
+        )
+
     template_style = st.selectbox(
         "Prompt Template",
         list(PROMPT_TEMPLATES.keys()),
@@ -293,7 +332,7 @@ with st.sidebar:
              preview_text = preview_text.format(source=target_source if target_source else "[SOURCE]", input_text="[YOUR QUESTION]")
         
         if "{examples}" in raw_template:
-             examples_content = get_dynamic_examples("medical help")
+             examples_content = get_example_preview()
              short_preview = "\n".join(examples_content.split("\n")[:4]) + "\n... (more dynamic examples) ..."
              preview_text = preview_text.replace("{examples}", short_preview).replace("{input_text}", "[YOUR QUESTION]")
         
@@ -331,92 +370,95 @@ with st.sidebar:
     
     st.markdown("---")
     
-    try:
-        status_res = requests.get(f"{API_URL}/")
-        if status_res.status_code == 200:
-            st.success("Backend: Online")
-        else:
-            st.error(f"Backend Status: {status_res.status_code}")
-    except requests.exceptions.ConnectionError:
-        st.error("Backend: Offline")
+    online, status_message = get_backend_status()
+    if online:
+        st.success(status_message)
+    else:
+        st.error(status_message)
 
 # --- CHAT INTERFACE ---
 
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
 st.markdown("<div style='margin-top: 20px;'></div>", unsafe_allow_html=True) 
 
-for message in st.session_state.messages:
+# Only the most recent messages are re-rendered on every rerun
+visible_messages = st.session_state.messages
+hidden_count = len(visible_messages) - FRONTEND_HISTORY_WINDOW
+if hidden_count > 0:
+    if not st.toggle(f"Show full history ({hidden_count} earlier messages hidden)", key="show_full_history"):
+        visible_messages = visible_messages[-FRONTEND_HISTORY_WINDOW:]
+
+for message in visible_messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
 if prompt := st.chat_input("Type your medical question..."):
     
-    # 1. Apply Template Logic
-    # SMART OVERRIDE: If user picked a source (e.g. CDC) but didn't switch template, fix it.
-    effective_template = template_style
-    
-    if target_source and "{source}" not in PROMPT_TEMPLATES[template_style]:
-        effective_template = "Source Grounding (Pre-training)"
-        
-    # SMART OVERRIDE: If RAG is OFF and template is "Strict", switch to General Knowledge to avoid refusal.
-    if not use_rag and effective_template == "According-to (Standard)":
-        effective_template = "Source Grounding (Pre-training)"
-        if not target_source:
-            target_source = "General Medical Knowledge"
+    # 1. Template Logic: overrides, few-shot selection and rendering all happen in the
+    # backend during retrieval (one round trip, one shared query embedding).
 
-    raw_template = PROMPT_TEMPLATES[effective_template]
-    
-    if "{source}" in raw_template:
-        source_text = target_source if target_source else "MEDICAL SCIENCE"
-        final_prompt = raw_template.format(source=source_text, input_text=prompt)
-    elif "{examples}" in raw_template:
-        examples_content = get_dynamic_examples(prompt)
-        final_prompt = raw_template.format(examples=examples_content, input_text=prompt)
-    else:
-        final_prompt = raw_template.format(input_text=prompt)
-    
     # 2. Add to History
     st.session_state.messages.append({"role": "user", "content": prompt}) 
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    # 3. Generate Response
+    # 3. Generate Response (streamed token by token)
+    payload = {
+        "query": prompt, # RAW QUERY (used for retrieval)
+        "template": template_style, # Rendered server-side
+        "source": target_source or None,
+        "num_examples": 3,
+        "use_rag": use_rag,
+        "temperature": temperature,
+        "max_output_tokens": int(max_output_tokens),
+        "top_p": top_p,
+        "top_k": top_k,
+        "model": selected_model,
+        "session_id": st.session_state.session_id, # Backend keeps the conversation history
+        "filters": {"sources": search_sources} if search_sources else None,
+    }
+
     with st.chat_message("assistant"):
-        with st.status("Processing request...", expanded=True) as status:
-            st.write(f"Applying template: {template_style}...")
-            st.write("Connecting to knowledge base...")
-            
-            payload = {
-                "query": final_prompt, # WRAPPED QUERY
-                "wrapped_query": final_prompt, # NEW FIELD in models.py (sending same for now as main.py handles it)
-                "use_rag": use_rag,
-                "temperature": temperature,
-                "max_output_tokens": int(max_output_tokens),
-                "top_p": top_p,
-                "top_p": top_p,
-                "top_k": top_k,
-                "model": selected_model
-            }
-            
-            # NOTE: Backend expects 'query' as raw and 'wrapped_query' as templated.
-            # Fix: Send RAW prompt as 'query' and TEMPLATED prompt as 'wrapped_query'
-            payload["query"] = prompt 
-            
-            answer = None
-            try:
-                response = requests.post(f"{API_URL}/chat", json=payload)
-                if response.status_code == 200:
-                    answer = response.json()["response"]
-                    status.update(label="Complete", state="complete", expanded=False)
-                else:
-                    status.update(label="Error", state="error", expanded=True)
-                    st.error(f"Backend Error: {response.text}")
-            except Exception as e:
-                status.update(label="Connection Failed", state="error", expanded=True)
-                st.error(f"Connection Error: {e}")
-        
+        st.session_state.partial_answer = ""
+        st.button("Stop", icon=":material/stop_circle:", on_click=stop_generation, key="stop_generation")
+
+        stream_result: dict[str, Any] = {}
+        def answer_tokens():
+            """Adapts the backend's NDJSON events to the plain text stream st.write_stream expects."""
+            for event in get_client().chat_stream(payload):
+                if event["type"] == "start":
+                    st.session_state.active_stream_id = event["stream_id"]
+                elif event["type"] == "token":
+                    st.session_state.partial_answer += event["text"]
+                    yield event["text"]
+                elif event["type"] == "done":
+                    stream_result["timings"] = event.get("timings")
+                elif event["type"] == "error":
+                    stream_result["error"] = event.get("detail")
+
+        answer = None
+        try:
+            with st.spinner("Retrieving context..."):
+                answer = st.write_stream(answer_tokens())
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code in (429, 503):
+                retry_after = e.response.headers.get("Retry-After", "a few")
+                st.warning(f"The assistant is busy right now. Please try again in {retry_after} seconds.")
+            else:
+                st.error(f"Backend Error: {e.response.text if e.response is not None else e}")
+        except requests.exceptions.RequestException as e:
+            st.error(f"Connection Error: {e}")
+        finally:
+            st.session_state.active_stream_id = None
+
+        if stream_result.get("error"):
+            st.error(f"Backend Error: {stream_result['error']}")
         if answer:
-            st.markdown(answer)
+            if stream_result.get("timings"):
+                st.caption(format_timings(stream_result["timings"]))
             st.session_state.messages.append({"role": "assistant", "content": answer})
+        st.session_state.partial_answer = ""
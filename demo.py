@@ -139,6 +139,17 @@ def main():
         model="gemini-3-pro-preview"
     )
 
+    # --- STEP 7: Auto Routing ---
+    print_step(
+        "STEP 7: Latency-Aware Routing",
+        "model='auto' sends short prompts to Flash and long ones to Pro while it fits the latency budget."
+    )
+    run_query(
+        "What medications is John Doe currently taking?",
+        use_rag=True,
+        model="auto"
+    )
+
     print("\n🏁 Demo Complete.")
 
 if __name__ == "__main__":
@@ -11,9 +11,15 @@ echo "1. Launching Backend (FastAPI)..."
 uv run uvicorn app.backend.main:app --host 127.0.0.1 --port 8000 --reload &
 BACKEND_PID=$!
 
-# Wait for backend to be ready
-echo "Waiting for backend to start..."
-sleep 5
+# Wait for backend indexes to be loaded (readiness probe), up to 5 minutes
+echo "Waiting for backend to become ready..."
+for _ in $(seq 1 300); do
+    if curl -sf http://127.0.0.1:8000/ready > /dev/null; then
+        echo "Backend ready."
+        break
+    fi
+    sleep 1
+done
 
 # 2. Start Frontend
 echo "2. Launching Frontend (Streamlit)..."
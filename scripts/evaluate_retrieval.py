@@ -0,0 +1,358 @@
+"""
+Script Name:  evaluate_retrieval.py
+Description:  Offline retrieval evaluation: sweeps chunking, index type and search parameters, k and
+              hybrid (BM25 + vector) fusion over a labelled question set, and reports recall@k, MRR,
+              query latency percentiles, index size and build time, marking Pareto-optimal settings.
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import argparse
+import ast
+import itertools
+import json
+import math
+import os
+import re
+import time
+import zlib
+from collections import Counter
+from dataclasses import asdict, dataclass
+
+import faiss
+import numpy as np
+
+from app.core.config import CHUNK_OVERLAP, CHUNK_SIZE, DATA_DIR, INDEX_PQ_BITS, INDEX_PQ_M, INDEX_RERANK_FACTOR
+from app.core.quantization import RerankedIndex, build_quantized, built_mode
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+CASES_SCRIPT = os.path.join(SCRIPTS_DIR, "generate_data.py")
+SAMPLE_QUESTIONS = os.path.join(SCRIPTS_DIR, "..", "data", "sample_questions.md")
+
+INDEX_TYPES = ("flat", "hnsw", "ivf", "fp16", "int8", "pq")
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+# --- Labelled data ---
+
+def load_cases() -> list[dict]:
+    """The synthetic cases of scripts/generate_data.py, read without importing it (it needs reportlab)."""
+    with open(CASES_SCRIPT) as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "CASES" for t in node.targets):
+            return ast.literal_eval(node.value)
+    raise SystemExit(f"No CASES list in {CASES_SCRIPT}")
+
+
+def case_questions(cases: list[dict]) -> list[dict]:
+    """
+    Labelled questions from the cases: each "Specific Cases" question of data/sample_questions.md
+    (labelled with the case naming its patient) plus one question per case built from its
+    chief complaint. The cases are single-page, so the expected page is 0.
+    """
+    patients = {}
+    for case in cases:
+        match = re.search(r"Patient:\s*([^.]+(?:\.\s*\w+)?)\.?\s*Age", case["content"])
+        if match:
+            # The longest name token identifies the patient ("T. Stark" -> "Stark")
+            patients[max(match.group(1).split(), key=len).strip(".")] = case["filename"]
+
+    questions = []
+    if os.path.exists(SAMPLE_QUESTIONS):
+        with open(SAMPLE_QUESTIONS) as f:
+            for question in re.findall(r'^\*\s+\*\*[^*]+\*\*:\s*"([^"]+)"', f.read(), re.MULTILINE):
+                sources = [source for name, source in patients.items() if re.search(rf"\b{name}\b", question)]
+                if len(sources) == 1:
+                    questions.append({"question": question, "source": sources[0], "page": 0})
+    for case in cases:
+        match = re.search(r"Chief Complaint:\s*(.+)", case["content"])
+        if match:
+            questions.append({"question": f"Which patient presented with {match.group(1).strip().rstrip('.').lower()}?",
+                              "source": case["filename"], "page": 0})
+    return questions
+
+
+def load_questions(path: str) -> list[dict]:
+    """JSONL with {"question", "source" or "sources", optional "page"} per line."""
+    questions = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                sources = item.get("sources") or [item["source"]]
+                questions.append({"question": item["question"], "sources": [os.path.basename(s) for s in sources],
+                                  "page": item.get("page")})
+    return questions
+
+
+def load_pages(corpus: str, cases: list[dict]) -> list[dict]:
+    """Corpus pages as {"text", "source", "page"}: the case texts, or the PDFs in the data directory."""
+    if corpus == "cases":
+        return [{"text": f"{case['title']}\n{case['content']}", "source": case["filename"], "page": 0}
+                for case in cases]
+
+    from app.core.config import EXTRACTION_CACHE_DIR
+    from app.core.extraction_cache import ExtractionCache
+    from app.core.rag import RAGService
+
+    load_pdf = ExtractionCache(EXTRACTION_CACHE_DIR).load_pdf if EXTRACTION_CACHE_DIR else RAGService._parse_pdf
+    pages = []
+    for filename in sorted(os.listdir(DATA_DIR)) if os.path.isdir(DATA_DIR) else []:
+        if filename.endswith(".pdf"):
+            for doc in load_pdf(os.path.join(DATA_DIR, filename)):
+                pages.append({"text": doc.page_content, "source": filename, "page": doc.metadata.get("page")})
+    if not pages:
+        raise SystemExit(f"No PDFs in {DATA_DIR}; run scripts/generate_data.py or use --corpus cases.")
+    return pages
+
+
+def chunk(pages: list[dict], size: int, overlap: int) -> list[dict]:
+    """The app's chunker (RecursiveCharacterTextSplitter) with the given settings."""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=size, chunk_overlap=overlap)
+    return [{**page, "text": text} for page in pages for text in splitter.split_text(page["text"])]
+
+
+# --- Offline stand-ins for the embedding model ---
+
+def tokens(text: str) -> list[str]:
+    return TOKEN.findall(text.lower())
+
+
+class HashingEmbeddings:
+    """
+    Deterministic local embeddings: word and character-trigram counts hashed into `dim`
+    buckets, log-scaled and L2-normalized. No network, so sweeps are free and repeatable;
+    absolute quality differs from the real model, relative comparisons are what matter.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = tokens(text)
+            grams = [w[i:i + 3] for w in words for i in range(max(1, len(w) - 2))]
+            for feature, count in Counter(words + grams).items():
+                vectors[row, zlib.crc32(feature.encode()) % self.dim] += 1 + math.log(count)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class BM25:
+    """Okapi BM25 over the chunk texts, for the keyword half of hybrid retrieval."""
+
+    def __init__(self, texts: list[str], k1: float = 1.5, b: float = 0.75):
+        self.docs = [Counter(tokens(text)) for text in texts]
+        self.lengths = np.array([sum(doc.values()) for doc in self.docs], dtype=np.float32)
+        self.avg_length = float(self.lengths.mean()) if len(self.docs) else 0.0
+        frequency = Counter(term for doc in self.docs for term in doc)
+        n = len(self.docs)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in frequency.items()}
+        self.k1, self.b = k1, b
+
+    def top(self, query: str, k: int) -> np.ndarray:
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.lengths / max(self.avg_length, 1e-12))
+        for term in set(tokens(query)):
+            if term in self.idf:
+                tf = np.array([doc.get(term, 0) for doc in self.docs], dtype=np.float32)
+                scores += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+        return np.argsort(-scores, kind="stable")[:k]
+
+
+def reciprocal_rank_fusion(rankings: list[np.ndarray], k: int, constant: int = 60) -> list[int]:
+    """Fuses ranked row lists by summing 1 / (constant + rank)."""
+    scores: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking):
+            if row >= 0:
+                scores[int(row)] = scores.get(int(row), 0.0) + 1 / (constant + rank + 1)
+    return sorted(scores, key=lambda row: -scores[row])[:k]
+
+
+# --- Indexes ---
+
+def build_index(kind: str, vectors: np.ndarray, args: argparse.Namespace):
+    """A searchable index of `kind` over `vectors` (compressed modes re-rank exactly, as in the app)."""
+    n, d = vectors.shape
+    if kind == "flat":
+        index = faiss.IndexFlatL2(d)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(d, args.hnsw_m)
+    elif kind == "ivf":
+        index = faiss.IndexIVFFlat(faiss.IndexFlatL2(d), d, max(1, min(args.nlist, n // 8)))
+        index.train(vectors)
+    else:
+        return RerankedIndex(build_quantized(vectors, kind, args.pq_m, args.pq_bits), vectors, args.rerank_factor)
+    index.add(vectors)
+    return index
+
+
+def index_bytes(index) -> int:
+    """Serialized size of the index (codes plus graph / lists), i.e. what sits in memory."""
+    inner = index.index if isinstance(index, RerankedIndex) else index
+    return int(faiss.serialize_index(inner).nbytes)
+
+
+def search_params(kind: str, args: argparse.Namespace) -> list[tuple[str, dict]]:
+    """The search-time settings swept for an index type, as (label, attributes to set)."""
+    if kind == "hnsw":
+        return [(f"efSearch={ef}", {"efSearch": ef}) for ef in args.ef_search]
+    if kind == "ivf":
+        return [(f"nprobe={p}", {"nprobe": p}) for p in args.nprobe]
+    return [("-", {})]
+
+
+# --- Evaluation ---
+
+@dataclass
+class Result:
+    chunk_size: int
+    chunk_overlap: int
+    index: str
+    params: str
+    k: int
+    hybrid: bool
+    recall: float
+    mrr: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    index_kb: float
+    build_s: float
+    pareto: bool = False
+
+
+def relevant(chunk: dict, question: dict) -> bool:
+    sources = question.get("sources") or [question["source"]]
+    return chunk["source"] in sources and (question.get("page") is None or chunk["page"] == question["page"])
+
+
+def evaluate(chunks: list[dict], questions: list[dict], index, bm25: BM25 | None, query_vectors: np.ndarray,
+             k: int) -> tuple[float, float, list[float]]:
+    """recall@k, MRR@k and per-query latencies (ms, search and fusion only) for one configuration."""
+    hits, reciprocal_ranks, latencies = 0, 0.0, []
+    for question, vector in zip(questions, query_vectors):
+        start = time.perf_counter()
+        fetch = k * 4 if bm25 is not None else k  # fusion re-ranks a deeper candidate list
+        _, labels = index.search(vector[None, :], min(fetch, len(chunks)))
+        rows = [int(row) for row in labels[0] if row >= 0][:k]
+        if bm25 is not None:
+            rows = reciprocal_rank_fusion([labels[0], bm25.top(question["question"], fetch)], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        ranks = [rank for rank, row in enumerate(rows) if relevant(chunks[row], question)]
+        if ranks:
+            hits += 1
+            reciprocal_ranks += 1 / (ranks[0] + 1)
+    return hits / len(questions), reciprocal_ranks / len(questions), latencies
+
+
+def mark_pareto(results: list[Result]) -> None:
+    """Flags configurations no other one beats on recall, MRR, p95 latency and index size at once."""
+    def dominates(a: Result, b: Result) -> bool:
+        better_or_equal = (a.recall >= b.recall and a.mrr >= b.mrr and a.p95_ms <= b.p95_ms
+                           and a.index_kb <= b.index_kb)
+        strictly = a.recall > b.recall or a.mrr > b.mrr or a.p95_ms < b.p95_ms or a.index_kb < b.index_kb
+        return better_or_equal and strictly
+
+    for result in results:
+        result.pareto = not any(dominates(other, result) for other in results if other is not result)
+
+
+def sweep(args: argparse.Namespace, pages: list[dict], questions: list[dict]) -> list[Result]:
+    embedder = HashingEmbeddings(args.dim)
+    query_vectors = embedder.embed([q["question"] for q in questions])
+    results = []
+    for size, overlap in itertools.product(args.chunk_sizes, args.chunk_overlaps):
+        if overlap >= size:
+            continue
+        chunks = chunk(pages, size, overlap)
+        vectors = embedder.embed([c["text"] for c in chunks])
+        bm25 = BM25([c["text"] for c in chunks]) if True in args.hybrid else None
+        for kind in args.indexes:
+            start = time.perf_counter()
+            index = build_index(kind, vectors, args)
+            build_s = time.perf_counter() - start
+            size_kb = index_bytes(index) / 1024
+            # Rows carry the mode actually built: pq falls back to int8 on a small corpus
+            built = built_mode(index.index) if isinstance(index, RerankedIndex) else kind
+            for label, settings in search_params(kind, args):
+                for name, value in settings.items():
+                    setattr(index.hnsw if kind == "hnsw" else index, name, value)
+                if built != kind:
+                    label = f"from {kind}"
+                for k, hybrid in itertools.product(args.k, args.hybrid):
+                    recall, mrr, latencies = evaluate(chunks, questions, index, bm25 if hybrid else None,
+                                                      query_vectors, k)
+                    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+                    results.append(Result(size, overlap, built, label, k, hybrid, recall, mrr,
+                                          float(p50), float(p95), float(p99), size_kb, build_s))
+    mark_pareto(results)
+    return results
+
+
+def print_table(results: list[Result], chunk_count_note: str) -> None:
+    print(f"{'chunk':>6} {'ovl':>4} {'index':<6} {'params':<12} {'k':>3} {'hybrid':<6} {'recall':>7} {'mrr':>6} "
+          f"{'p50ms':>7} {'p95ms':>7} {'p99ms':>7} {'sizeKB':>8} {'build_s':>8}  pareto")
+    for r in results:
+        print(f"{r.chunk_size:>6} {r.chunk_overlap:>4} {r.index:<6} {r.params:<12} {r.k:>3} "
+              f"{'on' if r.hybrid else 'off':<6} {r.recall:>7.3f} {r.mrr:>6.3f} {r.p50_ms:>7.3f} {r.p95_ms:>7.3f} "
+              f"{r.p99_ms:>7.3f} {r.index_kb:>8.1f} {r.build_s:>8.3f}  {'*' if r.pareto else ''}")
+    print(f"\n{chunk_count_note}\n* = Pareto-optimal on recall@k, MRR, p95 latency and index size. Latency covers "
+          f"the search (and fusion), not the query embedding; embeddings are a local hashing stand-in.")
+
+
+def int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",") if v]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("Description:")[1].split("Author:")[0].strip())
+    parser.add_argument("--questions", help="Labelled JSONL ({question, source|sources, page}); "
+                                            "default: built from generate_data.py cases and sample_questions.md")
+    parser.add_argument("--corpus", choices=("cases", "pdfs"), default="cases",
+                        help="Case texts from generate_data.py, or the PDFs in the data directory")
+    parser.add_argument("--chunk-sizes", type=int_list, default=sorted({200, 500, CHUNK_SIZE}))
+    parser.add_argument("--chunk-overlaps", type=int_list, default=sorted({0, CHUNK_OVERLAP}))
+    parser.add_argument("--indexes", type=lambda v: v.split(","), default=list(INDEX_TYPES),
+                        help=f"Comma-separated subset of {','.join(INDEX_TYPES)}")
+    parser.add_argument("--ef-search", type=int_list, default=[16, 64], help="HNSW efSearch values")
+    parser.add_argument("--nprobe", type=int_list, default=[1, 4], help="IVF nprobe values")
+    parser.add_argument("--k", type=int_list, default=[1, 3, 5])
+    parser.add_argument("--hybrid", type=lambda v: [x == "on" for x in v.split(",")], default=[False, True],
+                        help="off, on or off,on: BM25 + vector reciprocal rank fusion")
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--nlist", type=int, default=64, help="IVF lists (capped at chunks / 8)")
+    parser.add_argument("--rerank-factor", type=int, default=INDEX_RERANK_FACTOR)
+    parser.add_argument("--pq-m", type=int, default=INDEX_PQ_M)
+    parser.add_argument("--pq-bits", type=int, default=INDEX_PQ_BITS)
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of the local embedding stand-in")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+    unknown = set(args.indexes) - set(INDEX_TYPES)
+    if unknown:
+        parser.error(f"Unknown index type(s): {', '.join(sorted(unknown))}")
+
+    cases = load_cases()
+    questions = load_questions(args.questions) if args.questions else case_questions(cases)
+    if not questions:
+        raise SystemExit("No labelled questions to evaluate.")
+    pages = load_pages(args.corpus, cases)
+
+    results = sweep(args, pages, questions)
+    print_table(results, f"{len(questions)} questions over {len(pages)} pages ({args.corpus}).")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([asdict(r) for r in results], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Script Name:  quantization_report.py
+Description:  Compares recall, memory and search latency of the document index storage modes
+              (flat, fp16, int8, pq; with and without exact re-ranking) on the built corpus index.
+Author:       Michael R. Rutherford
+Date:         2026-01-28
+
+Copyright (c) 2026
+License: MIT
+"""
+
+import argparse
+import os
+import time
+
+import faiss
+import numpy as np
+
+from app.core.config import INDEX_DIR_PDFS, INDEX_PQ_BITS, INDEX_PQ_M, INDEX_RERANK_FACTOR
+from app.core.quantization import STORAGE_MODES, RerankedIndex, build_quantized, index_nbytes
+
+
+def load_queries(args: argparse.Namespace, vectors: np.ndarray) -> np.ndarray:
+    """Embeds the questions in --queries, or samples stored chunk vectors as stand-in queries."""
+    if args.queries:
+        from app.core.services import get_embeddings
+
+        with open(args.queries) as f:
+            questions = [line.strip() for line in f if line.strip()]
+        return np.asarray(get_embeddings().embed_queries(questions), dtype=np.float32)
+    rng = np.random.default_rng(0)
+    return vectors[rng.choice(len(vectors), size=min(args.samples, len(vectors)), replace=False)]
+
+
+def recall(labels: np.ndarray, truth: np.ndarray) -> float:
+    """Mean fraction of the exact top-k found in the approximate top-k."""
+    return float(np.mean([len(set(found) & set(exact)) / len(exact) for found, exact in zip(labels, truth)]))
+
+
+def timed_search(index, queries: np.ndarray, k: int) -> tuple[np.ndarray, float]:
+    start = time.perf_counter()
+    _, labels = index.search(queries, k)
+    return labels, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("Description:")[1].split("Author:")[0].strip())
+    parser.add_argument("--index-dir", default=INDEX_DIR_PDFS, help="Directory holding LangChain's index.faiss")
+    parser.add_argument("--queries", help="Text file with one question per line (embedded via the API)")
+    parser.add_argument("--samples", type=int, default=200, help="Stored vectors to use as queries otherwise")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=INDEX_RERANK_FACTOR)
+    parser.add_argument("--pq-m", type=int, default=INDEX_PQ_M)
+    parser.add_argument("--pq-bits", type=int, default=INDEX_PQ_BITS)
+    args = parser.parse_args()
+
+    path = os.path.join(args.index_dir, "index.faiss")
+    if not os.path.exists(path):
+        raise SystemExit(f"No index at {path}; build it first (start the backend or POST /rebuild).")
+    flat = faiss.read_index(path)
+    vectors = flat.reconstruct_n(0, flat.ntotal)
+    queries = load_queries(args, vectors)
+    k = min(args.k, flat.ntotal)
+    truth, flat_ms = timed_search(flat, queries, k)
+
+    print(f"{flat.ntotal} vectors x {flat.d} dims, {len(queries)} queries, recall@{k}\n")
+    print(f"{'mode':<6} {'rerank':<7} {'memory':>10} {'vs flat':>8} {'recall':>7} {'ms/query':>9}")
+    print(f"{'flat':<6} {'-':<7} {index_nbytes(flat) / 2**20:>8.2f}MB {1:>7.1f}x {1:>7.3f} {flat_ms:>9.3f}")
+    for mode in STORAGE_MODES[1:]:
+        index = build_quantized(vectors, mode, args.pq_m, args.pq_bits)
+        ratio = index_nbytes(flat) / index_nbytes(index)
+        for exact in (None, vectors):
+            labels, ms = timed_search(RerankedIndex(index, exact, args.rerank_factor), queries, k)
+            print(f"{mode:<6} {'yes' if exact is not None else 'no':<7} {index_nbytes(index) / 2**20:>8.2f}MB "
+                  f"{ratio:>7.1f}x {recall(labels, truth):>7.3f} {ms:>9.3f}")
+    print(f"\nMemory counts the in-RAM vector codes only; re-ranking also reads the float32 vectors "
+          f"({index_nbytes(flat) / 2**20:.2f}MB) from disk, only for the candidate rows.")
+
+
+if __name__ == "__main__":
+    main()
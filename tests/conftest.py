@@ -0,0 +1,28 @@
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic pseudo-random vectors per text; counts the texts it embeds."""
+
+    def __init__(self):
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return [np.random.default_rng(abs(hash(t)) % 2**32).normal(size=16).tolist() for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class AxisEmbeddings(Embeddings):
+    """Maps each known word to its own axis, so a query for a word finds exactly its notes."""
+
+    words = ["heart", "lung", "kidney", "liver", "brain", "skin"]
+
+    def embed_documents(self, texts):
+        return [[1.0 if w in t else 0.0 for w in self.words] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
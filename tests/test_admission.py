@@ -0,0 +1,90 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.admission import AdmissionController, AdmissionRejected
+
+
+def test_admits_up_to_the_limit_then_queues_by_priority():
+    async def main():
+        controller = AdmissionController(default_limit=1, max_queue=5, max_wait=5)
+        holder = await controller.acquire("m")
+        order = []
+
+        async def wait(name, priority):
+            ticket = await controller.acquire("m", priority)
+            order.append(name)
+            ticket.release()
+
+        waiters = [asyncio.create_task(wait("batch", "batch")),
+                   asyncio.create_task(wait("interactive", "interactive"))]
+        await asyncio.sleep(0.01)
+        assert controller.snapshot()["m"]["queued"] == 2
+        holder.release()
+        await asyncio.gather(*waiters)
+        return order, controller.snapshot()["m"]
+
+    order, stats = asyncio.run(main())
+    assert order == ["interactive", "batch"]
+    assert stats["in_flight"] == 0 and stats["queued"] == 0
+    assert stats["admitted"] == 3
+
+
+def test_full_queue_is_rejected_with_429():
+    async def main():
+        controller = AdmissionController(default_limit=1, max_queue=1, max_wait=5)
+        holder = await controller.acquire("m")
+        queued = asyncio.create_task(controller.acquire("m"))
+        await asyncio.sleep(0.01)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("m")
+        holder.release()
+        (await queued).release()
+        return rejected.value, controller.snapshot()["m"]
+
+    rejected, stats = asyncio.run(main())
+    assert rejected.status_code == 429
+    assert rejected.retry_after >= 1
+    assert stats["rejected_queue_full"] == 1
+
+
+def test_wait_deadline_is_rejected_with_503():
+    async def main():
+        controller = AdmissionController(default_limit=1, max_queue=5, max_wait=0.05)
+        await controller.acquire("m")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("m")
+        return rejected.value, controller.snapshot()["m"]
+
+    rejected, stats = asyncio.run(main())
+    assert rejected.status_code == 503
+    assert stats["rejected_timeout"] == 1 and stats["queued"] == 0
+
+
+def test_slot_released_from_worker_thread_wakes_waiter():
+    async def main():
+        controller = AdmissionController(default_limit=1, max_wait=5)
+        holder = await controller.acquire("m")
+        threading.Timer(0.02, holder.release).start()
+        ticket = await controller.acquire("m")
+        ticket.release()
+        ticket.release()  # idempotent
+        return ticket.wait_ms, controller.snapshot()["m"]
+
+    wait_ms, stats = asyncio.run(main())
+    assert wait_ms >= 10
+    assert stats["in_flight"] == 0
+
+
+def test_limits_are_per_model():
+    async def main():
+        controller = AdmissionController(default_limit=1, model_limits={"big": 2}, max_wait=0.01)
+        await controller.acquire("small")
+        await controller.acquire("big")
+        await controller.acquire("big")
+        return controller.snapshot()
+
+    stats = asyncio.run(main())
+    assert stats["small"]["in_flight"] == 1
+    assert stats["big"] == {**stats["big"], "limit": 2, "in_flight": 2}
@@ -0,0 +1,49 @@
+from unittest.mock import MagicMock
+
+import requests
+
+from app.frontend.api_client import BackendClient
+
+
+def make_response(status: int, body=None, etag: str | None = None):
+    res = MagicMock(status_code=status)
+    res.json.return_value = body
+    res.headers = {"ETag": etag} if etag else {}
+    if status >= 400:
+        res.raise_for_status.side_effect = requests.HTTPError(str(status))
+    return res
+
+
+def test_conditional_get_reuses_body_on_304():
+    client = BackendClient("http://backend/")
+    client.session = MagicMock()
+    client.session.get.side_effect = [
+        make_response(200, ["a", "b"], etag='"profiles-v3"'),
+        make_response(304),
+    ]
+
+    assert client.list_profiles() == ["a", "b"]
+    assert client.list_profiles() == ["a", "b"]
+
+    second_call = client.session.get.call_args_list[1]
+    assert second_call.args[0] == "http://backend/settings"
+    assert second_call.kwargs["headers"] == {"If-None-Match": '"profiles-v3"'}
+    assert second_call.kwargs["timeout"] == client.timeout
+
+
+def test_is_online_handles_connection_errors():
+    client = BackendClient("http://backend")
+    client.session = MagicMock()
+    client.session.get.side_effect = requests.exceptions.ConnectionError()
+    assert client.is_online() == (False, "Backend: Offline")
+
+    client.session.get.side_effect = None
+    client.session.get.return_value = make_response(200)
+    assert client.is_online() == (True, "Backend: Online")
+
+
+def test_chat_uses_long_timeout():
+    client = BackendClient("http://backend", connect_timeout=1, chat_timeout=120)
+    client.session = MagicMock()
+    client.chat({"query": "hi"})
+    assert client.session.post.call_args.kwargs["timeout"] == (1, 120)
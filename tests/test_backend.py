@@ -1,5 +1,12 @@
+import asyncio
+import json
+import threading
+import time
 from fastapi.testclient import TestClient
-from app.backend.main import app
+from unittest.mock import MagicMock, patch
+from app.backend.main import app, readiness
+from app.core.conversations import ConversationStore
+from app.core.services import get_conversation_store, get_expert_service, get_rag_service
 import pytest
 
 client = TestClient(app)
@@ -9,6 +16,31 @@ def test_root_endpoint():
     assert response.status_code == 200
     assert response.json() == {"status": "ok", "service": "RAG Chatbot with Gemini 2.5 Flash"}
 
+@pytest.fixture
+def saved_readiness():
+    """The app-wide readiness registry, restored after the test."""
+    saved = readiness.snapshot()
+    yield readiness
+    for name, info in saved.items():
+        readiness.set(name, **info)
+
+def test_ready_endpoint_reports_index_states(saved_readiness):
+    readiness.set("pdfs", "loading")
+    readiness.set("examples", "ready")
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["indexes"]["pdfs"]["state"] == "loading"
+
+    readiness.set("pdfs", "ready")
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+
+def test_request_id_is_echoed():
+    response = client.get("/", headers={"X-Request-ID": "req-42"})
+    assert response.headers["X-Request-ID"] == "req-42"
+    assert client.get("/").headers["X-Request-ID"]
+
 # --- Settings Tests ---
 def test_create_and_get_settings_profile():
     profile_data = {
@@ -74,5 +106,330 @@ def test_chat_endpoint_structure():
     }
     # Note: Real call might fail if credentials aren't set in test environment,
     # but the pydantic validation should pass.
-    # If we want to mock the logic, we'd patch app.backend.main.rag_service.query
+    # If we want to mock the logic, we override the get_rag_service dependency
     pass
+
+def test_chat_endpoint_reports_timings():
+    def fake_query(*args, timings=None, **kwargs):
+        with timings.stage("generate"):
+            pass
+        timings.prompt_chars = 10
+        return "Answer"
+
+    app.dependency_overrides[get_rag_service] = lambda: MagicMock(query=MagicMock(side_effect=fake_query))
+    try:
+        response = client.post("/chat", json={"query": "Hello", "use_rag": False})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["response"] == "Answer"
+    assert data["timings"]["prompt_chars"] == 10
+    assert data["timings"]["generate_ms"] is not None
+    assert "generate;dur=" in response.headers["Server-Timing"]
+    assert "total;dur=" in response.headers["Server-Timing"]
+
+def test_chat_profiling_inline():
+    def fake_query(*args, **kwargs):
+        return "Answer"
+
+    app.dependency_overrides[get_rag_service] = lambda: MagicMock(query=MagicMock(side_effect=fake_query))
+    try:
+        with patch("app.backend.main.PROFILING_ENABLED", True):
+            response = client.post("/chat?profile=sample&profile_output=inline", json={"query": "Hello"})
+            assert response.status_code == 200
+            assert response.headers["X-Profile-Mode"] == "sample"
+
+            response = client.post("/chat", json={"query": "Hello"}, headers={"X-Profile": "bogus"})
+            assert response.status_code == 400
+    finally:
+        app.dependency_overrides.clear()
+
+def test_chat_profiling_disabled_by_default():
+    app.dependency_overrides[get_rag_service] = lambda: MagicMock(query=MagicMock(return_value="Answer"))
+    try:
+        response = client.post("/chat", json={"query": "Hello"}, headers={"X-Profile": "sample"})
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    assert "X-Profile-File" not in response.headers
+    assert response.json()["response"] == "Answer"
+
+def test_settings_conditional_get():
+    response = client.get("/settings")
+    etag = response.headers["ETag"]
+    assert response.headers["Last-Modified"]
+
+    response = client.get("/settings", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    response = client.get("/settings", headers={"If-Modified-Since": response.headers["Last-Modified"]})
+    assert response.status_code == 304
+
+    # The full listing has its own representation / validator
+    full = client.get("/settings?full=true", headers={"If-None-Match": etag})
+    assert full.status_code == 200
+    assert isinstance(full.json(), list)
+
+    profile_data = {"name": "etag_profile", "temperature": 0.5, "max_output_tokens": 100,
+                    "top_p": 0.9, "top_k": 20, "prompt_template": "T"}
+    client.post("/settings", json=profile_data)
+    try:
+        response = client.get("/settings", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert "etag_profile" in response.json()
+        assert response.headers["ETag"] != etag
+
+        full = client.get("/settings?full=true")
+        assert any(p["name"] == "etag_profile" for p in full.json())
+
+        profile_etag = client.get("/settings/etag_profile").headers["ETag"]
+        assert client.get("/settings/etag_profile", headers={"If-None-Match": profile_etag}).status_code == 304
+        # Validators are per profile, and a missing profile is a 404 whatever the client holds
+        assert "etag_profile" in profile_etag
+        missing = client.get("/settings/no_such_profile", headers={"If-None-Match": profile_etag})
+        assert missing.status_code == 404
+    finally:
+        client.delete("/settings/etag_profile")
+
+def test_chat_rejects_unknown_template():
+    response = client.post("/chat", json={"query": "Hello", "template": "Nope"})
+    assert response.status_code == 400
+
+def test_list_templates():
+    response = client.get("/features/templates")
+    assert response.status_code == 200
+    assert "According-to (Standard)" in response.json()["templates"]
+
+def test_chat_stream_events():
+    def fake_stream(*args, timings=None, cancel_event=None, **kwargs):
+        yield "Hel"
+        yield "lo"
+
+    app.dependency_overrides[get_rag_service] = lambda: MagicMock(stream_query=MagicMock(side_effect=fake_stream))
+    try:
+        response = client.post("/chat/stream", json={"query": "Hi", "use_rag": False})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0]["type"] == "start"
+    assert events[0]["stream_id"] == response.headers["X-Stream-ID"]
+    assert "".join(e["text"] for e in events if e["type"] == "token") == "Hello"
+    assert events[-1]["type"] == "done"
+    assert events[-1]["cancelled"] is False
+
+def test_chat_stream_client_gone_before_the_body_releases_the_generation():
+    from starlette.requests import ClientDisconnect
+    from app.backend.main import active_streams, chat_stream_endpoint
+    from app.backend.models import ChatRequest
+
+    stopped = threading.Event()
+    cancelled = []
+
+    def fake_stream(*args, timings=None, cancel_event=None, **kwargs):
+        yield "partial"
+        cancelled.append(cancel_event.wait(5))
+        stopped.set()
+
+    ticket = MagicMock()
+    admission = MagicMock(acquire=MagicMock(side_effect=lambda *args: asyncio.sleep(0, ticket)))
+    rag = MagicMock(stream_query=MagicMock(side_effect=fake_stream))
+
+    async def send(message):
+        raise OSError("client disconnected")
+
+    async def main():
+        request = ChatRequest(query="Disconnect before the first byte", use_rag=False)
+        response = await chat_stream_endpoint(request, rag, ConversationStore(), admission)
+        with pytest.raises(ClientDisconnect):
+            await response({"type": "http", "asgi": {"spec_version": "2.4"}}, None, send)
+        await asyncio.to_thread(stopped.wait, 10)
+
+    asyncio.run(main())
+    # The only reader detached, so the producer was cancelled and gave its slot back
+    assert cancelled == [True] and ticket.release.called
+    assert not active_streams
+
+def test_cancel_unknown_stream():
+    assert client.post("/chat/stream/nope/cancel").status_code == 404
+
+def test_chat_session_history():
+    store = ConversationStore()
+    rag = MagicMock(query=MagicMock(side_effect=["First answer", "Second answer"]))
+    app.dependency_overrides[get_rag_service] = lambda: rag
+    app.dependency_overrides[get_conversation_store] = lambda: store
+    try:
+        client.post("/chat", json={"query": "First?", "use_rag": False, "session_id": "s1"})
+        response = client.post("/chat", json={"query": "Second?", "use_rag": False, "session_id": "s1"})
+        deleted = client.delete("/sessions/s1")
+        missing = client.delete("/sessions/s1")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.json()["session_id"] == "s1"
+    assert rag.query.call_args_list[0].kwargs["history"] == []
+    assert rag.query.call_args_list[1].kwargs["history"] == [("human", "First?"), ("ai", "First answer")]
+    assert deleted.status_code == 200
+    assert missing.status_code == 404
+
+def test_add_example_endpoint():
+    expert = MagicMock(add_example=MagicMock(return_value=21))
+    app.dependency_overrides[get_expert_service] = lambda: expert
+    try:
+        response = client.post("/features/examples", json={"question": "Q?", "answer": "A."})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.json() == {"status": "added", "count": 21}
+    expert.add_example.assert_called_once_with({"question": "Q?", "answer": "A."})
+
+def test_retrieve_endpoint_batches_queries():
+    rag = MagicMock()
+    rag.retrieve.return_value = [
+        [{"chunk_id": "c1", "score": 0.12, "source": "a.pdf", "page": 3, "content": "insulin",
+          "references": [{"source": "a.pdf", "page": 3}, {"source": "b.pdf", "page": 0}]}],
+        [],
+    ]
+    app.dependency_overrides[get_rag_service] = lambda: rag
+    try:
+        response = client.post("/retrieve", json={"queries": ["diabetes", "asthma"], "k": 1})
+        too_many = client.post("/retrieve", json={"queries": ["q"] * 1000})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0] == {"query": "diabetes", "chunks": [
+        {"chunk_id": "c1", "score": 0.12, "source": "a.pdf", "page": 3, "content": "insulin",
+         "references": [{"source": "a.pdf", "page": 3}, {"source": "b.pdf", "page": 0}]}
+    ]}
+    assert results[1] == {"query": "asthma", "chunks": []}
+    assert rag.retrieve.call_count == 1
+    assert rag.retrieve.call_args.args[0] == ["diabetes", "asthma"]
+    assert rag.retrieve.call_args.kwargs["filters"] is None
+    assert too_many.status_code == 400
+
+def test_chat_filters_reach_retrieval():
+    from app.core.chunk_filter import ChunkFilter
+    rag = MagicMock(query=MagicMock(return_value="scoped"))
+    app.dependency_overrides[get_rag_service] = lambda: rag
+    try:
+        response = client.post("/chat", json={"query": "Q", "filters": {"sources": ["a.pdf"], "page_to": 3}})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert rag.query.call_args.kwargs["filters"] == ChunkFilter(sources=("a.pdf",), page_to=3)
+
+def test_identical_concurrent_chats_are_coalesced():
+    import httpx
+
+    calls = []
+
+    def slow_query(*args, timings=None, **kwargs):
+        calls.append(1)
+        time.sleep(0.1)
+        return "Shared answer"
+
+    rag = MagicMock(query=MagicMock(side_effect=slow_query))
+    app.dependency_overrides[get_rag_service] = lambda: rag
+
+    async def send_all():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+            payload = {"query": "Broadcast question", "use_rag": False}
+            return await asyncio.gather(*(ac.post("/chat", json=payload) for _ in range(4)))
+
+    try:
+        responses = asyncio.run(send_all())
+    finally:
+        app.dependency_overrides.clear()
+
+    assert len(calls) == 1
+    assert all(r.json()["response"] == "Shared answer" for r in responses)
+    assert sum(r.json()["coalesced"] for r in responses) == 3
+
+def test_chat_overload_returns_retry_after():
+    from app.core.admission import AdmissionController
+    from app.core.services import get_admission_controller
+
+    controller = AdmissionController(default_limit=0, max_queue=0)
+    app.dependency_overrides[get_rag_service] = lambda: MagicMock(query=MagicMock(return_value="Answer"))
+    app.dependency_overrides[get_admission_controller] = lambda: controller
+    try:
+        response = client.post("/chat", json={"query": "Hi", "use_rag": False})
+        metrics = client.get("/metrics").json()
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert metrics["admission"]["gemini-2.5-flash"]["rejected_queue_full"] == 1
+
+def test_auto_request_is_admitted_under_the_routed_model():
+    from app.core.admission import AdmissionController
+    from app.core.rag import PreparedQuery
+    from app.core.services import get_admission_controller
+
+    controller = AdmissionController()
+    rag = MagicMock(prepare=MagicMock(return_value=PreparedQuery(["prompt"], "gemini-2.5-flash-lite")),
+                    query=MagicMock(return_value="Answer"))
+    app.dependency_overrides[get_rag_service] = lambda: rag
+    app.dependency_overrides[get_admission_controller] = lambda: controller
+    try:
+        response = client.post("/chat", json={"query": "Hi", "use_rag": False, "model": "auto"})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 200
+    assert list(controller.snapshot()) == ["gemini-2.5-flash-lite"]
+    assert rag.query.call_args.kwargs["prepared"] is rag.prepare.return_value
+
+def test_open_circuit_returns_503_with_retry_after():
+    from app.core.resilience import CircuitOpenError
+
+    rag = MagicMock(query=MagicMock(side_effect=CircuitOpenError("llm:gemini-2.5-flash", 12)))
+    app.dependency_overrides[get_rag_service] = lambda: rag
+    try:
+        response = client.post("/chat", json={"query": "Hi", "use_rag": False})
+    finally:
+        app.dependency_overrides.clear()
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "12"
+
+def test_debug_memory_is_gated_and_reports_indexes_and_caches():
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import FakeEmbeddings
+    from app.core.rag import RAGService
+
+    rag = RAGService(index_dir="unused", embeddings=FakeEmbeddings(size=8))
+    rag.vector_store = FAISS.from_texts(["alpha", "beta", "gamma"], rag.embeddings)
+    expert = MagicMock(memory_usage=MagicMock(return_value=None))
+    conversations = ConversationStore()
+    conversations.append("s1", "Q?", "A." * 500)
+    app.dependency_overrides[get_rag_service] = lambda: rag
+    app.dependency_overrides[get_expert_service] = lambda: expert
+    app.dependency_overrides[get_conversation_store] = lambda: conversations
+    try:
+        disabled = client.get("/debug/memory")
+        with patch("app.backend.main.MEMORY_ENDPOINT_ENABLED", True):
+            response = client.get("/debug/memory")
+    finally:
+        app.dependency_overrides.clear()
+
+    assert disabled.status_code == 404
+    assert response.status_code == 200
+    body = response.json()
+    assert body["process"]["rss_bytes"] > 0
+    assert body["indexes"]["pdfs"]["index"] == {"type": "IndexFlatL2", "vectors": 3, "dim": 8, "bytes": 96}
+    assert body["indexes"]["pdfs"]["docstore"]["entries"] == 3
+    assert body["indexes"]["examples"] is None
+    assert body["caches"]["conversations"]["entries"] == 1
+    assert body["caches"]["conversations"]["bytes"] > 1000
+    assert body["caches"]["chat_flights"]["entries"] == 0
+    assert set(body["caches"]["profiles"]) == {"entries", "bytes"}
+    assert body["tracemalloc"] == {"tracing": False}
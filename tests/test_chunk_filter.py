@@ -0,0 +1,66 @@
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from app.core.chunk_filter import ChunkCatalog, ChunkFilter
+from app.core.quantization import compress_store
+from app.core.rag import RAGService
+from conftest import HashEmbeddings
+
+TAGS = {"*_case.pdf": ["case-study"], "cardiology_case.pdf": ["cardiology"]}
+
+
+@pytest.fixture
+def rag():
+    docs = [Document(page_content=f"{source} page {page} part {part}",
+                     metadata={"source": f"data/pdfs/{source}", "page": page})
+            for source in ("cardiology_case.pdf", "neurology_case.pdf", "cms_rule.pdf")
+            for page in range(3) for part in range(2)]
+    service = RAGService(index_dir="unused", embeddings=HashEmbeddings())
+    service.vector_store = FAISS.from_documents(docs, service.embeddings)
+    return service
+
+
+def test_filter_is_hashable_and_knows_when_empty():
+    assert ChunkFilter(sources=["a.pdf"]) == ChunkFilter(sources=("a.pdf",))
+    assert hash(ChunkFilter(tags=["x"]))
+    assert ChunkFilter().is_empty and not ChunkFilter(page_to=1).is_empty
+
+
+def test_catalog_selects_by_source_glob_pages_and_tags(rag):
+    catalog = ChunkCatalog.from_store(rag.vector_store, TAGS)
+    sources_of = lambda rows: {rag.vector_store.docstore.search(rag.vector_store.index_to_docstore_id[int(r)])
+                               .metadata["source"].rsplit("/", 1)[1] for r in rows}
+
+    assert len(catalog.select(ChunkFilter(sources=["cms_rule.pdf"]))) == 6
+    assert sources_of(catalog.select(ChunkFilter(source_glob="*_case.pdf"))) == {"cardiology_case.pdf",
+                                                                                 "neurology_case.pdf"}
+    assert sources_of(catalog.select(ChunkFilter(tags=["cardiology"]))) == {"cardiology_case.pdf"}
+    assert len(catalog.select(ChunkFilter(source_glob="*_case.pdf", page_from=1, page_to=1))) == 4
+    assert len(catalog.select(ChunkFilter(sources=["missing.pdf"]))) == 0
+    assert catalog.sources()[0] == {"source": "cardiology_case.pdf", "chunks": 6,
+                                    "tags": ["cardiology", "case-study"]}
+
+
+@pytest.mark.parametrize("storage", ["flat", "int8"])
+def test_filtered_retrieval_only_returns_matching_chunks(rag, storage, tmp_path, monkeypatch):
+    monkeypatch.setattr("app.core.rag.DOCUMENT_TAGS", TAGS)
+    if storage != "flat":
+        compress_store(rag.vector_store, str(tmp_path), storage)
+
+    results = rag.retrieve(["neurology_case.pdf page 2 part 0", "anything"], k=4,
+                           filters=ChunkFilter(tags=["case-study"], page_from=2))
+    for hits in results:
+        assert len(hits) == 4
+        assert all(hit["source"] != "cms_rule.pdf" and hit["page"] == 2 for hit in hits)
+    # The exact text is still the nearest match inside the slice
+    assert results[0][0]["content"] == "neurology_case.pdf page 2 part 0"
+    assert rag.retrieve(["x"], filters=ChunkFilter(sources=["missing.pdf"])) == [[]]
+
+
+def test_catalog_follows_store_replacement(rag):
+    first = rag.chunk_catalog
+    assert rag.chunk_catalog is first
+    rag.vector_store = FAISS.from_documents([Document(page_content="x", metadata={"source": "new.pdf"})],
+                                            rag.embeddings)
+    assert [doc["source"] for doc in rag.chunk_catalog.sources()] == ["new.pdf"]
@@ -0,0 +1,60 @@
+from unittest.mock import patch
+
+from app.core.conversations import ConversationStore, estimate_tokens
+
+
+def test_history_keeps_turns_in_order():
+    store = ConversationStore()
+    store.append("s", "What is sepsis?", "An infection response.")
+    store.append("s", "And septic shock?", "Sepsis with hypotension.")
+
+    assert store.history("s") == [
+        ("human", "What is sepsis?"), ("ai", "An infection response."),
+        ("human", "And septic shock?"), ("ai", "Sepsis with hypotension."),
+    ]
+    assert store.history("unknown") == []
+    assert len(store) == 1  # reading an unknown session does not create it
+
+
+def test_history_is_trimmed_to_budget_with_summary():
+    store = ConversationStore(token_budget=estimate_tokens("x" * 400) * 2)
+    for i in range(5):
+        store.append("s", f"Question {i} " + "x" * 390, "y" * 400)
+
+    history = store.history("s")
+    assert history[0][0] == "system"
+    assert "Question 0" in history[0][1] and "Question 3" in history[0][1]
+    # Only the newest exchange fits verbatim
+    assert history[1:] == [("human", "Question 4 " + "x" * 390), ("ai", "y" * 400)]
+
+
+def test_history_never_keeps_an_answer_without_its_question():
+    # Room for the last answer on its own, but not for the exchange it belongs to
+    store = ConversationStore(token_budget=estimate_tokens("y" * 400) + 5)
+    store.append("s", "Question 0", "short")
+    store.append("s", "Question 1 " + "x" * 390, "y" * 400)
+
+    history = store.history("s")
+    assert history == [("system", "Earlier in this conversation the user asked: Question 0; Question 1 " + "x" * 109)]
+
+
+def test_idle_sessions_are_evicted():
+    store = ConversationStore(idle_ttl=60)
+    with patch("app.core.conversations.time.monotonic", return_value=1000.0):
+        store.append("old", "q", "a")
+    with patch("app.core.conversations.time.monotonic", return_value=1100.0):
+        store.append("new", "q", "a")
+        assert len(store) == 1
+        assert store.history("new")
+
+
+def test_least_recently_used_session_is_dropped():
+    store = ConversationStore(max_sessions=2)
+    store.append("a", "q", "a")
+    store.append("b", "q", "a")
+    store.history("a")  # touch: "b" is now least recently used
+    store.append("c", "q", "a")
+
+    assert store.stats()["sessions"] == 2
+    assert store.delete("a") and store.delete("c")
+    assert not store.delete("b")
@@ -0,0 +1,132 @@
+import sqlite3
+import threading
+
+import pytest
+
+from app.backend import database as db
+from app.backend.models import SettingsProfile
+
+
+@pytest.fixture(autouse=True)
+def temp_db(tmp_path, monkeypatch):
+    db.close_connection()
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "settings.db"))
+    yield
+    db.close_connection()
+
+
+def make_profile(name: str, temperature: float = 0.5) -> SettingsProfile:
+    return SettingsProfile(name=name, temperature=temperature, max_output_tokens=100,
+                           top_p=0.9, top_k=20, prompt_template="T", target_source=None)
+
+
+def test_schema_created_on_first_use_with_wal():
+    assert db.get_all_profile_names() == []
+    mode = db.get_connection().execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode == "wal"
+
+
+def test_connection_is_reused_per_thread():
+    assert db.get_connection() is db.get_connection()
+
+
+def test_close_connection_closes_every_thread(tmp_path, monkeypatch):
+    opened = {}
+
+    def worker():
+        opened["conn"] = db.get_connection()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    main_conn = db.get_connection()
+
+    db.close_connection()
+    for conn in (opened["conn"], main_conn):
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute("SELECT 1")
+
+    # The schema is created again on the next database
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "other.db"))
+    assert db.get_connection() is not main_conn
+    assert db.get_all_profile_names() == []
+
+
+def test_reads_are_cached_and_writes_invalidate():
+    db.save_profile(make_profile("a"))
+    assert db.get_all_profile_names() == ["a"]
+    assert db.get_profile_by_name("a").temperature == 0.5
+
+    # A write that does not bump profiles_version is not visible: reads come from the cache
+    with db.get_connection() as conn:
+        conn.execute("UPDATE profiles SET temperature=0.9 WHERE name='a'")
+    assert db.get_profile_by_name("a").temperature == 0.5
+
+    # Writes through the module invalidate
+    db.save_profile(make_profile("b", temperature=0.1))
+    assert sorted(db.get_all_profile_names()) == ["a", "b"]
+    assert db.get_profile_by_name("a").temperature == 0.9
+
+    db.delete_profile("a")
+    assert db.get_all_profile_names() == ["b"]
+    assert db.get_profile_by_name("a") is None
+
+
+def test_writes_by_another_process_invalidate_the_cache():
+    db.save_profile(make_profile("a"))
+    assert db.get_profile_by_name("a").temperature == 0.5
+    assert db.get_all_profile_names() == ["a"]
+    version = db.get_profiles_version()[0]
+
+    # Another worker writes through its own connection; this process's cache never saw it
+    other = sqlite3.connect(db.DB_PATH)
+    with other:
+        other.execute("UPDATE profiles SET temperature=0.9 WHERE name='a'")
+        other.execute("INSERT INTO profiles VALUES ('b', 0.1, 100, 0.9, 20, 'T', NULL)")
+        db._bump_version(other)
+    other.close()
+
+    assert db.get_profiles_version()[0] == version + 1
+    assert db.get_profile_by_name("a").temperature == 0.9
+    assert sorted(db.get_all_profile_names()) == ["a", "b"]
+    assert {p.name for p in db.get_all_profiles()} == {"a", "b"}
+
+
+def test_cached_profiles_are_copies():
+    db.save_profile(make_profile("a"))
+    profile = db.get_profile_by_name("a")
+    profile.temperature = 2.0
+    assert db.get_profile_by_name("a").temperature == 0.5
+
+
+def test_cache_memory_usage_follows_the_cache():
+    db.save_profile(make_profile("a"))
+    empty = db.cache_memory_usage()
+    assert empty["entries"] == 0
+    db.get_all_profiles()
+    cached = db.cache_memory_usage()
+    assert cached["entries"] == 1 and cached["bytes"] > empty["bytes"]
+    db.save_profile(make_profile("b"))
+    assert db.cache_memory_usage() == empty
+
+
+def test_version_bumps_on_every_write():
+    version, updated_at = db.get_profiles_version()
+    db.save_profile(make_profile("a"))
+    v1, t1 = db.get_profiles_version()
+    assert v1 == version + 1
+    assert t1 >= updated_at
+
+    db.delete_profile("missing")  # no-op delete does not change the version
+    assert db.get_profiles_version()[0] == v1
+
+    db.delete_profile("a")
+    assert db.get_profiles_version()[0] == v1 + 1
+
+
+def test_get_all_profiles():
+    db.save_profile(make_profile("a"))
+    db.save_profile(make_profile("b", temperature=0.1))
+    profiles = {p.name: p for p in db.get_all_profiles()}
+    assert profiles["b"].temperature == 0.1
+    assert sorted(db.get_all_profile_names()) == ["a", "b"]
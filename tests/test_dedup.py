@@ -0,0 +1,72 @@
+from unittest.mock import patch
+
+from langchain_core.documents import Document
+
+from app.core.chunk_filter import ChunkFilter
+from app.core.dedup import collapse_duplicates, exact_duplicate_groups, lsh_bands, near_duplicate_groups
+from app.core.rag import RAGService
+from conftest import HashEmbeddings
+
+DISCLAIMER = ("This report is confidential and intended solely for the treating clinician. "
+              "Do not distribute without written consent from the patient or the records office.")
+
+
+def chunks():
+    docs = []
+    for source in ("cardiology_case.pdf", "neurology_case.pdf", "urology_case.pdf"):
+        docs.append(Document(page_content=f"Findings specific to {source}: nothing shared with the others.",
+                             metadata={"source": f"data/pdfs/{source}", "page": 0}))
+        # Repeated boilerplate, with the whitespace / case / punctuation noise PDF extraction introduces
+        text = DISCLAIMER.upper() if source == "urology_case.pdf" else DISCLAIMER.replace(" ", "  \n").replace(".", " .")
+        docs.append(Document(page_content=text, metadata={"source": f"data/pdfs/{source}", "page": 1}))
+    return docs
+
+
+def test_lsh_bands_put_the_candidate_threshold_just_below_the_target():
+    bands, rows = lsh_bands(128, 0.85)
+    assert bands * rows <= 128 and 0.75 < (1 / bands) ** (1 / rows) <= 0.85
+
+
+def test_groups_near_duplicates_only():
+    texts = [DISCLAIMER, "An unrelated note about a knee injury after skiing.", DISCLAIMER.lower(),
+             DISCLAIMER.replace("written consent", "signed written consent"), ""]
+    assert near_duplicate_groups(texts, threshold=0.7) == [[0, 2, 3], [1], [4]]
+    assert near_duplicate_groups(texts, threshold=0.99) == [[0, 2], [1], [3], [4]]
+
+
+def test_exact_groups_ignore_formatting_but_keep_negations_and_doses():
+    order = "Continue Lisinopril 10mg once daily and recheck blood pressure and potassium in two weeks."
+    texts = [order, order.replace("Continue", "Discontinue"), order.replace("10mg", "40mg"),
+             order.upper().replace(" ", "\n"), order.replace("Lisinopril", "Lisinopril,").replace(".", ""), ""]
+    assert exact_duplicate_groups(texts) == [[0, 3, 4], [1], [2], [5]]
+    assert [doc.page_content for doc in collapse_duplicates([Document(page_content=t) for t in texts])] == [
+        texts[0], texts[1], texts[2], ""
+    ]
+
+
+def test_collapsed_chunk_references_every_copy():
+    kept = collapse_duplicates(chunks())
+    assert [doc.metadata["source"].rsplit("/", 1)[1] for doc in kept] == [
+        "cardiology_case.pdf", "cardiology_case.pdf", "neurology_case.pdf", "urology_case.pdf"
+    ]
+    assert kept[1].metadata["references"] == [
+        {"source": f"data/pdfs/{s}", "page": 1} for s in ("cardiology_case.pdf", "neurology_case.pdf",
+                                                          "urology_case.pdf")
+    ]
+    assert "references" not in kept[0].metadata
+
+
+def test_build_embeds_duplicates_once_and_filters_by_any_copy(tmp_path):
+    rag = RAGService(index_dir=str(tmp_path / "index"), embeddings=HashEmbeddings(), extraction_cache_dir=None)
+    with patch.object(RAGService, "_load_splits", return_value=chunks()):
+        rag.load_and_index()
+    assert rag.vector_store.index.ntotal == 4 and rag.embeddings.embedded == 4
+
+    hits = rag.retrieve([DISCLAIMER], k=4, filters=ChunkFilter(sources=["urology_case.pdf"], page_from=1))[0]
+    assert len(hits) == 1
+    assert hits[0]["source"] == "cardiology_case.pdf"  # the copy that was kept
+    assert [ref["source"] for ref in hits[0]["references"]] == ["cardiology_case.pdf", "neurology_case.pdf",
+                                                                "urology_case.pdf"]
+    assert {doc["source"]: doc["chunks"] for doc in rag.chunk_catalog.sources()} == {
+        "cardiology_case.pdf": 2, "neurology_case.pdf": 2, "urology_case.pdf": 2
+    }
@@ -0,0 +1,37 @@
+import argparse
+
+from scripts.evaluate_retrieval import sweep
+
+TOPICS = ["sepsis", "asthma", "stroke", "anemia", "gout", "migraine"]
+
+
+def args(**overrides) -> argparse.Namespace:
+    settings = dict(chunk_sizes=[200], chunk_overlaps=[0], indexes=["flat", "hnsw", "pq"], ef_search=[16],
+                    nprobe=[1], k=[1, 3], hybrid=[False, True], hnsw_m=8, nlist=4, rerank_factor=2,
+                    pq_m=8, pq_bits=8, dim=64)
+    return argparse.Namespace(**{**settings, **overrides})
+
+
+def test_sweep_reports_metrics_and_pareto_front():
+    pages = [{"text": f"Patient with {topic}. Treatment plan for {topic} follows.", "source": f"{topic}.pdf", "page": 0}
+             for topic in TOPICS]
+    questions = [{"question": f"How is {topic} treated?", "source": f"{topic}.pdf", "page": 0} for topic in TOPICS]
+
+    results = sweep(args(), pages, questions)
+
+    # One row per index type, k and hybrid setting; six chunks are far too few to train PQ
+    assert len(results) == 3 * 2 * 2
+    assert {r.index for r in results} == {"flat", "hnsw", "int8"}
+    assert {r.params for r in results if r.index == "int8"} == {"from pq"}
+    for r in results:
+        assert 0 <= r.mrr <= r.recall <= 1
+        assert r.p50_ms <= r.p95_ms <= r.p99_ms and r.index_kb > 0
+    assert all(r.recall == 1.0 for r in results if r.index == "flat" and r.k == 3)
+
+    # The front is non-empty and nothing on it is dominated by another row
+    front = [r for r in results if r.pareto]
+    assert front
+    for r in front:
+        assert not any(o.recall >= r.recall and o.mrr >= r.mrr and o.p95_ms <= r.p95_ms and o.index_kb <= r.index_kb
+                       and (o.recall, o.mrr, o.p95_ms, o.index_kb) != (r.recall, r.mrr, r.p95_ms, r.index_kb)
+                       for o in results)
@@ -0,0 +1,186 @@
+import json
+import time
+from unittest.mock import patch
+
+import numpy as np
+
+from app.core.example_index import ExampleIndex, top_k
+from app.core.expert_knowledge import ExpertKnowledgeService
+
+TOPICS = ["sepsis", "asthma", "diabetes", "stroke"]
+
+
+class KeywordEmbeddings:
+    """
+    Deterministic stand-in for the embedding API: one axis per known topic, plus one that
+    differs between the query and document task types.
+    """
+
+    def __init__(self):
+        self.document_calls = 0
+        self.query_calls = 0
+
+    def embed_query(self, text: str) -> list[float]:
+        return [float(topic in text.lower()) for topic in TOPICS] + [0.1]
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        self.query_calls += 1
+        return [self.embed_query(t) for t in texts]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.document_calls += 1
+        return [[float(topic in t.lower()) for topic in TOPICS] + [0.5] for t in texts]
+
+
+def write_examples(path, topics):
+    with open(path, "w") as f:
+        for topic in topics:
+            f.write(json.dumps({"messages": [
+                {"role": "system", "content": "You are a precise medical research assistant."},
+                {"role": "user", "content": f"What is {topic}?"},
+                {"role": "assistant", "content": f"{topic.title()} is a condition."},
+            ]}) + "\n")
+
+
+def make_service(tmp_path, topics=TOPICS):
+    data = tmp_path / "examples.jsonl"
+    write_examples(data, topics)
+    service = ExpertKnowledgeService(index_dir=str(tmp_path / "index"), embeddings=KeywordEmbeddings())
+    service.data_path = str(data)
+    return service
+
+
+def test_top_k_matches_full_sort():
+    scores = np.random.default_rng(0).random((3, 50)).astype(np.float32)
+    rows, best = top_k(scores, 5)
+    assert (rows == np.argsort(-scores, axis=1)[:, :5]).all()
+    assert (best == -np.sort(-scores, axis=1)[:, :5]).all()
+    assert top_k(scores, 100)[0].shape == (3, 50)
+
+
+def test_search_returns_structured_examples(tmp_path):
+    service = make_service(tmp_path)
+    service.load_and_index()
+
+    results = service.search_examples("Tell me about asthma", k=2)
+    assert results[0]["question"] == "What is asthma?"
+    assert results[0]["answer"] == "Asthma is a condition."
+    assert results[0]["score"] > results[1]["score"]
+    assert service.search("asthma", k=1) == "Q: What is asthma?\nA: Asthma is a condition."
+
+
+def test_batch_search_uses_one_embedding_call(tmp_path):
+    service = make_service(tmp_path)
+    service.load_and_index()
+    service.embeddings.document_calls = 0
+
+    queries = ["stroke signs", "diabetes diet", "sepsis"]
+    results = service.search_batch(queries, k=1)
+    assert [r[0]["question"] for r in results] == ["What is stroke?", "What is diabetes?", "What is sepsis?"]
+    assert service.embeddings.query_calls == 1 and service.embeddings.document_calls == 0
+
+
+def test_batch_search_matches_single_searches(tmp_path):
+    service = make_service(tmp_path)
+    service.load_and_index()
+
+    queries = ["stroke signs", "asthma and sepsis", "unrelated"]
+    assert service.search_batch(queries, k=3) == [service.search_examples(q, k=3) for q in queries]
+
+
+def test_index_is_reloaded_and_rebuilt_when_stale(tmp_path):
+    service = make_service(tmp_path)
+    service.load_and_index()
+
+    reloaded = ExpertKnowledgeService(index_dir=service.index_dir, embeddings=KeywordEmbeddings())
+    reloaded.data_path = service.data_path
+    with patch.object(ExampleIndex, "build", side_effect=AssertionError("should load from disk")):
+        reloaded.load_and_index()
+    assert len(reloaded.vector_store) == len(TOPICS)
+    assert (reloaded.vector_store.vectors == service.vector_store.vectors).all()
+
+    write_examples(service.data_path, TOPICS[:2])
+    reloaded.load_and_index()
+    assert len(reloaded.vector_store) == 2
+
+
+def test_no_examples_indexed():
+    service = ExpertKnowledgeService(index_dir="unused", embeddings=KeywordEmbeddings())
+    assert service.search_examples("asthma") == []
+    assert service.search("asthma") == "No examples indexed."
+
+
+def test_add_example_is_indexed_incrementally(tmp_path):
+    service = make_service(tmp_path, TOPICS[:2])
+    service.load_and_index()
+    service.embeddings.document_calls = 0
+
+    assert service.add_example({"question": "What is a stroke?", "answer": "Brain ischemia."}) == 3
+    assert service.embeddings.document_calls == 1  # only the new line was embedded
+    assert service.search_examples("stroke", k=1)[0]["answer"] == "Brain ischemia."
+
+    # The appended rows were persisted: a fresh load needs no embedding at all
+    reloaded = ExpertKnowledgeService(index_dir=service.index_dir, embeddings=KeywordEmbeddings())
+    reloaded.data_path = service.data_path
+    reloaded.load_and_index()
+    assert len(reloaded.vector_store) == 3
+    assert reloaded.embeddings.document_calls == 0
+
+
+def test_refresh_picks_up_lines_appended_by_editors(tmp_path):
+    service = make_service(tmp_path, TOPICS[:2])
+    service.load_and_index()
+
+    with open(service.data_path, "a") as f:
+        f.write(json.dumps({"messages": [
+            {"role": "user", "content": "What is diabetes?"},
+            {"role": "assistant", "content": "High blood sugar."},
+        ]}) + "\n")
+        f.write('{"messages": [{"role": "user"')  # still being written
+
+    assert service.refresh() == 1
+    assert service.refresh() == 0
+    assert service.search_examples("diabetes", k=1)[0]["answer"] == "High blood sugar."
+
+
+def test_corrupted_source_rows_are_skipped(tmp_path):
+    service = make_service(tmp_path)
+    service.load_and_index()
+
+    # Edited in place without changing the size: one row loses its answer, one stops being JSON
+    text = open(service.data_path).read()
+    lines = text.splitlines(keepends=True)
+    lines[1] = lines[1].replace('"assistant"', '"assistanX"')
+    lines[2] = "#" + lines[2][1:]
+    with open(service.data_path, "w") as f:
+        f.write("".join(lines))
+
+    results = service.search_examples("asthma diabetes", k=4)
+    assert sorted(r["question"] for r in results) == ["What is sepsis?", "What is stroke?"]
+
+
+def test_rewritten_source_triggers_rebuild(tmp_path):
+    service = make_service(tmp_path)
+    service.load_and_index()
+    write_examples(service.data_path, ["asthma"])
+
+    service.refresh()
+    assert len(service.vector_store) == 1
+
+
+def test_watcher_indexes_appended_examples(tmp_path):
+    service = make_service(tmp_path, TOPICS[:1])
+    service.load_and_index()
+    service.start_watching(0.01)
+    try:
+        with open(service.data_path, "a") as f:
+            f.write(json.dumps({"messages": [
+                {"role": "user", "content": "What is asthma?"},
+                {"role": "assistant", "content": "Airway inflammation."},
+            ]}) + "\n")
+        deadline = time.monotonic() + 5
+        while len(service.vector_store) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        service.stop_watching()
+    assert len(service.vector_store) == 2
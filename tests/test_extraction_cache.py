@@ -0,0 +1,98 @@
+import gzip
+import shutil
+from unittest.mock import patch
+
+import pytest
+
+from app.core.extraction_cache import ExtractionCache, parser_version
+from app.core.rag import RAGService
+
+
+def write_pdf(path, pages):
+    """Writes a minimal PDF with one line of Helvetica text per page."""
+    n = len(pages)
+    kids = " ".join(f"{4 + 2 * i} 0 R" for i in range(n))
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {n} >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, text in enumerate(pages):
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    out, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(out)
+    return str(path)
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    return write_pdf(tmp_path / "case.pdf", ["Patient has atrial fibrillation.", "Plan: Holter monitor."])
+
+
+def no_parsing():
+    return patch("langchain_community.document_loaders.PyPDFLoader", side_effect=AssertionError("parsed again"))
+
+
+def test_second_load_comes_from_cache(tmp_path, pdf):
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    first = cache.load_pdf(pdf)
+    assert [d.metadata["page"] for d in first] == [0, 1]
+    assert "atrial fibrillation" in first[0].page_content
+
+    with no_parsing():
+        again = ExtractionCache(str(tmp_path / "cache")).load_pdf(pdf)
+    assert [(d.page_content, d.metadata) for d in again] == [(d.page_content, d.metadata) for d in first]
+
+
+def test_key_is_content_and_parser_version(tmp_path, pdf):
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    cache.load_pdf(pdf)
+
+    renamed = shutil.copy(pdf, tmp_path / "renamed.pdf")
+    with no_parsing():
+        docs = cache.load_pdf(str(renamed))
+    assert docs[0].metadata["source"] == str(renamed)  # source follows the loaded path
+
+    upgraded = ExtractionCache(str(tmp_path / "cache"), parser=parser_version() + "-next")
+    upgraded.load_pdf(pdf)
+    assert (cache.hits, upgraded.misses) == (1, 1)
+
+    edited = write_pdf(tmp_path / "case.pdf", ["Different text."])
+    assert "Different text." in cache.load_pdf(edited)[0].page_content
+
+
+def test_corrupt_entry_is_re_extracted(tmp_path, pdf):
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    cache.load_pdf(pdf)
+    entry = next((tmp_path / "cache").iterdir())
+    entry.write_bytes(b"not gzip")
+
+    assert "atrial fibrillation" in cache.load_pdf(pdf)[0].page_content
+    with gzip.open(entry, "rt") as f:
+        assert "Holter" in f.read()
+
+
+def test_rebuild_reuses_extracted_text(tmp_path, pdf):
+    class FakeEmbeddings:
+        def embed_documents(self, texts):
+            return [[float(len(t)), 1.0] for t in texts]
+
+    rag = RAGService(data_dir=str(tmp_path), index_dir=str(tmp_path / "index"),
+                     embeddings=FakeEmbeddings(), extraction_cache_dir=str(tmp_path / "cache"))
+    rag.load_and_index()
+    assert rag.vector_store.index.ntotal == 2
+
+    shutil.rmtree(tmp_path / "index")
+    with no_parsing(), patch("app.core.rag.CHUNK_SIZE", 20), patch("app.core.rag.CHUNK_OVERLAP", 0):
+        rag.load_and_index()  # re-chunked with new parameters, without parsing the PDF
+    assert rag.vector_store.index.ntotal > 2
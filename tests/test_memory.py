@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from app.core.memory import approx_size, process_memory, tracemalloc_report, vector_store_memory
+from app.core.quantization import compress_store
+from app.core.sharding import build_sharded
+from conftest import HashEmbeddings
+
+
+def docs(n=40):
+    return [Document(page_content=f"chunk {i} " + "x" * 200, metadata={"source": f"data/pdfs/d{i % 4}.pdf"})
+            for i in range(n)]
+
+
+def test_approx_size_counts_buffers_once_and_skips_memory_maps(tmp_path):
+    array = np.zeros(1000, dtype=np.float32)
+    assert approx_size([array, array]) >= 4000
+    assert approx_size([array, array]) < 8000
+    np.zeros(1000, dtype=np.float32).tofile(tmp_path / "v.f32")
+    assert approx_size(np.memmap(tmp_path / "v.f32", dtype=np.float32, mode="r")) == 0
+    assert approx_size({"text": "a" * 1000}) > 1000
+
+
+def test_process_memory_reports_rss():
+    assert process_memory().get("rss_bytes", process_memory().get("peak_rss_bytes", 0)) > 0
+
+
+@pytest.mark.parametrize("layout", ["flat", "int8", "sharded"])
+def test_vector_store_memory_reports_index_and_docstore(tmp_path, layout):
+    if layout == "sharded":
+        store = build_sharded(docs(), HashEmbeddings(), 2)
+    else:
+        store = FAISS.from_documents(docs(), HashEmbeddings())
+        if layout != "flat":
+            compress_store(store, str(tmp_path), layout)
+
+    report = vector_store_memory(store)
+    assert report["index"]["vectors"] == 40 and report["index"]["dim"] == 16
+    assert report["index"]["bytes"] == {"flat": 40 * 16 * 4, "int8": 40 * 16, "sharded": 40 * 16 * 4}[layout]
+    if layout == "int8":
+        assert report["index"]["rerank_mapped_bytes"] == 40 * 16 * 4
+    if layout == "sharded":
+        assert sum(shard["vectors"] for shard in report["index"]["shards"]) == 40
+    assert report["docstore"]["entries"] == 40 and report["docstore"]["bytes"] > 40 * 200
+    assert report["id_map"]["entries"] == 40
+
+
+def test_tracemalloc_report_shows_growth_between_calls():
+    import tracemalloc
+
+    assert tracemalloc_report() == {"tracing": False}
+    tracemalloc.start()
+    try:
+        tracemalloc_report()
+        hoard = [bytearray(1024) for _ in range(2000)]
+        report = tracemalloc_report(top=5)
+    finally:
+        tracemalloc.stop()
+    assert report["tracing"] and report["traced_bytes"] >= 2000 * 1024
+    assert len(report["top"]) <= 5
+    assert report["growth_since_last"][0]["bytes_diff"] >= 2000 * 1024
+    assert "test_memory.py" in report["growth_since_last"][0]["site"]
+    del hoard
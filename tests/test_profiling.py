@@ -0,0 +1,115 @@
+import contextvars
+import cProfile
+import os
+import sys
+import threading
+import time
+
+from unittest.mock import patch
+
+import pytest
+
+from app.core.profiling import RequestProfile, profile_request, profiled
+
+
+@profiled
+def slow_work():
+    time.sleep(0.05)
+
+
+def test_sampling_profile_collects_collapsed_stacks():
+    with profile_request(mode="sample", interval=0.001) as profile:
+        slow_work()
+
+    output = profile.collapsed()
+    assert "slow_work (test_profiling.py" in output
+    # Every line is "<stack> <count>"
+    for line in output.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+
+
+def test_profiled_threads_are_included():
+    with profile_request(mode="sample", interval=0.001) as profile:
+        # Worker threads see the profile through a copied context, as with run_in_threadpool
+        worker = threading.Thread(target=contextvars.copy_context().run, args=(slow_work,))
+        worker.start()
+        worker.join()
+
+    assert "slow_work" in profile.collapsed()
+
+
+def test_cprofile_mode_saves_pstats(tmp_path):
+    with profile_request(mode="cprofile") as profile:
+        slow_work()
+
+    assert "slow_work" in profile.render()
+    path = profile.save(str(tmp_path), "chat-test")
+    assert path.endswith(".prof")
+    assert os.path.getsize(path) > 0
+
+
+def test_cprofile_reports_threads_it_could_not_cover():
+    def refuse(self):
+        raise ValueError("Another profiling tool is already active")
+
+    with patch("app.core.profiling._PER_THREAD_PROFILERS", True), profile_request(mode="cprofile") as profile:
+        with patch.object(cProfile.Profile, "enable", refuse):
+            worker = threading.Thread(target=contextvars.copy_context().run, args=(slow_work,), name="worker-1")
+            worker.start()
+            worker.join()
+        slow_work()
+
+    assert profile.notes == ["Thread worker-1 was not profiled: Another profiling tool is already active"]
+    output = profile.render()
+    assert output.startswith("# Thread worker-1 was not profiled") and "slow_work" in output
+
+
+def test_interpreter_wide_cprofile_covers_the_request():
+    with patch("app.core.profiling._PER_THREAD_PROFILERS", False):
+        with profile_request(mode="cprofile") as profile:
+            slow_work()
+
+    assert profile.notes == ["Interpreter-wide profile: includes every thread that ran during the request"]
+    output = profile.render()
+    assert output.startswith("# Interpreter-wide profile") and "slow_work" in output
+
+
+@pytest.mark.skipif(sys.version_info < (3, 12), reason="cProfile is per-thread before Python 3.12")
+def test_concurrent_interpreter_wide_profiles_say_what_they_missed():
+    with profile_request(mode="cprofile") as outer, profile_request(mode="cprofile") as inner:
+        worker = threading.Thread(target=contextvars.copy_context().run, args=(slow_work,))
+        worker.start()
+        worker.join()
+
+    assert "slow_work" in outer.render()  # the worker thread is covered too
+    assert inner.notes[0].startswith("Nothing was recorded")
+
+
+def test_unknown_mode_rejected():
+    with pytest.raises(ValueError):
+        RequestProfile(mode="perf")
+
+
+def test_profiled_is_noop_without_active_profile():
+    slow_work()
+
+
+@profiled
+def slow_stream():
+    for token in ("a", "b"):
+        time.sleep(0.02)
+        yield token
+
+
+def test_profiled_generator_is_sampled_while_iterated():
+    with profile_request(mode="sample", interval=0.001) as profile:
+        stream = slow_stream()
+        assert profile.collapsed() == ""  # creating the generator runs nothing
+        # Drive it from a worker thread, as StreamingResponse does with sync iterators
+        worker = threading.Thread(target=contextvars.copy_context().run, args=(list, stream))
+        worker.start()
+        worker.join()
+
+    assert "slow_stream (test_profiling.py" in profile.collapsed()
+    assert list(slow_stream()) == ["a", "b"]
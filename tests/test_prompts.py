@@ -0,0 +1,30 @@
+import pytest
+
+from app.core.prompts import PROMPT_TEMPLATES, needs_examples, render_template, resolve_template
+
+
+def test_source_forces_source_grounding():
+    assert resolve_template("Step-Back Prompting", "CDC", True) == ("Source Grounding (Pre-training)", "CDC")
+
+
+def test_strict_template_without_rag_falls_back_to_general_knowledge():
+    assert resolve_template("According-to (Standard)", None, False) == \
+        ("Source Grounding (Pre-training)", "General Medical Knowledge")
+    assert resolve_template("According-to (Standard)", None, True) == ("According-to (Standard)", None)
+
+
+def test_render_template_variants():
+    grounded = render_template("Source Grounding (Pre-training)", "What is {x}?")
+    assert "**MEDICAL SCIENCE**" in grounded
+    assert grounded.endswith("Question: What is {x}?")
+
+    expert = render_template("Medical Expert (Example-Based)", "Q?", examples="Q: a\nA: b")
+    assert "Q: a\nA: b" in expert
+    assert needs_examples("Medical Expert (Example-Based)")
+    assert not needs_examples("Step-Back Prompting")
+
+
+def test_unknown_template():
+    with pytest.raises(KeyError):
+        render_template("Nope", "Q?")
+    assert "Nope" not in PROMPT_TEMPLATES
@@ -0,0 +1,120 @@
+import json
+
+import faiss
+import numpy as np
+import pytest
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from unittest.mock import patch
+
+from app.core.quantization import (
+    QUANTIZED_META_FILE, RerankedIndex, build_quantized, built_mode, compress_store, index_nbytes, load_compressed
+)
+from app.core.rag import RAGService
+
+DIM = 32
+
+
+def clustered_vectors(n: int = 600, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(20, DIM))
+    return (centers[rng.integers(0, 20, n)] + 0.3 * rng.normal(size=(n, DIM))).astype(np.float32)
+
+
+def recall_at(labels: np.ndarray, truth: np.ndarray) -> float:
+    return float(np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(labels, truth)]))
+
+
+def flat_store(vectors: np.ndarray) -> FAISS:
+    index = faiss.IndexFlatL2(DIM)
+    index.add(vectors)
+    ids = [f"chunk-{i}" for i in range(len(vectors))]
+    docstore = InMemoryDocstore({cid: Document(page_content=cid) for cid in ids})
+    return FAISS(None, index, docstore, dict(enumerate(ids)))
+
+
+@pytest.mark.parametrize("mode, ratio", [("fp16", 2), ("int8", 4), ("pq", 16)])
+def test_modes_shrink_memory_and_rerank_restores_recall(mode, ratio):
+    vectors, queries = clustered_vectors(), clustered_vectors(50, seed=1)
+    flat = faiss.IndexFlatL2(DIM)
+    flat.add(vectors)
+    truth_d, truth = flat.search(queries, 10)
+
+    index = build_quantized(vectors, mode, pq_m=8, pq_bits=8)
+    assert index_nbytes(flat) / index_nbytes(index) == ratio
+
+    distances, labels = RerankedIndex(index, vectors, rerank_factor=4).search(queries, 10)
+    assert recall_at(labels, truth) >= 0.95
+    # Re-ranked distances are exact
+    assert np.allclose(distances[:, 0], truth_d[:, 0], rtol=1e-4, atol=1e-4)
+
+
+@pytest.mark.parametrize("mode", ["int8", "pq"])
+def test_filtered_search_matches_a_flat_search_over_the_slice(mode):
+    vectors, queries = clustered_vectors(), clustered_vectors(5, seed=1)
+    rows = np.sort(np.random.default_rng(2).choice(len(vectors), size=150, replace=False)).astype(np.int64)
+    flat = faiss.IndexFlatL2(DIM)
+    flat.add(vectors)
+    truth_d, truth = flat.search(queries, 5, params=faiss.SearchParameters(sel=faiss.IDSelectorBatch(rows)))
+
+    index = RerankedIndex(build_quantized(vectors, mode, pq_m=8, pq_bits=8), vectors, rerank_factor=4)
+    with patch("app.core.quantization._SCAN_BLOCK", 64), patch.object(index, "search", wraps=index.search) as search:
+        distances, labels = index.search_subset(queries, 5, rows)
+    # Only PQ scans the slice; scalar quantizers search inside it and re-rank k * rerank_factor rows
+    assert search.called == (mode == "int8")
+    assert set(labels.ravel()) <= set(rows)
+    assert recall_at(labels, truth) >= 0.95
+    assert np.allclose(distances[:, 0], truth_d[:, 0], rtol=1e-4, atol=1e-4)
+
+
+def test_pq_falls_back_to_int8_when_too_few_vectors(tmp_path):
+    index = build_quantized(clustered_vectors(100), "pq", pq_m=8, pq_bits=8)
+    assert isinstance(index, faiss.IndexScalarQuantizer)
+    assert built_mode(index) == "int8"
+
+    # The sidecar metadata records what was built, not only what was asked for
+    compress_store(flat_store(clustered_vectors(100)), str(tmp_path), "pq", pq_m=8, pq_bits=8)
+    meta = json.loads((tmp_path / QUANTIZED_META_FILE).read_text())
+    assert (meta["mode"], meta["built_mode"]) == ("pq", "int8")
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_compressed_sidecars_round_trip(tmp_path):
+    vectors = clustered_vectors()
+    store = flat_store(vectors)
+    compress_store(store, str(tmp_path), "int8", rerank_factor=4)
+    assert isinstance(store.index, RerankedIndex)
+    assert store.similarity_search_by_vector(vectors[7].tolist(), k=1)[0].page_content == "chunk-7"
+
+    loaded = load_compressed(str(tmp_path), "int8", rerank_factor=4)
+    assert loaded.ntotal == len(vectors) and isinstance(loaded.exact, np.memmap)
+    assert load_compressed(str(tmp_path), "fp16") is None  # built for another mode
+
+
+def test_rag_service_loads_compressed_index_without_flat_vectors(tmp_path):
+    vectors = clustered_vectors()
+    flat_store(vectors).save_local(str(tmp_path))
+
+    rag = RAGService(index_dir=str(tmp_path), embeddings=object(), storage="int8")
+    rag.load_and_index()  # first load builds the sidecars from the float32 index
+    assert isinstance(rag.vector_store.index, RerankedIndex)
+
+    reloaded = RAGService(index_dir=str(tmp_path), embeddings=object(), storage="int8")
+    with patch.object(FAISS, "load_local", side_effect=AssertionError("float32 index should not be read")):
+        reloaded.load_and_index()
+    assert reloaded.vector_store.similarity_search_by_vector(vectors[3].tolist(), k=1)[0].page_content == "chunk-3"
+
+
+def test_compressed_index_is_rebuilt_when_the_float32_index_changes(tmp_path):
+    flat_store(clustered_vectors()).save_local(str(tmp_path))
+    RAGService(index_dir=str(tmp_path), embeddings=object(), storage="int8").load_and_index()
+
+    # Same vector count, different vectors: a count check alone would serve the old sidecars
+    vectors = clustered_vectors(seed=2)
+    flat_store(vectors).save_local(str(tmp_path))
+    assert load_compressed(str(tmp_path), "int8") is None
+
+    rag = RAGService(index_dir=str(tmp_path), embeddings=object(), storage="int8")
+    rag.load_and_index()
+    assert rag.vector_store.similarity_search_by_vector(vectors[5].tolist(), k=1)[0].page_content == "chunk-5"
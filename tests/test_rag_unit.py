@@ -5,8 +5,8 @@ import os
 
 class TestRAGService(unittest.TestCase):
 
-    @patch("app.core.rag.GoogleGenerativeAIEmbeddings")
-    @patch("app.core.rag.ChatGoogleGenerativeAI")
+    @patch("langchain_google_genai.GoogleGenerativeAIEmbeddings")
+    @patch("langchain_google_genai.ChatGoogleGenerativeAI")
     def setUp(self, MockLLM, MockEmbeddings):
         self.rag = RAGService(data_dir="tests/data", index_dir="tests/index")
         self.rag.llm = MockLLM.return_value
@@ -17,7 +17,7 @@ class TestRAGService(unittest.TestCase):
         self.assertEqual(self.rag.data_dir, "tests/data")
 
     @patch("app.core.rag.os.path.exists")
-    @patch("app.core.rag.FAISS")
+    @patch("langchain_community.vectorstores.FAISS")
     def test_load_existing_index(self, MockFAISS, MockExists):
         # Simulate index exists
         MockExists.side_effect = lambda path: path == "tests/index"
@@ -27,6 +27,11 @@ class TestRAGService(unittest.TestCase):
         MockFAISS.load_local.assert_called_once()
         self.assertIsNotNone(self.rag.vector_store)
 
+    def test_construction_is_lazy(self):
+        # No embedding client is created until something needs one
+        rag = RAGService(data_dir="tests/data", index_dir="tests/index")
+        self.assertIsNone(rag._embeddings)
+
     def test_query_no_index_error(self):
         # Should return error string if rag=True but no index
         self.rag.vector_store = None
@@ -57,5 +62,134 @@ class TestRAGService(unittest.TestCase):
         
         self.rag.llm.bind.assert_called()
 
+    @patch("langchain_google_genai.ChatGoogleGenerativeAI")
+    def test_template_rendered_with_shared_embedding(self, MockLLM):
+        self.rag.vector_store = MagicMock()
+        self.rag.vector_store.similarity_search_by_vector.return_value = []
+        self.rag.embeddings.embed_query.return_value = [0.1, 0.2]
+        self.rag.example_selector = MagicMock()
+        self.rag.example_selector.search_by_vector.return_value = "Q: x\nA: y"
+
+        self.rag.query("chest pain", use_rag=True, template="Medical Expert (Example-Based)", num_examples=2)
+
+        # One embedding call serves both example selection and retrieval
+        self.rag.embeddings.embed_query.assert_called_once_with("chest pain")
+        self.rag.example_selector.search_by_vector.assert_called_once_with([0.1, 0.2], k=2)
+        self.rag.vector_store.similarity_search_by_vector.assert_called_once_with([0.1, 0.2], k=4)
+
+        chain = MockLLM.return_value.__or__.return_value
+        messages = chain.invoke.call_args.args[0]
+        self.assertIn("Q: x\nA: y", messages[-1].content)
+        self.assertIn("Question: chest pain", messages[-1].content)
+
+    @patch("langchain_google_genai.ChatGoogleGenerativeAI")
+    def test_stream_query_stops_on_cancel(self, MockLLM):
+        import threading
+        cancel = threading.Event()
+        chain = MockLLM.return_value.__or__.return_value
+        stream = MagicMock()
+        stream.__iter__.return_value = iter(["a", "b", "c"])
+        chain.stream.return_value = stream
+
+        chunks = []
+        for chunk in self.rag.stream_query("test", use_rag=False, cancel_event=cancel):
+            chunks.append(chunk)
+            cancel.set()
+
+        self.assertEqual(chunks, ["a"])
+        stream.close.assert_called_once()
+
+    @patch("app.core.rag.LLM_TIMEOUT", 0.05)
+    @patch("langchain_google_genai.ChatGoogleGenerativeAI")
+    def test_stream_query_first_chunk_is_bounded_by_the_deadline(self, MockLLM):
+        import threading
+        import time
+        from app.core.resilience import DeadlineExceeded, Resilience
+        self.rag.resilience = Resilience(attempts=1)
+        release = threading.Event()
+
+        def stuck():
+            release.wait(5)
+            yield "late"
+
+        stream = MagicMock()
+        stream.__iter__.return_value = stuck()
+        MockLLM.return_value.__or__.return_value.stream.return_value = stream
+
+        start = time.perf_counter()
+        with self.assertRaises(DeadlineExceeded):
+            list(self.rag.stream_query("test", use_rag=False))
+        self.assertLess(time.perf_counter() - start, 1)
+
+        # The abandoned stream is closed once its first chunk finally arrives
+        release.set()
+        for _ in range(100):
+            if stream.close.called:
+                break
+            time.sleep(0.01)
+        stream.close.assert_called_once()
+
+    @patch("langchain_google_genai.ChatGoogleGenerativeAI")
+    def test_auto_model_is_routed_and_recorded(self, MockLLM):
+        from app.core.routing import ModelRouter, ModelTier
+        from app.core.telemetry import StageTimings
+        self.rag.router = ModelRouter([ModelTier("fast", 1000), ModelTier("slow", 5000, min_prompt_chars=10)])
+        MockLLM.return_value.__or__.return_value.invoke.return_value = "answer"
+
+        timings = StageTimings()
+        self.rag.query("short", use_rag=False, model_name="auto", latency_budget_ms=2000, timings=timings)
+
+        self.assertEqual(MockLLM.call_args.kwargs["model"], "fast")  # slow tier does not fit 2 s
+        self.assertEqual(timings.as_dict()["model"], "fast")
+        self.assertEqual(self.rag.router.snapshot()["fast"]["recent_calls"], 1)
+
+    @patch("langchain_google_genai.ChatGoogleGenerativeAI")
+    def test_only_upstream_failures_count_against_a_model(self, MockLLM):
+        from app.core.resilience import CircuitOpenError, Resilience
+        from app.core.routing import ModelRouter, ModelTier
+
+        class ServiceUnavailable(Exception):
+            """Same class name as the Google SDK's 503 error."""
+
+        self.rag.router = ModelRouter([ModelTier("m", 1000)])
+        self.rag.resilience = Resilience(attempts=1)
+        chain = MockLLM.return_value.__or__.return_value
+        for error in (ValueError("bad request"), ServiceUnavailable("down")):
+            chain.invoke.side_effect = error
+            with self.assertRaises(type(error)):
+                self.rag.query("q", use_rag=False, model_name="m")
+        with patch.object(self.rag.resilience, "breaker") as breaker:
+            breaker.return_value.allow.side_effect = CircuitOpenError("llm:m", 5)
+            with self.assertRaises(CircuitOpenError):
+                self.rag.query("q", use_rag=False, model_name="m")
+
+        # Only the 503 is recorded: a rejected request and an open circuit say nothing new
+        self.assertEqual(self.rag.router.snapshot()["m"], {"recent_calls": 1, "error_rate": 1.0, "p95_ms": None})
+
+    def test_retrieve_uses_one_batched_search(self):
+        from langchain_community.vectorstores import FAISS
+        from langchain_core.documents import Document
+        from conftest import AxisEmbeddings
+
+        docs = [Document(page_content=f"{w} notes", metadata={"source": f"data/pdfs/{w}.pdf", "page": i})
+                for i, w in enumerate(AxisEmbeddings.words[:3])]
+        self.rag.vector_store = FAISS.from_documents(docs, AxisEmbeddings())
+        self.rag.embeddings = MagicMock(wraps=AxisEmbeddings())
+        self.rag.embeddings.embed_queries = MagicMock(side_effect=AxisEmbeddings().embed_documents)
+
+        results = self.rag.retrieve(["lung", "kidney"], k=2)
+
+        self.rag.embeddings.embed_queries.assert_called_once_with(["lung", "kidney"])
+        self.rag.embeddings.embed_query.assert_not_called()
+        self.assertEqual([hits[0]["source"] for hits in results], ["lung.pdf", "kidney.pdf"])
+        self.assertEqual(results[0][0]["page"], 1)
+        self.assertEqual(results[0][0]["score"], 0.0)
+        self.assertEqual(len(results[1]), 2)
+
+    def test_stream_query_no_index_error(self):
+        self.rag.vector_store = None
+        chunks = list(self.rag.stream_query("test", use_rag=True))
+        self.assertIn("Error: Vector Index is not built", chunks[0])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,69 @@
+from unittest.mock import MagicMock
+
+from app.core.readiness import IndexReadiness
+
+
+def make_service(loaded: bool = True, error: Exception | None = None):
+    service = MagicMock()
+    service.vector_store = None
+
+    def load():
+        if error:
+            raise error
+        if loaded:
+            service.vector_store = object()
+
+    service.load_and_index.side_effect = load
+    return service
+
+
+def test_starts_pending_and_not_ready():
+    readiness = IndexReadiness(["pdfs", "examples"])
+    assert not readiness.is_ready
+    assert readiness.snapshot()["pdfs"]["state"] == "pending"
+
+
+def test_load_marks_ready_and_warms_up():
+    readiness = IndexReadiness(["pdfs"])
+    service = make_service()
+    readiness.load("pdfs", service, warm_up=True)
+
+    info = readiness.snapshot()["pdfs"]
+    assert info["state"] == "ready"
+    assert "load_ms" in info
+    service.warm_up.assert_called_once()
+    assert readiness.is_ready
+
+
+def test_missing_data_counts_as_ready():
+    readiness = IndexReadiness(["examples"])
+    service = make_service(loaded=False)
+    readiness.load("examples", service, warm_up=True)
+
+    assert readiness.snapshot()["examples"]["state"] == "empty"
+    service.warm_up.assert_not_called()
+    assert readiness.is_ready
+
+
+def test_load_error_is_recorded():
+    readiness = IndexReadiness(["pdfs"])
+    readiness.load("pdfs", make_service(error=RuntimeError("boom")))
+
+    info = readiness.snapshot()["pdfs"]
+    assert info == {"state": "error", "error": "boom"}
+    assert not readiness.is_ready
+
+
+def test_failed_rebuild_keeps_serving_and_recovers():
+    readiness = IndexReadiness(["pdfs"])
+    service = make_service()
+    assert readiness.load("pdfs", service)
+
+    service.load_and_index.side_effect = RuntimeError("embedding quota")
+    assert not readiness.load("pdfs", service, force=True)
+    assert readiness.snapshot()["pdfs"] == {"state": "ready", "error": "embedding quota"}
+    assert readiness.is_ready
+
+    service.load_and_index.side_effect = None
+    assert readiness.load("pdfs", service, force=True)
+    assert "error" not in readiness.snapshot()["pdfs"]
@@ -0,0 +1,189 @@
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.core.embeddings import ResilientEmbeddings
+from app.core.resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, LatencyTracker, Resilience,
+    call_with_timeout, hedged_call, is_transient, remaining, request_deadline, stage_timeout
+)
+
+
+class ServiceUnavailable(Exception):
+    """Same class name as the Google SDK's 503 error."""
+
+
+def flaky(failures: int, error: Exception):
+    calls = []
+
+    def fn(timeout):
+        calls.append(timeout)
+        if len(calls) <= failures:
+            raise error
+        return "ok"
+    return fn, calls
+
+
+def test_transient_errors_are_retried_with_backoff():
+    policy = Resilience(attempts=3, base_delay=0.001, max_delay=0.002)
+    fn, calls = flaky(2, ServiceUnavailable("503"))
+    assert policy.call("llm:m", fn) == "ok"
+    assert len(calls) == 3
+    assert policy.snapshot()["llm:m"] == {"state": "closed", "consecutive_failures": 0}
+
+
+def test_permanent_errors_are_not_retried():
+    policy = Resilience(attempts=3, base_delay=0.001)
+    fn, calls = flaky(5, ValueError("bad request"))
+    with pytest.raises(ValueError):
+        policy.call("llm:m", fn)
+    assert len(calls) == 1
+
+
+def test_backoff_is_jittered_and_capped():
+    policy = Resilience(base_delay=1.0, max_delay=4.0)
+    delays = [policy.backoff(5) for _ in range(200)]
+    assert all(0 <= d <= 4.0 for d in delays)
+    assert len(set(delays)) > 100
+
+
+def test_is_transient_follows_wrapped_causes():
+    wrapped = RuntimeError("chat failed")
+    wrapped.__cause__ = type("ClientError", (Exception,), {"code": 429})()
+    assert is_transient(wrapped)
+    assert is_transient(TimeoutError())
+    assert not is_transient(ValueError())
+
+
+def test_circuit_opens_then_half_opens():
+    breaker = CircuitBreaker("llm:m", failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    breaker.allow()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+
+    time.sleep(0.06)
+    breaker.allow()  # the single trial call
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record_success()
+    breaker.allow()
+    assert breaker.state == "closed"
+
+
+def test_open_circuit_fails_fast():
+    policy = Resilience(attempts=1, failure_threshold=1, reset_timeout=60)
+    fn, calls = flaky(5, ServiceUnavailable())
+    with pytest.raises(ServiceUnavailable):
+        policy.call("llm:m", fn)
+    with pytest.raises(CircuitOpenError):
+        policy.call("llm:m", fn)
+    assert len(calls) == 1
+
+
+def test_stage_timeouts_follow_the_request_deadline():
+    assert remaining() is None and stage_timeout(10) == 10
+    with request_deadline(1.0):
+        assert stage_timeout(10) <= 1.0
+        assert stage_timeout(0.5) == 0.5
+        with request_deadline(5.0):  # an inner deadline never extends the outer one
+            assert remaining() <= 1.0
+    with request_deadline(1.0, start=time.monotonic() - 2):
+        with pytest.raises(DeadlineExceeded):
+            stage_timeout(10)
+
+
+def test_call_with_timeout_abandons_stuck_calls():
+    release = threading.Event()
+    start = time.perf_counter()
+    with pytest.raises(DeadlineExceeded):
+        call_with_timeout(lambda: release.wait(5), 0.05)
+    assert time.perf_counter() - start < 1
+    release.set()
+
+
+def test_a_stuck_upstream_does_not_starve_the_other():
+    release = threading.Event()
+    with patch.dict("app.core.resilience.UPSTREAM_WORKERS", {"llm": 1, "embeddings": 1}), \
+            patch.dict("app.core.resilience._pools", clear=True):
+        with pytest.raises(DeadlineExceeded):
+            call_with_timeout(lambda: release.wait(5), 0.05, upstream="llm")  # abandoned, still running
+        start = time.perf_counter()
+        assert call_with_timeout(lambda: "vector", 1, upstream="embeddings") == "vector"
+        assert time.perf_counter() - start < 0.5
+        release.set()
+
+
+def test_cancelled_trial_call_does_not_leave_the_breaker_half_open():
+    def timed_out(timeout):
+        raise TimeoutError
+
+    def cancelled(timeout):
+        raise KeyboardInterrupt  # a BaseException, like a task cancellation
+
+    resilience = Resilience(attempts=1, failure_threshold=1, reset_timeout=0.01)
+    with pytest.raises(TimeoutError):
+        resilience.call("llm:m", timed_out)
+    time.sleep(0.02)
+    with pytest.raises(KeyboardInterrupt):
+        resilience.call("llm:m", cancelled)
+    # The next call gets the trial instead of CircuitOpenError
+    assert resilience.call("llm:m", lambda timeout: "ok") == "ok"
+    assert resilience.breaker("llm:m").state == CircuitBreaker.CLOSED
+
+
+def test_upstream_calls_run_in_the_callers_context():
+    from app.core.profiling import profile_request
+
+    tracker = LatencyTracker()
+    with request_deadline(30), profile_request(mode="sample", interval=0.001) as profile:
+        def work():
+            time.sleep(0.03)
+            return remaining()
+
+        assert call_with_timeout(work, 5) is not None
+        assert hedged_call(work, tracker, timeout=5) is not None
+
+    assert "work (test_resilience.py" in profile.collapsed()
+
+
+def test_hedged_call_returns_the_faster_attempt():
+    tracker = LatencyTracker()
+    for _ in range(20):
+        tracker.record(10)
+    attempts = []
+    lock = threading.Lock()
+
+    def embed():
+        with lock:
+            attempts.append(1)
+            first = len(attempts) == 1
+        time.sleep(1.0 if first else 0.01)  # the first attempt is "stuck"
+        return [0.1]
+
+    start = time.perf_counter()
+    assert hedged_call(embed, tracker, timeout=5, min_delay=0.02) == [0.1]
+    assert time.perf_counter() - start < 0.5
+    assert len(attempts) == 2
+
+
+def test_resilient_embeddings_retry_document_batches():
+    class Inner:
+        calls = 0
+
+        def embed_documents(self, texts):
+            Inner.calls += 1
+            if Inner.calls == 1:
+                raise ServiceUnavailable()
+            return [[1.0] for _ in texts]
+
+        def embed_query(self, text):
+            return [1.0]
+
+    embeddings = ResilientEmbeddings(Inner(), Resilience(base_delay=0.001), hedge=False)
+    assert embeddings.embed_documents(["a", "b"]) == [[1.0], [1.0]]
+    assert embeddings.embed_query("a") == [1.0]
+    assert Inner.calls == 2
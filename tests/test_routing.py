@@ -0,0 +1,55 @@
+from app.core.resilience import Resilience
+from app.core.routing import ModelRouter, ModelTier
+
+FLASH = ModelTier("flash", expected_latency_ms=3000, prefill_ms_per_1k_chars=20)
+PRO = ModelTier("pro", expected_latency_ms=15000, min_prompt_chars=6000, prefill_ms_per_1k_chars=60)
+
+
+def router(**kwargs) -> ModelRouter:
+    return ModelRouter([FLASH, PRO], default_budget_ms=30000, **kwargs)
+
+
+def test_small_prompt_stays_on_fast_tier():
+    assert router().choose(prompt_chars=500) == "flash"
+
+
+def test_large_prompt_goes_to_pro_when_it_fits_the_budget():
+    assert router().choose(prompt_chars=20000) == "pro"
+
+
+def test_tight_budget_keeps_large_prompt_on_fast_tier():
+    # pro: 15000 + 20 * 60 = 16200 ms does not fit; flash: 3000 + 20 * 20 = 3400 ms does
+    assert router().choose(prompt_chars=20000, budget_ms=10000) == "flash"
+
+
+def test_exhausted_budget_is_not_replaced_by_the_default():
+    # 0 ms left: nothing fits, so the fastest healthy tier, not pro under the 30 s default
+    assert router().choose(prompt_chars=20000, budget_ms=0) == "flash"
+
+
+def test_observed_latency_replaces_the_prior():
+    r = router()
+    for _ in range(10):
+        r.record("pro", 40000, ok=True)
+    assert r.choose(prompt_chars=20000) == "flash"
+
+
+def test_degraded_tier_is_skipped():
+    r = router(max_error_rate=0.25)
+    for ok in (True, False, False, True, False):
+        r.record("pro", 1000, ok=ok)
+    assert r.choose(prompt_chars=20000) == "flash"
+    assert r.snapshot()["pro"]["error_rate"] == 0.6
+
+
+def test_open_circuit_tier_is_skipped():
+    resilience = Resilience(failure_threshold=1, reset_timeout=60)
+    resilience.breaker("llm:pro").record_failure()
+    assert router(resilience=resilience).choose(prompt_chars=20000) == "flash"
+
+
+def test_falls_back_to_fastest_tier_when_nothing_is_healthy():
+    resilience = Resilience(failure_threshold=1, reset_timeout=60)
+    for name in ("llm:flash", "llm:pro"):
+        resilience.breaker(name).record_failure()
+    assert router(resilience=resilience).choose(prompt_chars=20000) == "flash"
@@ -0,0 +1,125 @@
+import os
+import threading
+from unittest.mock import patch
+
+import faiss
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from app.core.chunk_filter import ChunkFilter
+from app.core.rag import RAGService
+from app.core.sharding import FLAT_INDEX_FILE, SHARD_MANIFEST_FILE, ShardedIndex, shard_of
+from conftest import HashEmbeddings
+
+SOURCES = [f"doc{i}.pdf" for i in range(7)]
+
+
+def splits():
+    return [Document(page_content=f"{source} page {page}", metadata={"source": f"data/pdfs/{source}", "page": page})
+            for source in SOURCES for page in range(4)]
+
+
+def sharded_rag(tmp_path, shards=3) -> RAGService:
+    return RAGService(index_dir=str(tmp_path / "index"), embeddings=HashEmbeddings(), shards=shards,
+                      extraction_cache_dir=None)
+
+
+def test_shard_assignment_is_stable_and_in_range():
+    assert shard_of("data/pdfs/doc1.pdf", 4) == shard_of("doc1.pdf", 4)
+    assert {shard_of(source, 4) for source in SOURCES} <= set(range(4))
+
+
+def test_scatter_gather_matches_a_single_flat_index():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200, 8)).astype(np.float32)
+    flat = faiss.IndexFlatL2(8)
+    flat.add(vectors)
+    shards = []
+    for part in np.split(vectors, [50, 50, 170]):  # includes an empty shard
+        shard = faiss.IndexFlatL2(8)
+        shard.add(part)
+        shards.append(shard)
+    sharded = ShardedIndex(shards)
+    queries = rng.normal(size=(5, 8)).astype(np.float32)
+
+    assert sharded.ntotal == 200
+    np.testing.assert_array_equal(sharded.search(queries, 10)[1], flat.search(queries, 10)[1])
+
+    rows = np.sort(rng.choice(200, size=30, replace=False)).astype(np.int64)
+    selector = faiss.SearchParameters(sel=faiss.IDSelectorBatch(rows))
+    np.testing.assert_array_equal(sharded.search_subset(queries, 10, rows)[1],
+                                  flat.search(queries, 10, params=selector)[1])
+
+    # Fewer rows than k: padded with -1 like FAISS
+    distances, labels = sharded.search_subset(queries, 4, rows[:2])
+    assert (labels[:, 2:] == -1).all() and np.isinf(distances[:, 2:]).all()
+
+
+def test_sharded_index_is_built_saved_and_reloaded(tmp_path):
+    rag = sharded_rag(tmp_path)
+    with patch.object(RAGService, "_load_splits", return_value=splits()):
+        rag.load_and_index()
+    assert isinstance(rag.vector_store.index, ShardedIndex)
+    assert os.path.exists(tmp_path / "index" / SHARD_MANIFEST_FILE)
+
+    # Every chunk of a document sits in the document's shard
+    index = rag.vector_store.index
+    for row, chunk_id in rag.vector_store.index_to_docstore_id.items():
+        source = rag.vector_store.docstore.search(chunk_id).metadata["source"]
+        shard = int(np.searchsorted(index.offsets, row, side="right")) - 1
+        assert shard == shard_of(source, 3)
+
+    reloaded = sharded_rag(tmp_path)
+    with patch.object(RAGService, "_load_splits", side_effect=AssertionError("rebuilt")):
+        reloaded.load_and_index()
+    hits = reloaded.retrieve(["doc3.pdf page 2"], k=3)[0]
+    assert hits[0]["content"] == "doc3.pdf page 2" and hits[0]["score"] == 0
+    assert reloaded.vector_store.similarity_search("doc5.pdf page 1", k=1)[0].page_content == "doc5.pdf page 1"
+
+    filtered = reloaded.retrieve(["doc3.pdf page 2"], k=10, filters=ChunkFilter(sources=["doc6.pdf"]))[0]
+    assert len(filtered) == 4 and {hit["source"] for hit in filtered} == {"doc6.pdf"}
+
+    # A different shard count rebuilds
+    other = sharded_rag(tmp_path, shards=2)
+    with patch.object(RAGService, "_load_splits", return_value=splits()) as load:
+        other.load_and_index()
+    assert load.called and len(other.vector_store.index.shards) == 2
+
+
+def test_switching_layouts_never_pairs_a_stale_index_with_the_docstore(tmp_path):
+    index_dir = tmp_path / "index"
+    for shards in (1, 4, 1, 4):
+        rag = sharded_rag(tmp_path, shards=shards)
+        with patch.object(RAGService, "_load_splits", return_value=splits()) as load:
+            rag.load_and_index()
+        # Each switch rebuilds instead of loading the other layout's leftovers
+        assert load.called
+        assert os.path.exists(index_dir / FLAT_INDEX_FILE) == (shards == 1)
+        assert os.path.exists(index_dir / SHARD_MANIFEST_FILE) == (shards > 1)
+        assert bool(list(index_dir.glob("shard-*.faiss"))) == (shards > 1)
+
+    reloaded = sharded_rag(tmp_path, shards=4)
+    with patch.object(RAGService, "_load_splits", side_effect=AssertionError("rebuilt")):
+        reloaded.load_and_index()
+    assert isinstance(reloaded.vector_store.index, ShardedIndex)
+    for source in SOURCES:
+        assert reloaded.retrieve([f"{source} page 1"], k=1)[0][0]["content"] == f"{source} page 1"
+
+
+def test_rebuilds_reuse_the_shard_search_threads(tmp_path):
+    rag = sharded_rag(tmp_path)
+    with patch.object(RAGService, "_load_splits", return_value=splits()):
+        rag.load_and_index()
+        old = rag.vector_store  # e.g. still held by an in-flight request
+        rag.load_and_index(force=True)
+    # The new index searches on the same threads; the old one does not keep its own alive
+    assert rag.vector_store.index._pool is old.index._pool
+    rag.retrieve(["doc1.pdf page 0"], k=3)
+    assert sum(t.name.startswith("shard-search") for t in threading.enumerate()) <= rag.vector_store.index._pool._max_workers
+
+
+@pytest.mark.parametrize("storage, shared", [("int8", False), ("flat", True)])
+def test_sharding_falls_back_to_a_single_index(tmp_path, storage, shared):
+    rag = RAGService(index_dir=str(tmp_path), embeddings=HashEmbeddings(), storage=storage, shared=shared, shards=4)
+    assert rag.shards == 1
@@ -0,0 +1,95 @@
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from app.core.quantization import RerankedIndex
+from app.core.rag import RAGService
+from app.core.shared_index import VERSIONS_DIR, MappedDocstore, current_version, new_version_dir, publish
+from conftest import AxisEmbeddings
+
+WORDS = AxisEmbeddings.words
+
+
+def corpus(words):
+    docs = [Document(page_content=f"{w} notes", metadata={"source": f"data/pdfs/{w}.pdf", "page": 0})
+            for w in words]
+    return FAISS.from_documents(docs, AxisEmbeddings())
+
+
+def worker(tmp_path, storage="flat") -> RAGService:
+    """One uvicorn worker's RAGService, sharing the index directory."""
+    return RAGService(index_dir=str(tmp_path / "index"), embeddings=AxisEmbeddings(), shared=True,
+                      storage=storage, extraction_cache_dir=None)
+
+
+def no_build():
+    return patch.object(RAGService, "_build_store", side_effect=AssertionError("built again"))
+
+
+@pytest.mark.parametrize("storage", ["flat", "int8"])
+def test_workers_map_one_published_version(tmp_path, storage):
+    first = worker(tmp_path, storage)
+    with patch.object(RAGService, "_build_store", return_value=corpus(WORDS)):
+        first.load_and_index()
+
+    second = worker(tmp_path, storage)
+    with no_build():
+        second.load_and_index()
+
+    assert second.index_version == first.index_version == current_version(str(tmp_path / "index"))
+    assert isinstance(second.vector_store.docstore, MappedDocstore)
+    if storage != "flat":
+        assert isinstance(second.vector_store.index, RerankedIndex)
+    doc = second.vector_store.similarity_search("kidney", k=1)[0]
+    assert (doc.page_content, doc.metadata["source"]) == ("kidney notes", "data/pdfs/kidney.pdf")
+    assert second.retrieve(["liver"], k=1)[0][0]["source"] == "liver.pdf"
+
+
+def test_forced_rebuild_is_picked_up_by_every_worker(tmp_path):
+    builder, follower = worker(tmp_path), worker(tmp_path)
+    with patch.object(RAGService, "_build_store", return_value=corpus(WORDS[:2])):
+        builder.load_and_index()
+    follower.load_and_index()
+    follower.start_watching(0.02)
+    try:
+        for words in (WORDS[:4], WORDS):
+            with patch.object(RAGService, "_build_store", return_value=corpus(words)):
+                builder.load_and_index(force=True)
+            deadline = time.monotonic() + 5
+            while follower.index_version != builder.index_version and time.monotonic() < deadline:
+                time.sleep(0.02)
+            assert follower.vector_store.index.ntotal == len(words)
+    finally:
+        follower.stop_watching()
+
+    # Older builds are pruned (keep_index_versions)
+    assert len(os.listdir(tmp_path / "index" / VERSIONS_DIR)) == 2
+
+
+def test_prune_keeps_published_versions_and_drops_crashed_builds(tmp_path):
+    root = str(tmp_path)
+    first, _ = new_version_dir(root)
+    publish(root, first, keep=2)
+    crashed, _ = new_version_dir(root)  # never published
+    second, _ = new_version_dir(root)
+    publish(root, second, keep=2)
+    building, _ = new_version_dir(root)  # newer than the published one: left alone
+
+    # The crashed build neither counts toward `keep` nor survives
+    assert sorted(os.listdir(tmp_path / VERSIONS_DIR)) == [first, second, building]
+
+    publish(root, building, keep=2)
+    assert sorted(os.listdir(tmp_path / VERSIONS_DIR)) == [second, building]
+    assert current_version(root) == building
+
+
+def test_mapped_docstore_reports_unknown_ids(tmp_path):
+    rag = worker(tmp_path)
+    with patch.object(RAGService, "_build_store", return_value=corpus(WORDS[:1])):
+        rag.load_and_index()
+    assert rag.vector_store.docstore.search("5") == "ID 5 not found."
+    assert list(rag.vector_store.index_to_docstore_id.items()) == [(0, "0")]
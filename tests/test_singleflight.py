@@ -0,0 +1,136 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.singleflight import SingleFlight, StreamFlight
+
+
+def test_concurrent_calls_share_one_computation():
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.05)
+        return "answer"
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("key", lambda: asyncio.to_thread(compute)) for _ in range(5)))
+        return results, len(flight)
+
+    results, in_flight = asyncio.run(main())
+    assert len(calls) == 1
+    assert [r for r, _ in results] == ["answer"] * 5
+    assert sorted(c for _, c in results) == [False, True, True, True, True]
+    assert in_flight == 0
+
+
+def test_error_reaches_every_waiter_and_key_is_released():
+    def fail():
+        time.sleep(0.05)
+        raise RuntimeError("upstream down")
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("key", lambda: asyncio.to_thread(fail)) for _ in range(3)), return_exceptions=True)
+        # The failure is not cached: the next call computes again
+        retry = await flight.do("key", lambda: asyncio.to_thread(lambda: "recovered"))
+        return results, retry
+
+    results, retry = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert retry == ("recovered", False)
+
+
+def test_held_bytes_counts_in_flight_keys_until_released():
+    async def main():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            return "answer"
+
+        call = asyncio.ensure_future(flight.do("x" * 10_000, compute))
+        await asyncio.sleep(0)
+        held = flight.held_bytes()
+        release.set()
+        await call
+        return held, flight.held_bytes()
+
+    held, after = asyncio.run(main())
+    assert held - after > 10_000
+
+
+def test_none_key_is_never_shared():
+    calls = []
+
+    async def main():
+        flight = SingleFlight()
+        await asyncio.gather(*(flight.do(None, lambda: asyncio.to_thread(calls.append, 1)) for _ in range(3)))
+
+    asyncio.run(main())
+    assert len(calls) == 3
+
+
+def gated_producer(gate: threading.Event, chunks: list[str], seen_cancel: list):
+    def produce(shared):
+        for chunk in chunks:
+            gate.wait(5)
+            if shared.cancel_event.is_set():
+                seen_cancel.append(True)
+                return
+            yield chunk
+    return produce
+
+
+def test_late_joiner_replays_the_stream():
+    gate = threading.Event()
+    flights = StreamFlight()
+    first, coalesced_first = flights.open("k", gated_producer(gate, ["a", "b", "c"], []))
+    second, coalesced_second = flights.open("k", gated_producer(gate, ["x"], []))
+    gate.set()
+
+    assert first is second
+    assert (coalesced_first, coalesced_second) == (False, True)
+    assert "".join(first.read()) == "abc"
+    assert "".join(second.read()) == "abc"
+
+
+def test_producer_is_cancelled_only_when_every_reader_leaves():
+    gate = threading.Event()
+    seen_cancel = []
+    flights = StreamFlight()
+    stream, _ = flights.open("k", gated_producer(gate, ["a", "b"], seen_cancel))
+    flights.open("k", None)
+
+    cancel_one = threading.Event()
+    cancel_one.set()
+    assert list(stream.read(cancel_one)) == []
+    assert not stream.cancel_event.is_set()  # the other reader is still attached
+
+    assert list(stream.read(cancel_one)) == []
+    assert stream.cancel_event.is_set()
+    gate.set()
+    deadline = time.monotonic() + 5
+    while not stream.done and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert seen_cancel == [True]
+    # A cancelled stream is not joined by new requests
+    assert flights.open("k", gated_producer(gate, ["new"], []))[1] is False
+
+
+def test_stream_error_reaches_every_reader():
+    def produce(shared):
+        yield "partial"
+        raise RuntimeError("upstream down")
+
+    flights = StreamFlight()
+    stream, _ = flights.open(None, produce)
+    chunks = []
+    with pytest.raises(RuntimeError, match="upstream down"):
+        for chunk in stream.read():
+            chunks.append(chunk)
+    assert chunks == ["partial"]
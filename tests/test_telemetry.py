@@ -0,0 +1,40 @@
+import json
+import logging
+
+from app.core.telemetry import JsonFormatter, StageTimings, request_id_var
+
+
+def test_stage_timings_accumulate_and_format():
+    timings = StageTimings()
+    with timings.stage("embed"):
+        pass
+    with timings.stage("embed"):
+        pass
+    with timings.stage("generate"):
+        pass
+    timings.retrieved_chunks = 4
+    timings.prompt_chars = 1200
+
+    data = timings.as_dict()
+    assert set(data) == {"embed_ms", "generate_ms", "retrieved_chunks", "prompt_chars"}
+    assert data["retrieved_chunks"] == 4
+
+    header = timings.server_timing_header()
+    assert header.startswith("embed;dur=")
+    assert ", generate;dur=" in header
+
+
+def test_json_formatter_includes_request_id_and_fields():
+    record = logging.LogRecord("app.test", logging.INFO, __file__, 1, "hello %s", ("world",), None)
+    record.fields = {"model": "gemini-2.5-flash"}
+
+    token = request_id_var.set("abc123")
+    try:
+        line = JsonFormatter().format(record)
+    finally:
+        request_id_var.reset(token)
+
+    payload = json.loads(line)
+    assert payload["message"] == "hello world"
+    assert payload["request_id"] == "abc123"
+    assert payload["model"] == "gemini-2.5-flash"